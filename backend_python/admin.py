@@ -0,0 +1,34 @@
+"""
+Admin authentication for write and diagnostic endpoints
+
+Catalog inserts and the profiling tools share one token. Admin endpoints
+are hidden (404) unless ADMIN_TOKEN is set, and callers send the token in
+the `X-Admin-Token` header.
+"""
+import hmac
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+
+def admin_enabled() -> bool:
+    """Whether an admin token is configured"""
+    return bool(ADMIN_TOKEN)
+
+
+def admin_token_valid(token: Optional[str]) -> bool:
+    """Constant-time check of an admin token against ADMIN_TOKEN"""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def require_admin(token: Optional[str]):
+    """Hide admin endpoints unless ADMIN_TOKEN is set, and check the caller's token"""
+    if not admin_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not admin_token_valid(token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
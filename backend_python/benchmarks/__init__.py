@@ -0,0 +1,5 @@
+"""
+Benchmarks for the Focus Learning backend
+
+Run from the backend_python directory, e.g. `python -m benchmarks.overload`
+"""
@@ -0,0 +1,108 @@
+"""
+Implicit ALS vs item-item similarity: training time, serving latency and
+leave-last-out accuracy (hit rate and NDCG at k) on synthetic data with
+planted category affinity
+"""
+import argparse
+import contextlib
+import shlex
+import sys
+import io
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import create_dummy_data
+import train_model
+from evaluate import leave_last_out
+from interactions import partition_interactions
+from recommendation_engine import FactorScorer, RecommendationEngine
+from benchmarks.common import time_call
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+DEFAULT_GENERATOR_ARGS = (
+    '--courses 300 --books 50 --users 3000 --course-interactions 8 25 '
+    '--zipf 0.8 --affinity 0.8 --vocab-size 2000 --seed 11 --reference-date 2025-01-01'
+)
+
+
+def engine_for(courses_df, similarity, user_item_matrix, scorer=None):
+    return RecommendationEngine.from_artifacts(
+        courses_df=courses_df, course_similarity=similarity,
+        user_item_matrix=user_item_matrix, course_scorer=scorer
+    )
+
+
+def accuracy(engine, held_out, users, k):
+    hits, ndcg = 0, 0.0
+    for user in users:
+        ids = list(engine.recommend_courses(user_id=user, limit=k)['id'])
+        (item,) = held_out[user]
+        if item in ids:
+            hits += 1
+            ndcg += 1 / np.log2(ids.index(item) + 2)
+    return hits / len(users), ndcg / len(users)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = fn()
+    return value, time.perf_counter() - start
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--generator-args', default=DEFAULT_GENERATOR_ARGS)
+    parser.add_argument('--eval-users', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--factors', type=int, default=train_model.ALS_FACTORS)
+    parser.add_argument('--iterations', type=int, default=train_model.ALS_ITERATIONS)
+    args = parser.parse_args()
+
+    gen_args = create_dummy_data.parse_args(shlex.split(args.generator_args))
+    courses_df, _, chunks = create_dummy_data.generate_datasets(gen_args)
+    interactions_df = pd.concat(list(chunks), ignore_index=True)
+    partition = partition_interactions(interactions_df)['course']
+    train, held_out = leave_last_out(partition)
+    print(f"[*] {len(courses_df)} courses, {len(partition.users)} users, "
+          f"{len(train)} training interactions, {len(held_out)} held out")
+
+    model_dir = tempfile.mkdtemp(prefix='focus-als-')
+    (_, similarity, trained_courses, matrix), similarity_s = timed(
+        lambda: train_model.train_course_recommendation_model(courses_df, train, model_dir)
+    )
+    model, als_s = timed(lambda: train_model.train_als_recommendation_model(
+        'course', train, model_dir, factors=args.factors, iterations=args.iterations
+    ))
+
+    item_item = engine_for(trained_courses, similarity, matrix)
+    als = engine_for(trained_courses, similarity, matrix, FactorScorer(model, trained_courses))
+
+    rng = np.random.default_rng(0)
+    users = sorted(held_out)
+    users = list(rng.choice(users, size=min(args.eval_users, len(users)), replace=False))
+
+    print(f"\n{'':<24} {'item-item':>12} {'ALS':>12}")
+    print(f"{'train s':<24} {similarity_s:>12.3f} {als_s:>12.3f}")
+    latency = [
+        np.median([time_call(lambda: e.recommend_courses(user_id=u, limit=args.k), 1) for u in users[:20]])
+        for e in (item_item, als)
+    ]
+    print(f"{'serve ms (median)':<24} {latency[0]:>12.2f} {latency[1]:>12.3f}")
+    old_hit, old_ndcg = accuracy(item_item, held_out, users, args.k)
+    new_hit, new_ndcg = accuracy(als, held_out, users, args.k)
+    print(f"{f'hit rate@{args.k}':<24} {old_hit:>12.3f} {new_hit:>12.3f}")
+    print(f"{f'NDCG@{args.k}':<24} {old_ndcg:>12.3f} {new_ndcg:>12.3f}")
+    factor_bytes = model['user_factors'].nbytes + model['item_factors'].nbytes
+    print(f"{'model MB':<24} {similarity.nbytes / 1e6 + matrix.memory_usage().sum() / 1e6:>12.1f} "
+          f"{factor_bytes / 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main_cli()
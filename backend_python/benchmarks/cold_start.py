@@ -0,0 +1,188 @@
+"""
+Cold-start inserts: latency of embedding new courses with the hashing
+featurizer and linking them into a live engine, of the whole
+`POST /courses` handler, and of the catalog insert against the full rebuild
+it replaced on a large catalog; and how closely the new courses' neighbours
+match a full retrain that includes them
+"""
+import argparse
+import contextlib
+import shlex
+import shutil
+import sys
+import io
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import create_dummy_data
+import train_model
+from benchmarks.common import scale_catalog
+from interactions import partition_interactions
+from recommendation_engine import FactorScorer, RecommendationEngine, top_k
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+DEFAULT_GENERATOR_ARGS = (
+    '--courses 2000 --books 50 --users 3000 --course-interactions 5 20 '
+    '--vocab-size 2000 --seed 5 --reference-date 2025-01-01'
+)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = fn()
+    return value, time.perf_counter() - start
+
+
+def neighbours(similarity: np.ndarray, position: int, k: int) -> set:
+    """Positions of the k most similar other items"""
+    row = similarity[position].copy()
+    row[position] = -np.inf
+    return set(top_k(row, k).tolist())
+
+
+def overlap(sim_a, ids_a, sim_b, ids_b, items, k) -> float:
+    """Mean share of top-k neighbour ids two similarity matrices agree on"""
+    position_a = {item: i for i, item in enumerate(ids_a)}
+    position_b = {item: i for i, item in enumerate(ids_b)}
+    shares = []
+    for item in items:
+        a = {ids_a[i] for i in neighbours(sim_a, position_a[item], k)}
+        b = {ids_b[i] for i in neighbours(sim_b, position_b[item], k)}
+        shares.append(len(a & b) / k)
+    return float(np.mean(shares))
+
+
+def post_latencies(engine, base_df, records):
+    """Seconds of each `POST /courses`, served by `engine` and a catalog of `base_df`,
+    and of re-posting each one (409: the request overhead without an insert)"""
+    import main
+    import admin
+    from fastapi.testclient import TestClient
+
+    main.startup.wait()
+    with main.catalog_lock:
+        main.engine = engine
+        main.courses_df = base_df
+        main.courses_catalog = main.course_catalog(base_df)
+    admin.ADMIN_TOKEN = 'cold-start-benchmark'
+    client = TestClient(main.app)
+    fields = list(main.NewCourse.model_fields)
+    headers = {'X-Admin-Token': admin.ADMIN_TOKEN}
+    bodies = [{name: record[name] for name in fields if name in record} for record in records]
+    latencies, conflicts = [], []
+    for body in bodies:
+        start = time.perf_counter()
+        response = client.post('/courses', json=body, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 201 or not response.json()['indexed']:
+            raise RuntimeError(f"POST /courses answered {response.status_code}: {response.text[:200]}")
+    for body in bodies:
+        start = time.perf_counter()
+        client.post('/courses', json=body, headers=headers)
+        conflicts.append(time.perf_counter() - start)
+    return pd.Series(latencies), pd.Series(conflicts)
+
+
+def catalog_insert_latencies(courses_df, records, size: int):
+    """Seconds per catalog insert and per full rebuild (the old insert path) at `size` rows"""
+    import main
+
+    catalog = main.course_catalog(scale_catalog(courses_df, size, 'scaled'))
+    inserts = []
+    for record in records:
+        start = time.perf_counter()
+        catalog = catalog.insert(record)
+        inserts.append(time.perf_counter() - start)
+    rebuilds = []
+    for _ in range(5):
+        start = time.perf_counter()
+        main.course_catalog(catalog.sorted_df)
+        rebuilds.append(time.perf_counter() - start)
+    return pd.Series(inserts), pd.Series(rebuilds)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--generator-args', default=DEFAULT_GENERATOR_ARGS)
+    parser.add_argument('--inserts', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--catalog-size', type=int, default=100_000,
+                        help="Rows of the catalog the catalog insert is timed on")
+    args = parser.parse_args()
+
+    gen_args = create_dummy_data.parse_args(shlex.split(args.generator_args))
+    courses_df, _, chunks = create_dummy_data.generate_datasets(gen_args)
+    interactions_df = pd.concat(list(chunks), ignore_index=True)
+    rng = np.random.default_rng(0)
+    new_ids = set(rng.choice(courses_df['id'], size=args.inserts, replace=False))
+    base_df = courses_df[~courses_df['id'].isin(new_ids)].reset_index(drop=True)
+    new_df = courses_df[courses_df['id'].isin(new_ids)]
+    partition = partition_interactions(
+        interactions_df[~interactions_df['item_id'].isin(new_ids)]
+    )['course']
+    print(f"[*] {len(base_df)} trained courses, {len(new_df)} inserted, {len(partition)} interactions")
+
+    model_dir = tempfile.mkdtemp(prefix='focus-cold-start-')
+    try:
+        (featurizer, similarity, trained_df, matrix), _ = timed(
+            lambda: train_model.train_course_recommendation_model(base_df, partition, model_dir, 'hashing')
+        )
+        als_model, _ = timed(lambda: train_model.build_als_model(partition))
+        features = joblib.load(f'{model_dir}/course_features.pkl')
+
+        def fresh_engine():
+            # Inserts replace the engine's arrays but grow its scorer in place: one scorer per engine
+            return RecommendationEngine.from_artifacts(
+                course_vectorizer=featurizer, course_similarity=similarity, courses_df=trained_df,
+                user_item_matrix=matrix, course_scorer=FactorScorer(als_model, trained_df),
+                course_features=features
+            )
+
+        records = new_df.to_dict('records')
+        engine = fresh_engine()
+        timings = pd.DataFrame([engine.add_item('course', record) for record in records])
+        with contextlib.redirect_stdout(io.StringIO()):
+            posts, conflicts = post_latencies(fresh_engine(), base_df, records)
+        catalog_inserts, rebuilds = catalog_insert_latencies(base_df, records, args.catalog_size)
+
+        (_, hashing_similarity, hashing_df, _), hashing_s = timed(
+            lambda: train_model.train_course_recommendation_model(courses_df, partition, model_dir, 'hashing')
+        )
+        (_, tfidf_similarity, tfidf_df, _), tfidf_s = timed(
+            lambda: train_model.train_course_recommendation_model(courses_df, partition, model_dir, 'tfidf')
+        )
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+    live_ids = engine.courses_df['id'].tolist()
+    k = args.k
+    print()
+    for name in ('embedMs', 'linkMs', 'totalMs'):
+        label = f'insert {name[:-2]} ms p50 / p95'
+        print(f"{label:<36} {timings[name].quantile(0.5):>8.3f} / {timings[name].quantile(0.95):.3f}")
+    print(f"{'POST /courses ms p50 / p95':<36} {posts.quantile(0.5) * 1000:>8.3f} / {posts.quantile(0.95) * 1000:.3f}")
+    print(f"{'POST /courses 409 ms p50 (no insert)':<36} {conflicts.quantile(0.5) * 1000:>8.3f}")
+    label = f'catalog insert ms p50 / p95 @{args.catalog_size // 1000}k'
+    print(f"{label:<36} {catalog_inserts.quantile(0.5) * 1000:>8.3f} / {catalog_inserts.quantile(0.95) * 1000:.3f}")
+    print(f"{f'catalog rebuild ms p50 @{args.catalog_size // 1000}k':<36} {rebuilds.quantile(0.5) * 1000:>8.3f}")
+    print(f"{'full retrain s (hashing / tfidf)':<36} {hashing_s:>8.3f} / {tfidf_s:.3f}")
+    print(f"{f'inserted vs hashing retrain @{k}':<36} "
+          f"{overlap(engine.course_similarity, live_ids, hashing_similarity, hashing_df['id'].tolist(), new_ids, k):>8.3f}")
+    print(f"{f'inserted vs tfidf retrain @{k}':<36} "
+          f"{overlap(engine.course_similarity, live_ids, tfidf_similarity, tfidf_df['id'].tolist(), new_ids, k):>8.3f}")
+    print(f"{f'hashing vs tfidf retrain @{k}':<36} "
+          f"{overlap(hashing_similarity, hashing_df['id'].tolist(), tfidf_similarity, tfidf_df['id'].tolist(), new_ids, k):>8.3f}")
+    cold = engine.course_scorer.known[-len(new_df):].mean()
+    print(f"{'inserted with ALS factors':<36} {cold:>8.1%}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,51 @@
+"""
+Shared helpers for benchmarks
+"""
+import socket
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def scale_catalog(df: pd.DataFrame, size: int, prefix: str, seed: int = 42) -> pd.DataFrame:
+    """Tile a catalog frame up to `size` rows with unique ids and jittered ratings"""
+    rng = np.random.default_rng(seed)
+    reps = -(-size // len(df))
+    scaled = pd.concat([df] * reps, ignore_index=True).iloc[:size].copy()
+    scaled['id'] = [f'{prefix}_{i}' for i in range(1, size + 1)]
+    scaled['rating'] = np.round(
+        np.clip(scaled['rating'] + rng.normal(0, 0.3, size), 0, 5), 1
+    )
+    return scaled
+
+
+def time_call(fn, repeat: int = 20) -> float:
+    """Median wall time of `fn()` in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+def percentile(sorted_values, q: float) -> float:
+    """q-th percentile (0-100) of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def result(value: float, unit: str, better: str = 'lower') -> dict:
+    """One suite measurement; `better` is 'lower' or 'higher'"""
+    return {'value': round(float(value), 4), 'unit': unit, 'better': better}
+
+
+def free_port() -> int:
+    """An unused local TCP port"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
@@ -0,0 +1,61 @@
+"""
+Bytes on the wire and server CPU per request for catalog listings,
+before (handler on every request, identity encoding) and after (ETag, compression and body cache)
+"""
+import argparse
+import sys
+import io
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+
+def measure(client, url, headers, repeat):
+    """Average wire bytes and CPU milliseconds per request"""
+    wire = 0
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        response = client.get(url, headers=headers)
+        wire += int(response.headers.get('content-length', len(response.content)))
+    cpu = (time.process_time() - cpu_start) / repeat * 1000
+    return wire / repeat, cpu, response.status_code
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--paths', nargs='+', default=['/courses?limit=100', '/books?limit=100'])
+    args = parser.parse_args()
+
+    client = TestClient(main.app)
+    main.startup.wait()
+    max_entries = main.response_cache.max_entries
+
+    print("[*] CPU includes the in-process client, so compare rows rather than absolute values")
+    print(f"{'path':<22} {'scenario':<26} {'bytes':>9} {'cpu ms':>8} {'status':>6}")
+    for path in args.paths:
+        rows = []
+        # Before: no body cache and no compression, so the handler runs every time
+        main.response_cache.clear()
+        main.response_cache.max_entries = 0
+        rows.append(('before', *measure(client, path, {'Accept-Encoding': 'identity'}, args.repeat)))
+
+        main.response_cache.max_entries = max_entries
+        rows.append(('after: first visit gzip', *measure(client, path, {'Accept-Encoding': 'gzip'}, 1)))
+        rows.append(('after: hot cache gzip', *measure(client, path, {'Accept-Encoding': 'gzip'}, args.repeat)))
+        etag = client.get(path, headers={'Accept-Encoding': 'gzip'}).headers['etag']
+        rows.append(('after: revalidate (304)', *measure(
+            client, path, {'Accept-Encoding': 'gzip', 'If-None-Match': etag}, args.repeat
+        )))
+        for name, wire, cpu, status in rows:
+            print(f"{path:<22} {name:<26} {wire:>9.0f} {cpu:>8.3f} {status:>6}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,109 @@
+"""
+In-process HTTP load generator: drives the full ASGI app (middlewares
+included) with concurrent clients and reports p50/p95/p99 latency and req/s
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import io
+import time
+
+import httpx
+
+import main
+from benchmarks.common import percentile, result
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+
+def _scenarios():
+    """name -> (path factory, request headers)"""
+    categories = sorted(main.courses_df['category'].dropna().unique()) if len(main.courses_df) else ['Design']
+    users = list(main.engine.user_item_matrix.index) if main.engine is not None else ['user_1']
+    return {
+        # Mostly served from the response cache
+        'catalog_cached': (lambda rng: '/courses?limit=20', {}),
+        # Every request runs the handler
+        'catalog_uncached': (
+            lambda rng: f'/courses?limit=20&category={rng.choice(categories)}&cursor=',
+            {'cache-control': 'no-cache'}
+        ),
+        'recommendations': (
+            lambda rng: f'/recommendations/courses?user_id={rng.choice(users)}&limit=10',
+            {}
+        ),
+    }
+
+
+async def drive(path_for, headers: dict, concurrency: int, duration: float, seed: int = 42):
+    """Closed-loop load: `concurrency` clients issuing requests back to back"""
+    transport = httpx.ASGITransport(app=main.app)
+    latencies = []
+    errors = [0]
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(index):
+            rng = random.Random(seed + index)
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get(path_for(rng), headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 500:
+                    errors[0] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return latencies, errors[0], elapsed
+
+
+def run_scenario(name, path_for, headers, concurrency, duration) -> dict:
+    """Latency percentiles, throughput and error rate for one scenario"""
+    # Warm caches and lazy state outside the measured window
+    asyncio.run(drive(path_for, headers, 1, 0.2))
+    latencies, errors, elapsed = asyncio.run(drive(path_for, headers, concurrency, duration))
+    prefix = f'http.{name}'
+    results = {}
+    results[f'{prefix}.p50_ms'] = result(percentile(latencies, 50) * 1000, 'ms')
+    results[f'{prefix}.p95_ms'] = result(percentile(latencies, 95) * 1000, 'ms')
+    results[f'{prefix}.p99_ms'] = result(percentile(latencies, 99) * 1000, 'ms')
+    results[f'{prefix}.rps'] = result(len(latencies) / elapsed, 'req/s', better='higher')
+    results[f'{prefix}.error_rate'] = result(errors / max(len(latencies), 1), 'ratio')
+    return results
+
+
+def run(quick: bool = False, concurrency: int = 8, duration: float = None) -> dict:
+    """Every scenario for `duration` seconds at `concurrency` clients"""
+    duration = duration or (2.0 if quick else 10.0)
+    # ASGITransport does not run the lifespan, so load the app's state here
+    main.startup.wait()
+    results = {}
+    # Shedding makes recommendation latency bimodal; gate on the full path
+    admission = main.admission
+    saved = admission.queue_budget, admission.deadline
+    admission.queue_budget, admission.deadline = 60.0, float('inf')
+    try:
+        for name, (path_for, headers) in _scenarios().items():
+            results.update(run_scenario(name, path_for, headers, concurrency, duration))
+    finally:
+        admission.queue_budget, admission.deadline = saved
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=None, help="Seconds per scenario")
+    args = parser.parse_args()
+    print(json.dumps(run(args.quick, args.concurrency, args.duration), indent=2))
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,102 @@
+"""
+Instrumentation overhead: per-span and per-request cost of metrics,
+relative to request latency
+"""
+import argparse
+import asyncio
+import sys
+import io
+import time
+import timeit
+
+from fastapi.testclient import TestClient
+
+import main
+from metrics import MetricsMiddleware, registry, span
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+
+def span_cost_us(number=200_000):
+    """Added cost of one span over the disabled no-op"""
+    def run():
+        return timeit.timeit("with span('bench'): pass", globals={'span': span}, number=number)
+    registry.enabled = True
+    on = min(run() for _ in range(3))
+    registry.enabled = False
+    off = min(run() for _ in range(3))
+    registry.enabled = True
+    return (on - off) / number * 1e6
+
+
+def middleware_cost_us(number=20_000):
+    """Cost of MetricsMiddleware around a trivial ASGI app"""
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def send(message):
+        pass
+
+    async def receive():
+        return {'type': 'http.request'}
+
+    wrapped = MetricsMiddleware(app)
+    scope = {'type': 'http', 'method': 'GET', 'path': '/bench', 'app': None}
+
+    async def loop(target):
+        start = time.perf_counter()
+        for _ in range(number):
+            await target(scope, receive, send)
+        return time.perf_counter() - start
+
+    bare = min(asyncio.run(loop(app)) for _ in range(3))
+    instrumented = min(asyncio.run(loop(wrapped)) for _ in range(3))
+    return (instrumented - bare) / number * 1e6
+
+
+def stage_samples():
+    """Total number of stage observations recorded so far"""
+    text = registry.render()
+    return sum(
+        int(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+        if line.startswith('focus_stage_seconds_count')
+    )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--paths', nargs='+', default=[
+        '/courses?limit=20',
+        '/courses?cursor=&category=Design&limit=20',
+        '/recommendations/courses?user_id=user_1',
+    ])
+    args = parser.parse_args()
+
+    client = TestClient(main.app)
+    # Keep the response cache out of the way so every request runs its handler
+    main.response_cache.max_entries = 0
+    main.admission.deadline = float('inf')
+
+    per_span = span_cost_us()
+    per_request = middleware_cost_us()
+    print(f"[*] span: {per_span:.2f} us, middleware: {per_request:.2f} us per request")
+    print(f"{'path':<45} {'latency ms':>11} {'spans':>6} {'overhead':>9}")
+    for path in args.paths:
+        repeat = args.repeat if 'recommendations' not in path else max(1, args.repeat // 20)
+        client.get(path)
+        before = stage_samples()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            client.get(path)
+        latency_us = (time.perf_counter() - start) / repeat * 1e6
+        spans = (stage_samples() - before) / repeat
+        overhead = (spans * per_span + per_request) / latency_us * 100
+        print(f"{path:<45} {latency_us / 1000:>11.3f} {spans:>6.1f} {overhead:>8.2f}%")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,142 @@
+"""
+Microbenchmarks for the serving hot paths: engine scoring, top-k, catalog
+search, facet counts and response serialization
+"""
+import argparse
+import json
+import sys
+import io
+
+import numpy as np
+
+import main
+from catalog import Catalog, Facet
+from serialization import COLUMNAR_JSON, JSON, render
+from benchmarks.common import result, scale_catalog, time_call
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+
+def _active_user(engine):
+    """User with the most rated courses, so scoring does real work"""
+    matrix = engine.user_item_matrix
+    return (matrix > 0).sum(axis=1).idxmax()
+
+
+def bench_engine(repeat: int) -> dict:
+    main.startup.wait()
+    engine = main.engine
+    if engine is None:
+        print("[*] No trained models; skipping engine benchmarks")
+        return {}
+    user_id = _active_user(engine)
+    course_id = engine.courses_df['id'].iloc[0]
+    return {
+        'micro.engine.score_user_ms': result(
+            time_call(lambda: engine.recommend_courses(user_id=user_id, limit=10), repeat), 'ms'
+        ),
+        'micro.engine.similar_items_ms': result(
+            time_call(lambda: engine.recommend_courses(course_id=course_id, limit=10), repeat), 'ms'
+        ),
+    }
+
+
+def bench_topk(size: int, repeat: int) -> dict:
+    scores = np.random.default_rng(42).random(size).astype(np.float32)
+    df = scale_catalog(main.load_courses(), size, 'course')
+
+    def argpartition():
+        top = np.argpartition(-scores, 10)[:10]
+        return top[np.argsort(-scores[top])]
+
+    return {
+        f'micro.topk.argpartition_{size}_ms': result(time_call(argpartition, repeat), 'ms'),
+        f'micro.topk.nlargest_{size}_ms': result(
+            time_call(lambda: df.nlargest(10, 'rating'), repeat), 'ms'
+        ),
+    }
+
+
+def bench_search(size: int, repeat: int) -> dict:
+    df = scale_catalog(main.load_courses(), size, 'course')
+    catalog = Catalog(df, search_columns=['title', 'description'])
+    term = str(df['title'].iloc[len(df) // 2]).split()[0]
+    return {
+        f'micro.search.first_page_{size}_ms': result(
+            time_call(lambda: catalog.page({}, term, None, 20), repeat), 'ms'
+        ),
+        f'micro.search.filtered_page_{size}_ms': result(
+            time_call(lambda: catalog.page({'category': 'Design'}, term, None, 20), repeat), 'ms'
+        ),
+    }
+
+
+def bench_facets(size: int, repeat: int) -> dict:
+    df = scale_catalog(main.load_courses(), size, 'course')
+    catalog = Catalog(df, search_columns=['title', 'description'], facet_columns=main.COURSE_FACETS)
+    term = str(df['title'].iloc[len(df) // 2]).split()[0]
+    filters = {'category': 'Design', 'level': 'Beginner'}
+
+    def rescan():
+        """Counts the way a client gets them today: one filtered scan per value"""
+        counts = {}
+        for column in main.COURSE_FACETS:
+            others = [(c, v) for c, v in filters.items() if c != column]
+            for value in df[column].unique():
+                mask = df[column] == value
+                for other, other_value in others:
+                    mask &= df[other] == other_value
+                counts[(column, value)] = int(mask.sum())
+        return counts
+
+    return {
+        f'micro.facets.build_{size}_ms': result(
+            time_call(lambda: [Facet(catalog.sorted_df[c]) for c in main.COURSE_FACETS], repeat), 'ms'
+        ),
+        f'micro.facets.counts_{size}_ms': result(
+            time_call(lambda: catalog.facet_counts(filters, None), repeat), 'ms'
+        ),
+        f'micro.facets.counts_search_{size}_ms': result(
+            time_call(lambda: catalog.facet_counts(filters, term), repeat), 'ms'
+        ),
+        f'micro.facets.rescan_{size}_ms': result(time_call(rescan, repeat), 'ms'),
+    }
+
+
+def bench_serialization(rows: int, repeat: int) -> dict:
+    page = scale_catalog(main.load_courses(), rows, 'course')
+    meta = {"total": rows}
+    return {
+        f'micro.serialize.json_{rows}_ms': result(
+            time_call(lambda: render(page, meta, main.COURSE_DEFAULTS, None, JSON), repeat), 'ms'
+        ),
+        f'micro.serialize.columnar_{rows}_ms': result(
+            time_call(lambda: render(page, meta, main.COURSE_DEFAULTS, None, COLUMNAR_JSON), repeat), 'ms'
+        ),
+    }
+
+
+def run(quick: bool = False) -> dict:
+    """All microbenchmarks; `quick` uses smaller sizes and fewer repeats"""
+    repeat = 5 if quick else 20
+    size = 20_000 if quick else 100_000
+    results = {}
+    results.update(bench_engine(repeat))
+    results.update(bench_topk(size, repeat))
+    results.update(bench_search(size, repeat))
+    results.update(bench_facets(size, repeat))
+    results.update(bench_serialization(100, repeat))
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    print(json.dumps(run(args.quick), indent=2))
+
+
+if __name__ == '__main__':
+    main_cli()
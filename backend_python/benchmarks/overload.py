@@ -0,0 +1,97 @@
+"""
+Overload benchmark for the recommendation endpoints
+
+Offers an open-loop stream of /recommendations/courses calls at increasing
+arrival rates, with and without admission control, and reports goodput:
+responses that finished inside the deadline, per second.
+"""
+import argparse
+import json
+import random
+import sys
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from load_shedding import AdmissionController
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+
+def run_load(rate, duration, deadline, workers=64, seed=42):
+    """Offer `rate` requests per second for `duration` seconds"""
+    rng = random.Random(seed)
+    user_ids = [f'user_{i}' for i in range(1, 21)]
+
+    def call(arrival, user_id):
+        response = main.get_recommended_courses(
+            user_id=user_id,
+            category=None,
+            level=None,
+            limit=10,
+            fields=None,
+            accept=None
+        )
+        return time.monotonic() - arrival, json.loads(response.body)['degraded']
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        start = time.monotonic()
+        next_arrival = start
+        while next_arrival < start + duration:
+            delay = next_arrival - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(call, next_arrival, rng.choice(user_ids)))
+            next_arrival += rng.expovariate(rate)
+        samples = [f.result() for f in futures]
+
+    latencies = sorted(s[0] for s in samples)
+    on_time = [s for s in samples if s[0] <= deadline]
+    return {
+        'requests': len(samples),
+        'goodput': len(on_time) / duration,
+        'full': sum(1 for s in on_time if not s[1]) / duration,
+        'degraded': sum(1 for s in samples if s[1]),
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rates', type=float, nargs='+', default=[5, 10, 20, 50])
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--max-concurrency', type=int, default=2)
+    parser.add_argument('--queue-budget-ms', type=float, default=50)
+    parser.add_argument('--deadline-ms', type=float, default=250)
+    args = parser.parse_args()
+
+    main.startup.wait()
+    if main.engine is None:
+        print("[ERROR] Recommendation engine not loaded; run train_model.py first")
+        sys.exit(1)
+
+    deadline = args.deadline_ms / 1000.0
+    modes = {
+        'unlimited': lambda: AdmissionController(10 ** 6, 10 ** 9, 10 ** 9),
+        'admission': lambda: AdmissionController(
+            args.max_concurrency, args.queue_budget_ms, args.deadline_ms
+        ),
+    }
+
+    print(f"{'mode':<10} {'rate/s':>7} {'req':>6} {'goodput/s':>10} {'full/s':>8} "
+          f"{'degraded':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for rate in args.rates:
+        for name, factory in modes.items():
+            main.admission = factory()
+            r = run_load(rate, args.duration, deadline)
+            print(f"{name:<10} {rate:>7.0f} {r['requests']:>6} {r['goodput']:>10.1f} "
+                  f"{r['full']:>8.1f} {r['degraded']:>9} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main_cli()
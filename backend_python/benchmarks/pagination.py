@@ -0,0 +1,46 @@
+"""
+Deep-page latency benchmark: offset pagination vs cursor pagination on /courses
+"""
+import argparse
+import sys
+import io
+
+import main
+from catalog import Catalog
+from benchmarks.common import scale_catalog, time_call
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--depths', type=int, nargs='+', default=[0, 1_000, 10_000, 50_000, 90_000])
+    parser.add_argument('--category', default=None, help="Optional category filter")
+    args = parser.parse_args()
+
+    main.courses_df = scale_catalog(main.load_courses(), args.size, 'course')
+    main.courses_catalog = Catalog(main.courses_df, search_columns=['title', 'description'])
+    catalog = main.courses_catalog
+
+    print(f"[*] {args.size} courses, limit={args.limit}, category={args.category}")
+    print(f"{'depth':>8} {'offset ms':>10} {'cursor ms':>10}")
+    for depth in args.depths:
+        # Cursor for the same depth in the presorted order (unfiltered position)
+        token = catalog.encode_cursor(depth)
+        offset_ms = time_call(lambda: main.get_courses(
+            category=args.category, level=None, search=None,
+            limit=args.limit, offset=depth, cursor=None, fields=None, accept=None
+        ))
+        cursor_ms = time_call(lambda: main.get_courses(
+            category=args.category, level=None, search=None,
+            limit=args.limit, offset=0, cursor=token, fields=None, accept=None
+        ))
+        print(f"{depth:>8} {offset_ms:>10.3f} {cursor_ms:>10.3f}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,104 @@
+"""
+Domain partitioning: course user-item matrix size, training time and
+scoring time when built from all interactions (before) vs the course
+partition only, on a skewed synthetic dataset
+"""
+import argparse
+import contextlib
+import shlex
+import sys
+import io
+import tempfile
+import time
+
+import joblib
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+import create_dummy_data
+import train_model
+from interactions import partition_interactions
+from recommendation_engine import RecommendationEngine
+from benchmarks.common import time_call
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+DEFAULT_GENERATOR_ARGS = (
+    '--courses 300 --books 3000 --users 10000 --course-interactions 3 15 '
+    '--book-interactions 10 40 --zipf 1.1 --vocab-size 2000 --seed 7 --reference-date 2025-01-01'
+)
+
+
+def legacy_train_courses(courses_df, interactions_df, model_dir):
+    """The pre-partitioning trainer: pivots every interaction, books included"""
+    courses_df = courses_df.copy()
+    courses_df['feature_text'] = (
+        courses_df['title'] + ' ' + courses_df['description'] + ' ' +
+        courses_df['category'] + ' ' + courses_df['level'] + ' ' + courses_df['instructor']
+    )
+    vectorizer = TfidfVectorizer(max_features=1000, stop_words='english', ngram_range=(1, 2))
+    tfidf_matrix = vectorizer.fit_transform(courses_df['feature_text'])
+    similarity_matrix = cosine_similarity(tfidf_matrix, tfidf_matrix)
+    user_item_matrix = interactions_df.pivot_table(
+        index='user_id', columns='item_id', values='rating', aggfunc='mean'
+    ).fillna(0)
+    joblib.dump(user_item_matrix, f'{model_dir}/user_item_matrix.pkl')
+    return similarity_matrix, courses_df, user_item_matrix
+
+
+def scoring_engine(similarity, courses_df, user_item_matrix):
+    return RecommendationEngine.from_artifacts(
+        courses_df=courses_df, course_similarity=similarity, user_item_matrix=user_item_matrix
+    )
+
+
+def timed(fn):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = fn()
+    return value, time.perf_counter() - start
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--generator-args', default=DEFAULT_GENERATOR_ARGS)
+    parser.add_argument('--users-scored', type=int, default=3)
+    args = parser.parse_args()
+
+    gen_args = create_dummy_data.parse_args(shlex.split(args.generator_args))
+    courses_df, _, chunks = create_dummy_data.generate_datasets(gen_args)
+    interactions_df = pd.concat(list(chunks), ignore_index=True)
+    counts = interactions_df['item_type'].value_counts()
+    print(f"[*] {len(interactions_df)} interactions "
+          f"({counts.get('course', 0)} course, {counts.get('book', 0)} book)")
+
+    partitions, partition_s = timed(lambda: partition_interactions(interactions_df))
+    model_dir = tempfile.mkdtemp(prefix='focus-partition-')
+    (old_sim, old_courses, old_matrix), old_train_s = timed(
+        lambda: legacy_train_courses(courses_df, interactions_df, model_dir)
+    )
+    (_, new_sim, new_courses, new_matrix), new_train_s = timed(
+        lambda: train_model.train_course_recommendation_model(courses_df, partitions['course'], model_dir)
+    )
+
+    print(f"\n{'':<22} {'before':>14} {'partitioned':>14}")
+    print(f"{'matrix shape':<22} {str(old_matrix.shape):>14} {str(new_matrix.shape):>14}")
+    print(f"{'matrix MB':<22} {old_matrix.memory_usage(deep=True).sum() / 1e6:>14.1f} "
+          f"{new_matrix.memory_usage(deep=True).sum() / 1e6:>14.1f}")
+    print(f"{'course train s':<22} {old_train_s:>14.3f} {new_train_s:>14.3f}")
+    print(f"{'(partitioning s)':<22} {'':>14} {partition_s:>14.3f}")
+
+    old_engine = scoring_engine(old_sim, old_courses, old_matrix)
+    new_engine = scoring_engine(new_sim, new_courses, new_matrix)
+    # Heaviest course users, who exist in both matrices
+    heavy = (new_matrix > 0).sum(axis=1).nlargest(args.users_scored).index
+    old_ms = sum(time_call(lambda: old_engine.recommend_courses(user_id=u), 1) for u in heavy) / len(heavy)
+    new_ms = sum(time_call(lambda: new_engine.recommend_courses(user_id=u), 1) for u in heavy) / len(heavy)
+    print(f"{'score ms / user':<22} {old_ms:>14.1f} {new_ms:>14.1f}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,236 @@
+"""
+Personalized search: one `/courses?search=&personalize=` request against
+the two-call client-side merge (search, then recommendations)
+
+Reports HTTP latency and bytes of both, hit rate of each user's held-out
+course when searching its category, and, for that search and for the
+unfiltered listing (also with rating-led weights), how many candidates the early-terminating ranker scores
+and how fast it is compared with scoring all of them.
+Runs on a generated dataset in a scratch directory.
+"""
+import argparse
+import contextlib
+import os
+import random
+import shlex
+import shutil
+import sys
+import io
+import tempfile
+import time
+
+import numpy as np
+
+import pipeline
+import ranking
+from benchmarks.common import percentile
+from catalog import Catalog
+from evaluate import build_engines, leave_last_out, load_data
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+DEFAULT_GENERATOR_ARGS = (
+    '--courses 4000 --books 200 --users 8000 --course-interactions 5 20 '
+    '--seed 11 --reference-date 2025-01-01'
+)
+
+SEARCH_COLUMNS = ['title', 'description']
+
+# Page size of each client call in the two-call merge (the server cap)
+CLIENT_FETCH = 100
+
+# A small personal weight, where the factor bounds can prune
+RATING_LED_WEIGHTS = ranking.parse_weights('rating=0.8,popularity=0.1,personal=0.1')
+
+
+def merge_two_calls(search_ids, recommended_ids, k):
+    """Client-side merge: recommended matches first, in recommendation order, then other matches"""
+    rank = {item: i for i, item in enumerate(recommended_ids)}
+    recommended = sorted((item for item in search_ids if item in rank), key=rank.get)
+    others = [item for item in search_ids if item not in rank]
+    return (recommended + others)[:k]
+
+
+def search_ids(items_df, query, limit):
+    """What `/courses?search=` returns: matches in catalog file order"""
+    needle = query.lower()
+    mask = np.zeros(len(items_df), dtype=bool)
+    for column in SEARCH_COLUMNS:
+        mask |= items_df[column].str.lower().str.contains(needle, regex=False, na=False).to_numpy()
+    return items_df['id'][mask].head(limit).tolist()
+
+
+@contextlib.contextmanager
+def score_every_candidate():
+    """Disable early termination: every candidate is scored in one pass"""
+    saved = ranking.EXHAUSTIVE_FACTOR
+    ranking.EXHAUSTIVE_FACTOR = sys.maxsize
+    try:
+        yield
+    finally:
+        ranking.EXHAUSTIVE_FACTOR = saved
+
+
+def time_ranker(catalog, engine, user, query, k, weights, full_first=False):
+    """Ranker result and seconds, early-terminating and scoring all, and whether they agree
+
+    `full_first` swaps which of the two runs goes first; alternate it to
+    cancel cache effects of running second.
+    """
+    def timed(exhaustive):
+        with score_every_candidate() if exhaustive else contextlib.nullcontext():
+            start = time.perf_counter()
+            result = ranking.hybrid_rank(catalog, 'course', engine, user, {}, query, k, weights)
+            return result, time.perf_counter() - start
+
+    # Untimed call first: the relevance of a search is cached after its first use
+    ranking.hybrid_rank(catalog, 'course', engine, user, {}, query, k, weights)
+    if full_first:
+        (reference, _, _), full = timed(True)
+        (positions, matches, stats), early = timed(False)
+    else:
+        (positions, matches, stats), early = timed(False)
+        (reference, _, _), full = timed(True)
+    return positions, matches, stats, early, full, list(positions) == list(reference)
+
+
+def offline(items_df, partition, users, k, seed):
+    """Hit rate of held-out courses, ranker agreement and scored share, on a leave-last-out split"""
+    train, held_out = leave_last_out(partition)
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine, _ = build_engines(['als@32'], 'course', items_df, train)['als@32']
+    catalog = Catalog(engine.courses_df, SEARCH_COLUMNS, search_weights={'title': 2.0})
+    by_id = engine.courses_df.set_index('id')
+    rng = random.Random(seed)
+    sample = rng.sample(sorted(held_out), min(users, len(held_out)))
+
+    hits = {'single pass': 0, 'two calls': 0}
+    scenarios = {name: {'agree': 0, 'scored': 0, 'total': 0, 'early': [], 'full': []}
+                 for name in ('search', 'listing', 'listing, rating-led')}
+    for i, user in enumerate(sample):
+        (item,) = held_out[user]
+        query = by_id.at[item, 'category'].lower()
+
+        for name, search, weights in (('search', query, ranking.DEFAULT_WEIGHTS),
+                                      ('listing', None, ranking.DEFAULT_WEIGHTS),
+                                      ('listing, rating-led', None, RATING_LED_WEIGHTS)):
+            positions, matches, stats, early, full, same = time_ranker(catalog, engine, user, search, k, weights, i % 2 == 1)
+            scenario = scenarios[name]
+            scenario['early'].append(early)
+            scenario['full'].append(full)
+            scenario['agree'] += same
+            scenario['scored'] += stats['scored']
+            scenario['total'] += matches
+            if name == 'search':
+                single = catalog.sorted_df['id'].iloc[positions].tolist()
+
+        recommended = engine.recommend_courses(user_id=user, limit=CLIENT_FETCH)['id'].tolist()
+        merged = merge_two_calls(search_ids(engine.courses_df, query, CLIENT_FETCH), recommended, k)
+        hits['single pass'] += item in single
+        hits['two calls'] += item in merged
+
+    ranker = {}
+    for name, scenario in scenarios.items():
+        ranker[name] = {
+            'candidates': scenario['total'] / len(sample),
+            'agreement': scenario['agree'] / len(sample),
+            'scored_share': scenario['scored'] / max(scenario['total'], 1),
+            'early_p50_ms': percentile(sorted(scenario['early']), 50) * 1000,
+            'full_p50_ms': percentile(sorted(scenario['full']), 50) * 1000,
+        }
+    return {
+        'users': len(sample),
+        'hit_rate': {name: count / len(sample) for name, count in hits.items()},
+        'ranker': ranker,
+    }
+
+
+def online(client, users, queries, k, requests, seed):
+    """Latency and response bytes of the single request and the two-call merge
+
+    The two-call client fetches full search rows (it renders them) and only
+    the ids of its recommendations.
+    """
+    rng = random.Random(seed)
+    pairs = [(rng.choice(users), rng.choice(queries)) for _ in range(requests)]
+    headers = {'cache-control': 'no-cache'}
+    single, two, single_bytes, two_bytes = [], [], 0, 0
+    client.get(f'/courses?search={pairs[0][1]}&personalize={pairs[0][0]}&limit={k}')
+    for user, query in pairs:
+        start = time.perf_counter()
+        response = client.get(f'/courses?search={query}&personalize={user}&limit={k}', headers=headers)
+        response.json()
+        single.append(time.perf_counter() - start)
+        single_bytes += len(response.content)
+
+        start = time.perf_counter()
+        found = client.get(f'/courses?search={query}&limit={CLIENT_FETCH}', headers=headers)
+        recommended = client.get(f'/recommendations/courses?user_id={user}&limit={CLIENT_FETCH}&fields=id')
+        merge_two_calls([r['id'] for r in found.json()['data']], [r['id'] for r in recommended.json()['data']], k)
+        two.append(time.perf_counter() - start)
+        two_bytes += len(found.content) + len(recommended.content)
+    single.sort()
+    two.sort()
+    return {
+        'single pass': (percentile(single, 50) * 1000, percentile(single, 95) * 1000, single_bytes / requests),
+        'two calls': (percentile(two, 50) * 1000, percentile(two, 95) * 1000, two_bytes / requests),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--generator-args', default=DEFAULT_GENERATOR_ARGS)
+    parser.add_argument('--users', type=int, default=300, help="Held-out users in the offline comparison")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per approach in the HTTP comparison")
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='focus-personalize-')
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        print(f"[*] Building data and models in {workdir}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline.build(generator_argv=shlex.split(args.generator_args), max_workers=1)
+
+        items_df, partition = load_data('data', 'course')
+        print(f"[*] {len(items_df)} courses, {len(partition)} interactions")
+        report = offline(items_df, partition, args.users, args.k, args.seed)
+
+        # main.py loads ./data and ./models, so import it inside the scratch directory
+        import main
+        from fastapi.testclient import TestClient
+        main.startup.wait()
+        client = TestClient(main.app)
+        users = list(main.engine.user_item_matrix.index)
+        queries = sorted({w.lower() for title in items_df['title'] for w in title.split() if len(w) > 3})
+        latencies = online(client, users, queries, args.k, args.requests, args.seed)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    k = args.k
+    print()
+    print(f"{'':<40} {'single pass':>12} {'two calls':>12}")
+    print(f"{'HTTP p50 ms':<40} {latencies['single pass'][0]:>12.2f} {latencies['two calls'][0]:>12.2f}")
+    print(f"{'HTTP p95 ms':<40} {latencies['single pass'][1]:>12.2f} {latencies['two calls'][1]:>12.2f}")
+    print(f"{'response bytes':<40} {latencies['single pass'][2]:>12.0f} {latencies['two calls'][2]:>12.0f}")
+    print(f"{f'held-out hit rate @{k}':<40} {report['hit_rate']['single pass']:>12.3f} {report['hit_rate']['two calls']:>12.3f}")
+    for name, ranker in report['ranker'].items():
+        title = f"ranker, {name} ({ranker['candidates']:.0f} matches)"
+        print()
+        print(f"{title:<40} {'early stop':>12} {'score all':>12}")
+        print(f"{'p50 ms':<40} {ranker['early_p50_ms']:>12.3f} {ranker['full_p50_ms']:>12.3f}")
+        print(f"{'candidates given a factor score':<40} {ranker['scored_share']:>12.1%} {1:>12.1%}")
+        print(f"{'top-k identical':<40} {ranker['agreement']:>12.1%}")
+    print(f"\n[OK] {report['users']} held-out users, {args.requests} HTTP requests per approach")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,103 @@
+"""
+Offline pipeline benchmarks: generate, clean and train at several dataset
+sizes
+
+Each size runs in a scratch directory so the real data/ and models/ are
+never touched.
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import io
+import tempfile
+import time
+
+import pandas as pd
+
+import clean_data
+import create_dummy_data
+import train_model
+from interactions import partition_interactions, save_partitions
+from benchmarks.common import result
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+# (name, courses, books, users); similarity matrices are dense, so item
+# counts stay in the low thousands
+SIZES = [
+    ('s', 200, 200, 500),
+    ('m', 1_000, 1_000, 5_000),
+    ('l', 4_000, 4_000, 20_000),
+]
+
+
+@contextlib.contextmanager
+def _scratch_dir():
+    cwd = os.getcwd()
+    path = tempfile.mkdtemp(prefix='focus-bench-')
+    try:
+        os.chdir(path)
+        yield path
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    return time.perf_counter() - start
+
+
+def clean_all():
+    """The clean_data.py script body, as a function"""
+    clean_data.clean_courses(pd.read_csv('data/courses.csv')).to_csv('data/courses_cleaned.csv', index=False)
+    clean_data.clean_books(pd.read_csv('data/books.csv')).to_csv('data/books_cleaned.csv', index=False)
+    interactions_df = clean_data.clean_interactions(pd.read_csv('data/user_interactions.csv'))
+    interactions_df.to_csv('data/user_interactions_cleaned.csv', index=False)
+    save_partitions(partition_interactions(interactions_df))
+
+
+def bench_size(name: str, courses: int, books: int, users: int) -> dict:
+    with _scratch_dir():
+        generate = _timed(lambda: create_dummy_data.main([
+            '--courses', str(courses), '--books', str(books), '--users', str(users),
+            '--vocab-size', '2000', '--seed', '42', '--reference-date', '2025-01-01',
+            '--output-dir', 'data',
+        ]))
+        clean = _timed(clean_all)
+        train_courses = _timed(train_model.train_course_recommendation_model)
+        train_books = _timed(train_model.train_book_recommendation_model)
+    prefix = f'pipeline.{name}'
+    return {
+        f'{prefix}.generate_s': result(generate, 's'),
+        f'{prefix}.clean_s': result(clean, 's'),
+        f'{prefix}.train_courses_s': result(train_courses, 's'),
+        f'{prefix}.train_books_s': result(train_books, 's'),
+        f'{prefix}.total_s': result(generate + clean + train_courses + train_books, 's'),
+    }
+
+
+def run(quick: bool = False) -> dict:
+    """Pipeline stages at each size; `quick` skips the largest size"""
+    results = {}
+    for name, courses, books, users in (SIZES[:2] if quick else SIZES):
+        results.update(bench_size(name, courses, books, users))
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    print(json.dumps(run(args.quick), indent=2))
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,64 @@
+"""
+Payload size and encode time for list responses: today's records format
+(to_dict + FastAPI encoder) vs column-array encoding, projection and
+compact formats
+"""
+import argparse
+import sys
+import io
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import main
+from serialization import COLUMNAR_JSON, JSON, MSGPACK, msgpack, render
+from benchmarks.common import scale_catalog, time_call
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+LIST_FIELDS = 'id,title,rating,imageUrl'
+
+
+def legacy_render(df):
+    """The pre-projection path: records, per-row defaults, generic encoder"""
+    courses = df.to_dict('records')
+    for course in courses:
+        course.setdefault('isFree', course.get('price', 0) == 0)
+        course.setdefault('isEnrolled', False)
+        course.setdefault('progress', 0.0)
+    return JSONResponse(jsonable_encoder({"data": courses, "total": len(df)}))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[20, 100, 1000])
+    args = parser.parse_args()
+
+    courses_df = scale_catalog(main.load_courses(), max(args.rows), 'course')
+    variants = [
+        ('records (before)', lambda df: legacy_render(df)),
+        ('records', lambda df: render(df, {"total": len(df)}, main.COURSE_DEFAULTS, None, JSON)),
+        ('records fields', lambda df: render(df, {"total": len(df)}, main.COURSE_DEFAULTS, LIST_FIELDS, JSON)),
+        ('columnar', lambda df: render(df, {"total": len(df)}, main.COURSE_DEFAULTS, None, COLUMNAR_JSON)),
+        ('columnar fields', lambda df: render(df, {"total": len(df)}, main.COURSE_DEFAULTS, LIST_FIELDS, COLUMNAR_JSON)),
+    ]
+    if msgpack is not None:
+        variants.append(
+            ('msgpack fields', lambda df: render(df, {"total": len(df)}, main.COURSE_DEFAULTS, LIST_FIELDS, MSGPACK))
+        )
+    else:
+        print("[*] msgpack not installed; skipping the MessagePack variant")
+
+    print(f"{'rows':>6} {'format':<18} {'bytes':>9} {'encode ms':>10}")
+    for rows in args.rows:
+        page = courses_df.iloc[:rows]
+        for name, fn in variants:
+            size = len(fn(page).body)
+            ms = time_call(lambda: fn(page))
+            print(f"{rows:>6} {name:<18} {size:>9} {ms:>10.3f}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,243 @@
+"""
+Sharded serving: per-shard memory, router latency and agreement with a
+single shard for 1..N local shard processes, plus a shard timeout
+
+Every shard is a real `uvicorn main:app` process on a local port, started in
+a scratch directory holding freshly built data and models. The router runs
+in-process. Results for N > 1 shards are compared with N = 1.
+"""
+import argparse
+import contextlib
+import os
+import random
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import io
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import pipeline
+import router
+from benchmarks.common import free_port, percentile
+from sharding import SHARD_KEYS
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_GENERATOR_ARGS = (
+    '--courses 3000 --books 1000 --users 8000 --course-interactions 5 20 '
+    '--seed 7 --reference-date 2025-01-01'
+)
+
+
+def rss_mb(pid: int) -> float:
+    """Resident set size of a process (Linux only, NaN elsewhere)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+
+def start_shards(workdir: str, count: int, shard_by: str, ready_timeout: float):
+    """Start `count` shard processes; return (processes, urls, seconds to ready)"""
+    processes, urls, logs = [], [], []
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, SHARD_COUNT=str(count), SHARD_BY=shard_by)
+    start = time.perf_counter()
+    for index in range(count):
+        port = free_port()
+        log_path = os.path.join(workdir, f'shard_{count}_{index}.log')
+        logs.append(log_path)
+        processes.append(subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1',
+             '--port', str(port), '--log-level', 'warning'],
+            cwd=workdir, env=dict(env, SHARD_INDEX=str(index)),
+            stdout=open(log_path, 'w'), stderr=subprocess.STDOUT
+        ))
+        urls.append(f'http://127.0.0.1:{port}')
+    deadline = start + ready_timeout
+    for process, url, log_path in zip(processes, urls, logs):
+        while True:
+            try:
+                with urllib.request.urlopen(url + '/readyz', timeout=1):
+                    break
+            except OSError:
+                if process.poll() is not None or time.perf_counter() > deadline:
+                    stop_shards(processes)
+                    with open(log_path) as log:
+                        tail = log.read()[-2000:]
+                    raise RuntimeError(f"Shard at {url} did not start:\n{tail}")
+                time.sleep(0.2)
+    return processes, urls, time.perf_counter() - start
+
+
+def stop_shards(processes):
+    for process in processes:
+        with contextlib.suppress(OSError):
+            os.kill(process.pid, signal.SIGCONT)
+        process.terminate()
+    for process in processes:
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            process.wait(timeout=10)
+
+
+def use_shards(urls, shard_by: str):
+    """Point the in-process router at `urls`"""
+    router.SHARD_URLS = urls
+    router.SHARD_BY = shard_by
+    router.pool = ThreadPoolExecutor(max_workers=8 * len(urls), thread_name_prefix='shard')
+
+
+def requests_for(courses, users, count: int, seed: int):
+    """Fixed request paths per scenario, identical for every shard count"""
+    rng = random.Random(seed)
+    categories = sorted({c['category'] for c in courses})
+    words = sorted({w.lower() for c in courses for w in c['title'].split() if len(w) > 3})
+    return {
+        'list': ['/courses?limit=20&cursor=' for _ in range(count)],
+        'list_filtered': [f'/courses?limit=20&cursor=&category={rng.choice(categories)}' for _ in range(count)],
+        'search': [f'/courses?limit=20&cursor=&search={rng.choice(words)}' for _ in range(count)],
+        'facets': [f'/courses/facets?category={rng.choice(categories)}' for _ in range(count)],
+        'recommend': [f'/recommendations/courses?user_id={rng.choice(users)}&limit=10' for _ in range(count)],
+    }
+
+
+def answer(body: dict):
+    """The part of a response that must not depend on the shard count"""
+    if 'facets' in body:
+        return body['total'], body['facets']
+    return [row['id'] for row in body['data']]
+
+
+def walk_pages(client, pages: int):
+    """Ids of the first `pages` cursor pages of the unfiltered listing"""
+    ids, cursor = [], ''
+    for _ in range(pages):
+        body = client.get(f'/courses?limit=50&cursor={cursor}').json()
+        ids.extend(row['id'] for row in body['data'])
+        cursor = body['nextCursor']
+        if cursor is None:
+            break
+    return ids
+
+
+def measure(client, paths):
+    """Sorted latencies (s) and answers of `paths`, issued back to back"""
+    client.get(paths[0])
+    latencies, answers = [], []
+    for path in paths:
+        start = time.perf_counter()
+        response = client.get(path)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        answers.append(answer(response.json()))
+    latencies.sort()
+    return latencies, answers
+
+
+def timeout_probe(client, processes, path: str):
+    """Latency and meta of `path` while shard 0 is stopped"""
+    os.kill(processes[0].pid, signal.SIGSTOP)
+    try:
+        start = time.perf_counter()
+        body = client.get(path).json()
+        elapsed = time.perf_counter() - start
+    finally:
+        os.kill(processes[0].pid, signal.SIGCONT)
+    return elapsed, body
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--shard-by', choices=sorted(SHARD_KEYS), default='hash')
+    parser.add_argument('--requests', type=int, default=50, help="Requests per scenario")
+    parser.add_argument('--generator-args', default=DEFAULT_GENERATOR_ARGS)
+    parser.add_argument('--ready-timeout', type=float, default=180.0)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='focus-shards-')
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        print(f"[*] Building data and models in {workdir}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline.build(generator_argv=shlex.split(args.generator_args), max_workers=1)
+        os.chdir(cwd)
+
+        courses = pd.read_csv(os.path.join(workdir, 'data', 'courses_cleaned.csv')).to_dict('records')
+        users = sorted(pd.read_csv(os.path.join(workdir, 'data', 'user_interactions_cleaned.csv'))['user_id'].unique())
+        paths = requests_for(courses, users, args.requests, args.seed)
+        print(f"[*] {len(courses)} courses, {len(users)} users, {args.requests} requests per scenario")
+
+        reference = None
+        rows = []
+        for count in args.shards:
+            processes, urls, ready_s = start_shards(workdir, count, args.shard_by, args.ready_timeout)
+            try:
+                use_shards(urls, args.shard_by)
+                client = TestClient(router.app)
+                rss = [rss_mb(p.pid) for p in processes]
+                row = {
+                    'shards': count,
+                    'ready_s': ready_s,
+                    'rss_max_mb': max(rss),
+                    'rss_total_mb': sum(rss),
+                }
+                answers = {'pages': walk_pages(client, 10)}
+                for name, scenario_paths in paths.items():
+                    latencies, answers[name] = measure(client, scenario_paths)
+                    row[f'{name}_p50_ms'] = percentile(latencies, 50) * 1000
+                    row[f'{name}_p95_ms'] = percentile(latencies, 95) * 1000
+                if reference is None:
+                    reference = answers
+                for name, values in answers.items():
+                    if name == 'pages':
+                        row['agree_pages'] = float(values == reference['pages'])
+                    else:
+                        same = sum(a == b for a, b in zip(values, reference[name]))
+                        row[f'agree_{name}'] = same / len(values)
+                if count > 1 and hasattr(signal, 'SIGSTOP'):
+                    elapsed, body = timeout_probe(client, processes, '/courses?limit=20&cursor=')
+                    row['timeout_ms'] = elapsed * 1000
+                    row['timeout_partial'] = body.get('partial')
+                    row['timeout_missing'] = body.get('missingShards')
+                rows.append(row)
+            finally:
+                stop_shards(processes)
+
+        print()
+        print(f"{'shards':<28}" + ''.join(f"{row['shards']:>12}" for row in rows))
+        keys = list(dict.fromkeys(key for row in rows for key in row if key != 'shards'))
+        for key in keys:
+            cells = []
+            for row in rows:
+                value = row.get(key, '-')
+                cells.append(f"{value:>12.2f}" if isinstance(value, float) else f"{str(value):>12}")
+            print(f"{key:<28}" + ''.join(cells))
+        print(f"\n[OK] Shard timeout budget: {router.SHARD_TIMEOUT * 1000:.0f} ms (SHARD_TIMEOUT_MS)")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,173 @@
+"""
+Worker startup: import time of main.py, time until the server answers
+/healthz and /readyz, and first-request latency with and without the
+warm-up pass
+
+Every run starts a fresh `uvicorn main:app` process. By default it serves
+./data and ./models; --generator-args builds a larger dataset in a scratch
+directory first.
+"""
+import argparse
+import contextlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import io
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+from benchmarks.common import free_port
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = (
+    "import sys, time; start = time.perf_counter(); import main; "
+    "print(time.perf_counter() - start, 'sklearn' in sys.modules, 'scipy' in sys.modules)"
+)
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def measure_import(workdir: str, env: dict):
+    """Seconds to import main.py in a fresh interpreter, and whether sklearn / scipy got imported"""
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_PROBE], cwd=workdir, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1].split()
+    return float(output[0]), output[1] == 'True', output[2] == 'True'
+
+
+def get(url: str, timeout: float = 5.0):
+    """(status, seconds) of a GET; status 0 when nothing is listening yet"""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def wait_for(url: str, process, deadline: float) -> float:
+    """Poll `url` until it answers 200; return the time it did"""
+    while True:
+        status, _ = get(url, timeout=1.0)
+        if status == 200:
+            return time.perf_counter()
+        if process.poll() is not None or time.perf_counter() > deadline:
+            raise RuntimeError(f"{url} never answered 200 (last status {status})")
+        time.sleep(0.01)
+
+
+def boot(workdir: str, env: dict, paths: dict, timeout: float) -> dict:
+    """Start one server; time healthz, readyz, then each first and second request"""
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = start + timeout
+        row = {'healthz_s': wait_for(base + '/healthz', process, deadline) - start}
+        row['ready_s'] = wait_for(base + '/readyz', process, deadline) - start
+        with urllib.request.urlopen(base + '/readyz') as response:
+            row['warmup_s'] = json.loads(response.read())['phases'].get('warmup', 0.0)
+        for name, path in paths.items():
+            status, first = get(base + path)
+            if status != 200:
+                raise RuntimeError(f"{path} answered {status}")
+            _, second = get(base + path)
+            row[f'{name}_first_ms'] = first * 1000
+            row[f'{name}_second_ms'] = second * 1000
+        return row
+    finally:
+        process.terminate()
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            process.wait(timeout=10)
+
+
+def first_requests(workdir: str) -> dict:
+    """Requests the warm-up pass does not send verbatim"""
+    courses = pd.read_csv(os.path.join(workdir, 'data', 'courses_cleaned.csv'))
+    interactions = pd.read_csv(os.path.join(workdir, 'data', 'user_interactions_cleaned.csv'))
+    category = courses['category'].mode()[0]
+    word = courses['title'].str.split().str[0].mode()[0].lower()
+    user = sorted(interactions['user_id'].unique())[-1]
+    return {
+        'list': f'/courses?limit=20&cursor=&category={category}',
+        'search': f'/courses?limit=20&search={word}',
+        'facets': f'/courses/facets?category={category}',
+        'recommend': f'/recommendations/courses?user_id={user}&limit=10',
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help="Server starts per mode (medians are reported)")
+    parser.add_argument('--generator-args', default=None,
+                        help="Build data and models with these create_dummy_data.py arguments in a scratch directory")
+    parser.add_argument('--timeout', type=float, default=120.0)
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    workdir = os.getcwd()
+    scratch = None
+    if args.generator_args is not None:
+        import pipeline
+        scratch = workdir = tempfile.mkdtemp(prefix='focus-startup-')
+        cwd = os.getcwd()
+        print(f"[*] Building data and models in {workdir}")
+        try:
+            os.chdir(workdir)
+            with contextlib.redirect_stdout(io.StringIO()):
+                pipeline.build(generator_argv=shlex.split(args.generator_args), max_workers=1)
+        finally:
+            os.chdir(cwd)
+    try:
+        env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+        paths = first_requests(workdir)
+
+        imports = [measure_import(workdir, env) for _ in range(args.runs)]
+        print()
+        print(f"{'import main.py ms':<28} {median([i[0] for i in imports]) * 1000:>12.1f}")
+        print(f"{'imports sklearn / scipy':<28} {str(imports[0][1]):>12} / {imports[0][2]}")
+
+        modes = {'warm-up': dict(env, STARTUP_WARMUP='1'), 'no warm-up': dict(env, STARTUP_WARMUP='0')}
+        results = {}
+        for mode, mode_env in modes.items():
+            runs = [boot(workdir, mode_env, paths, args.timeout) for _ in range(args.runs)]
+            results[mode] = {key: median([run[key] for run in runs]) for key in runs[0]}
+
+        print()
+        print(f"{'':<28}" + ''.join(f"{mode:>14}" for mode in results))
+        for key in next(iter(results.values())):
+            print(f"{key:<28}" + ''.join(f"{results[mode][key]:>14.3f}" for mode in results))
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main_cli()
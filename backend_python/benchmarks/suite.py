@@ -0,0 +1,243 @@
+"""
+End-to-end benchmark suite with regression gates
+
+Runs the micro, pipeline and HTTP load benchmarks, writes the results as
+JSON, and compares a run against a stored baseline.
+
+Examples:
+    python -m benchmarks.suite run --quick --output benchmarks/results/latest.json
+    python -m benchmarks.suite run --save-baseline
+    python -m benchmarks.suite compare benchmarks/results/latest.json --threshold 0.15
+
+`compare` exits with status 1 when any metric is worse than the baseline by
+more than the threshold, or is missing from the run, so it can gate CI. It
+refuses (status 2) to compare a --quick run with a full baseline or the
+other way round: metric names carry the data size, so most would not match.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import io
+from datetime import datetime, timezone
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baselines', 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'latest.json')
+GROUPS = ('micro', 'pipeline', 'http')
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=BENCH_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def calibrate(repeat: int = 15) -> float:
+    """Median ms of a fixed Python + NumPy workload; tracks machine speed"""
+    import numpy as np
+    from benchmarks.common import time_call
+
+    data = np.random.default_rng(0).random(200_000)
+
+    def workload():
+        total = 0
+        for i in range(50_000):
+            total += i * i
+        np.sort(data)
+        return total
+
+    return time_call(workload, repeat)
+
+
+def run_suite(groups, quick: bool) -> dict:
+    results = {}
+    # Calibrate on both sides of the run: shared machines drift during it
+    calibration = calibrate()
+    # Imported lazily: importing main loads the catalog and models
+    if 'micro' in groups:
+        from benchmarks import micro
+        print("[*] Running microbenchmarks...")
+        results.update(micro.run(quick))
+    if 'pipeline' in groups:
+        from benchmarks import pipeline
+        print("[*] Running pipeline benchmarks...")
+        results.update(pipeline.run(quick))
+    if 'http' in groups:
+        from benchmarks import load
+        print("[*] Running HTTP load benchmarks...")
+        results.update(load.run(quick))
+    calibration = (calibration + calibrate()) / 2
+    return {
+        'meta': {
+            'calibration_ms': round(calibration, 4),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'quick': quick,
+            'groups': list(groups),
+        },
+        'results': results,
+    }
+
+
+def write_json(data: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load_json(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def speed_factor(baseline: dict, current: dict) -> float:
+    """How much slower this machine ran than the baseline's, from calibration"""
+    base = baseline['meta'].get('calibration_ms')
+    now = current['meta'].get('calibration_ms')
+    return now / base if base and now else 1.0
+
+
+def compare(baseline: dict, current: dict, threshold: float, normalize: bool = True):
+    """Rows of (name, base, current, change, status); status is ok, REGRESSION,
+    improved, new or MISSING
+
+    Only the groups the current run covered are compared. A baseline metric
+    of such a group that the run did not produce is MISSING (a renamed or
+    removed benchmark), which fails the gate like a regression.
+
+    With `normalize`, baseline timings are scaled by the calibration ratio so
+    a uniformly slower or faster machine does not read as a regression.
+    """
+    factor = speed_factor(baseline, current) if normalize else 1.0
+    rows = []
+    groups = set(current['meta'].get('groups') or GROUPS)
+    base_results = {name: value for name, value in baseline['results'].items()
+                    if name.split('.', 1)[0] in groups}
+    current_results = current['results']
+    for name in sorted(set(base_results) | set(current_results)):
+        base = base_results.get(name)
+        now = current_results.get(name)
+        if base is None or now is None:
+            rows.append((name, base and base['value'], now and now['value'], None,
+                         'new' if base is None else 'MISSING'))
+            continue
+        b, c = base['value'], now['value']
+        if now.get('unit') in ('ms', 's'):
+            b *= factor
+        elif now.get('unit') == 'req/s':
+            b /= factor
+        change = (c - b) / b if b else (0.0 if c == b else float('inf'))
+        worse = change if now.get('better', 'lower') == 'lower' else -change
+        if worse > threshold:
+            status = 'REGRESSION'
+        elif worse < -threshold:
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append((name, b, c, change, status))
+    return rows
+
+
+def print_comparison(rows, threshold: float):
+    print(f"{'metric':<48} {'baseline':>11} {'current':>11} {'change':>8}  status")
+    for name, base, now, change, status in rows:
+        base_text = '-' if base is None else f'{base:.3f}'
+        now_text = '-' if now is None else f'{now:.3f}'
+        change_text = '-' if change is None else f'{change * 100:+.1f}%'
+        print(f"{name:<48} {base_text:>11} {now_text:>11} {change_text:>8}  {status}")
+    regressions = [r for r in rows if r[4] == 'REGRESSION']
+    missing = [r for r in rows if r[4] == 'MISSING']
+    new = [r for r in rows if r[4] == 'new']
+    if regressions:
+        print(f"\n[ERROR] {len(regressions)} metric(s) regressed by more than {threshold * 100:.0f}%")
+    if missing:
+        print(f"[ERROR] {len(missing)} baseline metric(s) missing from this run; "
+              f"re-record the baseline if a benchmark was renamed or removed")
+    if new:
+        print(f"[*] {len(new)} metric(s) not in the baseline yet")
+    if not regressions and not missing:
+        print(f"\n[OK] No regressions beyond {threshold * 100:.0f}%")
+    return len(regressions) + len(missing)
+
+
+def check_comparable(baseline: dict, current: dict) -> bool:
+    """Refuse to gate a --quick run on a full baseline, or the other way round"""
+    base_quick = bool(baseline['meta'].get('quick'))
+    current_quick = bool(current['meta'].get('quick'))
+    if base_quick != current_quick:
+        print(f"[ERROR] Cannot compare a {'--quick' if current_quick else 'full'} run against a "
+              f"{'--quick' if base_quick else 'full'} baseline; metric names differ by data size")
+        return False
+    return True
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_cmd = commands.add_parser('run', help="Run the suite and write results as JSON")
+    run_cmd.add_argument('--quick', action='store_true', help="Smaller sizes and shorter load runs")
+    run_cmd.add_argument('--only', nargs='+', choices=GROUPS, default=list(GROUPS))
+    run_cmd.add_argument('--output', default=DEFAULT_OUTPUT)
+    run_cmd.add_argument('--save-baseline', action='store_true',
+                         help=f"Also write the results to {os.path.relpath(DEFAULT_BASELINE)}")
+    run_cmd.add_argument('--threshold', type=float, default=None,
+                         help="Compare against the baseline after running and fail on regressions")
+
+    compare_cmd = commands.add_parser('compare', help="Compare results against a baseline")
+    compare_cmd.add_argument('current', nargs='?', default=DEFAULT_OUTPUT)
+    compare_cmd.add_argument('--baseline', default=DEFAULT_BASELINE)
+    compare_cmd.add_argument('--threshold', type=float, default=0.10,
+                             help="Allowed relative slowdown before failing (default 0.10)")
+    compare_cmd.add_argument('--no-normalize', action='store_true',
+                             help="Compare raw numbers instead of scaling by calibration")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.command == 'run':
+        if args.save_baseline and (args.quick or set(args.only) != set(GROUPS)):
+            print("[ERROR] The baseline gates full runs; record it without --quick or --only")
+            return 2
+        data = run_suite(args.only, args.quick)
+        write_json(data, args.output)
+        print(f"[OK] {len(data['results'])} results written to {args.output}")
+        if args.save_baseline:
+            write_json(data, DEFAULT_BASELINE)
+            print(f"[OK] Baseline saved to {DEFAULT_BASELINE}")
+        elif args.threshold is not None:
+            baseline = load_json(DEFAULT_BASELINE)
+            if not check_comparable(baseline, data):
+                return 2
+            rows = compare(baseline, data, args.threshold)
+            return 1 if print_comparison(rows, args.threshold) else 0
+        return 0
+
+    baseline = load_json(args.baseline)
+    current = load_json(args.current)
+    if not check_comparable(baseline, current):
+        return 2
+    if not args.no_normalize:
+        print(f"[*] Machine speed factor vs baseline: {speed_factor(baseline, current):.2f}")
+    rows = compare(baseline, current, args.threshold, normalize=not args.no_normalize)
+    return 1 if print_comparison(rows, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
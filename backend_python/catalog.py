@@ -0,0 +1,392 @@
+"""
+In-memory catalog with a stable sort order for keyset (cursor) pagination
+"""
+import base64
+import bisect
+import hashlib
+import json
+import math
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Server-side cap on page size
+MAX_PAGE_LIMIT = 100
+
+# Rows scanned per step while collecting a filtered page
+MIN_SCAN_CHUNK = 256
+
+# Search strings whose match bitmaps are kept for facet requests
+SEARCH_BITMAP_CACHE = 256
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def pack_bits(mask: np.ndarray) -> np.ndarray:
+    """Bool mask(s) along the last axis as little-endian uint64 bitmap words"""
+    packed = np.packbits(mask, axis=-1, bitorder='little')
+    pad = -packed.shape[-1] % 8
+    if pad:
+        packed = np.pad(packed, [(0, 0)] * (packed.ndim - 1) + [(0, pad)])
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def insert_bit(words: np.ndarray, position: int, bits: np.ndarray, length: int) -> np.ndarray:
+    """Bitmap(s) over `length` rows with a row inserted at `position`
+
+    Later bits move up by one, carried across words; `bits` holds the new
+    row's bit in each bitmap. O(words) instead of re-packing from masks.
+    """
+    if length + 1 > words.shape[-1] * 64:
+        words = np.concatenate([words, np.zeros(words.shape[:-1] + (1,), dtype=np.uint64)], axis=-1)
+    word, bit = divmod(position, 64)
+    one, low = np.uint64(1), np.uint64((1 << bit) - 1)
+    out = words.copy()
+    x = words[..., word]
+    out[..., word] = (x & low) | ((x & ~low) << one) | (np.asarray(bits, dtype=np.uint64) << np.uint64(bit))
+    out[..., word + 1:] = (words[..., word + 1:] << one) | (words[..., word:-1] >> np.uint64(63))
+    return out
+
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(words: np.ndarray) -> np.ndarray:
+        """Set bits per bitmap (last axis)"""
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(words: np.ndarray) -> np.ndarray:
+        """Set bits per bitmap (last axis)"""
+        return _BYTE_BITS[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+class Facet:
+    """One bitmap per distinct value of a catalog column, over sorted rows"""
+
+    def __init__(self, column: pd.Series):
+        codes, values = pd.factorize(column, sort=True)
+        self.length = len(column)
+        self.words = pack_bits(codes[None, :] == np.arange(len(values))[:, None])
+        self._set_values([v.item() if hasattr(v, 'item') else v for v in values])
+
+    def _set_values(self, values: list):
+        self.values = values
+        # Filter values arrive as query strings
+        self.index = {}
+        for i, value in enumerate(self.values):
+            self.index[str(value)] = i
+            if isinstance(value, bool):
+                self.index[str(value).lower()] = i
+
+    def insert(self, position: int, value: Any) -> Optional['Facet']:
+        """A copy with a row holding `value` inserted at `position`
+
+        None when the value cannot be ordered among the existing ones; the
+        caller then rebuilds the facet from its column.
+        """
+        values, words = self.values, self.words
+        bits = np.zeros(len(values), dtype=bool)
+        if not pd.isna(value):
+            value = value.item() if hasattr(value, 'item') else value
+            if value in values:
+                bits[values.index(value)] = True
+            else:
+                try:
+                    i = bisect.bisect_left(values, value)
+                except TypeError:
+                    return None
+                values = values[:i] + [value] + values[i:]
+                words = np.insert(words, i, 0, axis=0)
+                bits = np.insert(bits, i, True)
+        facet = object.__new__(Facet)
+        facet.length = self.length + 1
+        facet.words = insert_bit(words, position, bits, self.length)
+        facet._set_values(values)
+        return facet
+
+    def bitmap(self, value: str) -> np.ndarray:
+        """Rows holding `value` (no rows for an unknown value)"""
+        i = self.index.get(value)
+        if i is None:
+            return np.zeros(self.words.shape[1], dtype=np.uint64)
+        return self.words[i]
+
+    def counts(self, mask: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {'value': value, 'count': int(count)}
+            for value, count in zip(self.values, popcount(self.words & mask))
+        ]
+
+
+def encode_key_cursor(version: str, position: int, rating: Optional[float] = None,
+                      item_id: Optional[str] = None) -> str:
+    """Cursor resuming after the (rating, id) key of the last row returned
+
+    A catalog whose version differs from `version` seeks to the key, so
+    cursors also work across reloads and across shards.
+    """
+    payload = {'v': version, 'p': position}
+    if item_id is not None:
+        payload['r'] = rating
+        payload['i'] = item_id
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def compute_version(df: pd.DataFrame) -> str:
+    """Content hash of a catalog frame, identical across workers and restarts"""
+    if df.empty:
+        return '0' * 16
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()[:16]
+
+
+class Catalog:
+    """Catalog rows presorted by rating desc, then id asc"""
+
+    def __init__(self, df: pd.DataFrame, search_columns: List[str], facet_columns: List[str] = (),
+                 search_weights: Optional[Dict[str, float]] = None):
+        self._options = (list(search_columns), list(facet_columns), search_weights)
+        self.search_columns = [c for c in search_columns if c in df.columns]
+        # Relevance weight of a match in each search column (default 1)
+        self.search_weights = {c: (search_weights or {}).get(c, 1.0) for c in self.search_columns}
+        self.facet_columns = [c for c in facet_columns if c in df.columns]
+        self.version = compute_version(df)
+
+        if df.empty or 'rating' not in df.columns:
+            self.sorted_df = df.reset_index(drop=True)
+            self._neg_ratings = np.zeros(len(df))
+            self._ids = np.array([], dtype=str)
+        else:
+            ids = df['id'].astype(str).to_numpy(dtype=str)
+            neg_ratings = -df['rating'].to_numpy(dtype=float)
+            order = np.lexsort((ids, neg_ratings))
+            self.sorted_df = df.iloc[order].reset_index(drop=True)
+            self._neg_ratings = neg_ratings[order]
+            self._ids = ids[order]
+
+        # Lowercased search text, computed once instead of per request
+        self._lower = {
+            c: self.sorted_df[c].astype(str).str.lower() for c in self.search_columns
+        }
+
+        # Per-value bitmaps for facet counts
+        self.facets = {c: Facet(self.sorted_df[c]) for c in self.facet_columns}
+        self._init_caches()
+
+    def _init_caches(self):
+        self._all_rows = pack_bits(np.ones(len(self.sorted_df), dtype=bool))
+        self._search_bitmap = lru_cache(maxsize=SEARCH_BITMAP_CACHE)(self._search_rows)
+        self._relevance = lru_cache(maxsize=SEARCH_BITMAP_CACHE)(self._relevance_rows)
+
+    def __len__(self):
+        return len(self.sorted_df)
+
+    def __contains__(self, item_id: str) -> bool:
+        if len(self._ids) == len(self.sorted_df):
+            return bool((self._ids == str(item_id)).any())
+        return bool((self.sorted_df['id'].astype(str) == str(item_id)).any()) if 'id' in self.sorted_df else False
+
+    def insert(self, record: Dict[str, Any]) -> 'Catalog':
+        """A copy of the catalog with `record` added, for readers to swap in
+
+        The row goes where its (rating, id) key bisects the sort order. Row
+        arrays and search text are spliced and facet bitmaps shifted by one
+        bit, so an insert costs a few memory copies of the columns instead
+        of a re-sort, re-lowercasing, re-factorizing and re-hashing. The
+        version chains from the old one. Catalogs without ratings, and rows
+        without one, are rebuilt instead.
+        """
+        row = pd.DataFrame([record])
+        row = row.reindex(columns=list(dict.fromkeys([*self.sorted_df.columns, *row.columns])))
+        # Keep the catalog's dtypes where the values fit (concat would otherwise widen to object)
+        try:
+            row = row.astype(self.sorted_df.dtypes.to_dict())
+        except (TypeError, ValueError):
+            for c in self.sorted_df.columns:
+                try:
+                    row[c] = row[c].astype(self.sorted_df[c].dtype)
+                except (TypeError, ValueError):
+                    pass
+        rating = pd.to_numeric(row['rating'], errors='coerce').iloc[0] if 'rating' in row else np.nan
+        if len(self._ids) != len(self.sorted_df) or self.sorted_df.empty or not np.isfinite(rating):
+            return Catalog(pd.concat([self.sorted_df, row], ignore_index=True), *self._options)
+
+        item_id = str(record['id'])
+        position = self._seek(-float(rating), item_id)
+        catalog = object.__new__(Catalog)
+        catalog._options = self._options
+        catalog.search_columns = self.search_columns
+        catalog.search_weights = self.search_weights
+        catalog.facet_columns = self.facet_columns
+        added = json.dumps(record, sort_keys=True, default=str)
+        catalog.version = hashlib.sha1(f"{self.version}:{added}".encode()).hexdigest()[:16]
+        catalog.sorted_df = pd.concat(
+            [self.sorted_df.iloc[:position], row, self.sorted_df.iloc[position:]], ignore_index=True
+        )
+        catalog._neg_ratings = np.concatenate([self._neg_ratings[:position], [-float(rating)],
+                                               self._neg_ratings[position:]])
+        # Concatenation (not np.insert) widens the string dtype for a longer id
+        catalog._ids = np.concatenate([self._ids[:position], np.array([item_id]), self._ids[position:]])
+        catalog._lower = {
+            c: pd.concat([lower.iloc[:position], row[c].astype(str).str.lower(), lower.iloc[position:]],
+                         ignore_index=True)
+            for c, lower in self._lower.items()
+        }
+        catalog.facets = {}
+        for c, facet in self.facets.items():
+            updated = facet.insert(position, row[c].iloc[0])
+            catalog.facets[c] = updated if updated is not None else Facet(catalog.sorted_df[c])
+        catalog._init_caches()
+        return catalog
+
+    def encode_cursor(self, position: int) -> str:
+        """Opaque token for the row at `position` (the next row to return)"""
+        last = position - 1
+        if 0 <= last < len(self._ids):
+            return encode_key_cursor(self.version, position, float(-self._neg_ratings[last]), str(self._ids[last]))
+        return encode_key_cursor(self.version, position)
+
+    def decode_cursor(self, cursor: str) -> int:
+        """Position in the current sort order where the cursor resumes"""
+        if not cursor:
+            return 0
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            if not isinstance(payload, dict):
+                raise TypeError("cursor payload is not an object")
+            position = payload['p']
+            if isinstance(position, bool) or not isinstance(position, int):
+                raise TypeError("bad position")
+            key = None
+            if 'r' in payload:
+                rating, item_id = payload['r'], payload['i']
+                if isinstance(rating, bool) or not isinstance(rating, (int, float)):
+                    raise TypeError("bad resume rating")
+                if not math.isfinite(rating) or not isinstance(item_id, str):
+                    raise ValueError("bad resume key")
+                key = (-float(rating), item_id)
+        except (ValueError, KeyError, TypeError, OverflowError, RecursionError) as e:
+            raise InvalidCursor(f"Invalid cursor: {e}")
+        if payload.get('v') == self.version:
+            return min(max(position, 0), len(self.sorted_df))
+        if key is None:
+            return 0
+        # Catalog changed since the cursor was issued: seek past the last key seen
+        return self._seek(*key)
+
+    def _seek(self, neg_rating: float, item_id: str) -> int:
+        """First position whose (rating desc, id asc) key sorts after the given one"""
+        lo = int(np.searchsorted(self._neg_ratings, neg_rating, side='left'))
+        hi = int(np.searchsorted(self._neg_ratings, neg_rating, side='right'))
+        return lo + int(np.searchsorted(self._ids[lo:hi], item_id, side='right'))
+
+    def _match(self, rows: pd.DataFrame, start: int, stop: int,
+               filters: Dict[str, str], search: Optional[str]) -> np.ndarray:
+        mask = np.ones(len(rows), dtype=bool)
+        for column, value in filters.items():
+            mask &= (rows[column] == value).to_numpy()
+        if search:
+            needle = search.lower()
+            hits = np.zeros(len(rows), dtype=bool)
+            for column in self.search_columns:
+                hits |= self._lower[column].iloc[start:stop].str.contains(
+                    needle, regex=False, na=False
+                ).to_numpy()
+            mask &= hits
+        return mask
+
+    def _search_rows(self, needle: str) -> np.ndarray:
+        hits = np.zeros(len(self.sorted_df), dtype=bool)
+        for column in self.search_columns:
+            hits |= self._lower[column].str.contains(needle, regex=False, na=False).to_numpy()
+        return pack_bits(hits)
+
+    def _relevance_rows(self, needle: str) -> np.ndarray:
+        total = sum(self.search_weights.values()) or 1.0
+        relevance = np.zeros(len(self.sorted_df), dtype=np.float32)
+        for column, weight in self.search_weights.items():
+            hits = self._lower[column].str.contains(needle, regex=False, na=False).to_numpy()
+            relevance[hits] += weight / total
+        relevance.flags.writeable = False
+        return relevance
+
+    def relevance(self, search: str) -> np.ndarray:
+        """Per sorted row, the weighted share of search columns containing `search` (0 = no match)"""
+        return self._relevance(search.lower())
+
+    def filter_mask(self, filters: Dict[str, str]) -> np.ndarray:
+        """Bool mask of the sorted rows matching every equality filter"""
+        mask = np.ones(len(self.sorted_df), dtype=bool)
+        for column, value in filters.items():
+            mask &= (self.sorted_df[column] == value).to_numpy()
+        return mask
+
+    def facet_counts(self, filters: Dict[str, str], search: Optional[str]) -> Tuple[int, Dict[str, list]]:
+        """Matching row count and, per facet column, the count of every value
+
+        Counts are disjunctive: a column's counts apply every filter except
+        the one on that column, so they show what selecting another value
+        of it would return. Each count is a popcount over AND-ed bitmaps.
+        """
+        base = self._search_bitmap(search.lower()) if search else self._all_rows
+        selected = {column: self.facets[column].bitmap(value) for column, value in filters.items()}
+        facets = {}
+        for column, facet in self.facets.items():
+            mask = base
+            for other, bitmap in selected.items():
+                if other != column:
+                    mask = mask & bitmap
+            facets[column] = facet.counts(mask)
+        mask = base
+        for bitmap in selected.values():
+            mask = mask & bitmap
+        return int(popcount(mask)), facets
+
+    def page(
+        self,
+        filters: Dict[str, str],
+        search: Optional[str],
+        cursor: str,
+        limit: int
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """Return up to `limit` matching rows after `cursor` and the next cursor
+
+        Rows are scanned forward from the cursor in growing chunks, so a page
+        costs O(limit / selectivity) regardless of how deep it is.
+        """
+        limit = max(0, min(limit, MAX_PAGE_LIMIT))
+        position = self.decode_cursor(cursor)
+        total = len(self.sorted_df)
+
+        if not filters and not search:
+            stop = min(position + limit, total)
+            rows = self.sorted_df.iloc[position:stop]
+            next_cursor = self.encode_cursor(stop) if stop < total else None
+            return rows, next_cursor
+
+        found: List[np.ndarray] = []
+        count = 0
+        chunk = max(limit * 4, MIN_SCAN_CHUNK)
+        start = position
+        while start < total and count <= limit:
+            stop = min(start + chunk, total)
+            rows = self.sorted_df.iloc[start:stop]
+            hits = np.flatnonzero(self._match(rows, start, stop, filters, search)) + start
+            found.append(hits)
+            count += len(hits)
+            start = stop
+            chunk *= 2
+
+        matched = np.concatenate(found) if found else np.array([], dtype=int)
+        page_positions = matched[:limit]
+        if len(matched) > limit:
+            next_cursor = self.encode_cursor(int(page_positions[-1]) + 1) if limit else cursor
+        else:
+            next_cursor = None
+        return self.sorted_df.iloc[page_positions], next_cursor
@@ -6,6 +6,8 @@ import numpy as np
 import sys
 import io
 
+from interactions import partition_interactions, save_partitions
+
 # Fix encoding for Windows console
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
@@ -124,8 +126,13 @@ if __name__ == '__main__':
     books_df.to_csv('data/books_cleaned.csv', index=False)
     interactions_df.to_csv('data/user_interactions_cleaned.csv', index=False)
     
+    # Per-domain, time-sorted, dictionary-encoded interaction partitions
+    partition_paths = save_partitions(partition_interactions(interactions_df))
+    
     print("\n[OK] Cleaned datasets saved:")
     print("   - data/courses_cleaned.csv")
     print("   - data/books_cleaned.csv")
     print("   - data/user_interactions_cleaned.csv")
+    for path in partition_paths:
+        print(f"   - {path}")
 
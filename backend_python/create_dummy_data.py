@@ -1,19 +1,30 @@
 """
 Script to create dummy datasets for courses, books, and user interactions
+
+Generation is vectorized with NumPy and seedable. Interactions are produced
+and written in chunks of users, so very large datasets (100M+ interactions)
+are generated within bounded memory. The CSV schemas match the original
+50/50/20 dummy data.
+
+Examples:
+    python create_dummy_data.py
+    python create_dummy_data.py --courses 100000 --books 100000 --users 1000000 \\
+        --course-interactions 20 80 --book-interactions 10 40 --zipf 1.1 --vocab-size 5000
 """
-import pandas as pd
-import random
+import argparse
+import os
 import sys
 import io
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
 
 # Fix encoding for Windows console
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
-# Set random seed for reproducibility
-random.seed(42)
-
 # Categories
 course_categories = [
     "Programming", "Design", "Business", "Marketing", "Data Science",
@@ -44,114 +55,353 @@ authors = [
     "Stephen King", "Jane Austen", "Mark Twain"
 ]
 
-# Generate Courses
-courses_data = []
-for i in range(1, 51):  # 50 courses
-    category = random.choice(course_categories)
-    level = random.choice(levels)
-    rating = round(random.uniform(3.5, 5.0), 1)
-    enrolled = random.randint(50, 5000)
-    duration_hours = random.choice([2, 4, 6, 8, 10, 12, 16, 20])
-    
-    courses_data.append({
-        'id': f'course_{i}',
-        'title': f'{category} Course {i}: {random.choice(["Master", "Complete", "Advanced", "Essential"])} Guide',
-        'description': f'Learn {category.lower()} from scratch. This comprehensive course covers all essential topics and provides hands-on experience.',
-        'instructor': random.choice(instructors),
-        'duration': f'{duration_hours} hours',
-        'rating': rating,
-        'enrolledCount': enrolled,
-        'imageUrl': f'https://picsum.photos/400/300?random={i}',
+course_title_words = ["Master", "Complete", "Advanced", "Essential"]
+book_title_words = ["Complete", "Master", "Essential", "Advanced"]
+course_durations = [2, 4, 6, 8, 10, 12, 16, 20]
+
+SYLLABLES = np.array([
+    'ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pra',
+    'qua', 'ster', 'lin', 'dor', 'fen', 'gra', 'hul', 'jex', 'ment', 'tion'
+])
+
+INTERACTION_COLUMNS = [
+    'user_id', 'item_id', 'item_type', 'rating', 'completed',
+    'time_spent_minutes', 'timestamp', 'pages_read'
+]
+
+
+def zipf_weights(n: int, skew: float) -> Optional[np.ndarray]:
+    """Popularity weights proportional to 1 / rank**skew (None means uniform)"""
+    if skew <= 0:
+        return None
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** skew
+    return weights / weights.sum()
+
+
+def make_vocabulary(size: int, rng: np.random.Generator) -> np.ndarray:
+    """Synthetic vocabulary of `size` distinct pronounceable words"""
+    words = set()
+    length = 2
+    while len(words) < size:
+        need = (size - len(words)) * 2
+        parts = SYLLABLES[rng.integers(0, len(SYLLABLES), size=(need, length))]
+        words.update(''.join(p) for p in parts)
+        length += 1
+    # Sort first so the draw is reproducible, then pick uniformly
+    return rng.permutation(np.array(sorted(words)))[:size]
+
+
+def extra_text(n: int, vocabulary: Optional[np.ndarray], words: int,
+               rng: np.random.Generator) -> np.ndarray:
+    """Per-item text sampled Zipf-ly from the vocabulary (empty without one)"""
+    if vocabulary is None or words <= 0:
+        return np.full(n, '', dtype=object)
+    weights = zipf_weights(len(vocabulary), 1.0)
+    picks = vocabulary[rng.choice(len(vocabulary), size=(n, words), p=weights)]
+    return np.array([' ' + ' '.join(row) for row in picks], dtype=object)
+
+
+def _prices(n: int, high: float, paid_share: float, rng: np.random.Generator) -> np.ndarray:
+    prices = np.round(rng.uniform(0, high, size=n), 2)
+    return np.where(rng.random(n) > 1 - paid_share, prices, 0.0)
+
+
+def generate_courses(n: int, rng: np.random.Generator,
+                     vocabulary: Optional[np.ndarray] = None, words: int = 0) -> pd.DataFrame:
+    """Generate `n` courses"""
+    ids = np.arange(1, n + 1).astype(str).astype(object)
+    category = np.array(course_categories, dtype=object)[rng.integers(0, len(course_categories), n)]
+    title_word = np.array(course_title_words, dtype=object)[rng.integers(0, len(course_title_words), n)]
+    duration = np.array(course_durations)[rng.integers(0, len(course_durations), n)]
+    lower = np.array([c.lower() for c in category], dtype=object)
+
+    courses_df = pd.DataFrame({
+        'id': 'course_' + ids,
+        'title': category + ' Course ' + ids + ': ' + title_word + ' Guide',
+        'description': 'Learn ' + lower + ' from scratch. This comprehensive course covers '
+                       'all essential topics and provides hands-on experience.'
+                       + extra_text(n, vocabulary, words, rng),
+        'instructor': np.array(instructors, dtype=object)[rng.integers(0, len(instructors), n)],
+        'duration': duration.astype(str).astype(object) + ' hours',
+        'rating': np.round(rng.uniform(3.5, 5.0, n), 1),
+        'enrolledCount': rng.integers(50, 5001, n),
+        'imageUrl': 'https://picsum.photos/400/300?random=' + ids,
         'category': category,
-        'level': level,
-        'price': round(random.uniform(0, 199.99), 2) if random.random() > 0.3 else 0,
-        'isFree': random.random() > 0.7,
+        'level': np.array(levels, dtype=object)[rng.integers(0, len(levels), n)],
+        'price': _prices(n, 199.99, 0.7, rng),
     })
+    courses_df['isFree'] = courses_df['price'] == 0
+    return courses_df
+
 
-courses_df = pd.DataFrame(courses_data)
-courses_df['isFree'] = courses_df['price'] == 0
-
-# Generate Books
-books_data = []
-for i in range(1, 51):  # 50 books
-    category = random.choice(book_categories)
-    rating = round(random.uniform(3.5, 5.0), 1)
-    pages = random.randint(150, 800)
-    year = random.randint(1990, 2024)
-    
-    books_data.append({
-        'id': f'book_{i}',
-        'title': f'{category} Book {i}: {random.choice(["Complete", "Master", "Essential", "Advanced"])} Guide',
-        'author': random.choice(authors),
-        'description': f'An in-depth exploration of {category.lower()} concepts and practices. Perfect for both beginners and experienced professionals.',
-        'rating': rating,
-        'pageCount': pages,
-        'imageUrl': f'https://picsum.photos/400/600?random={i+100}',
+def generate_books(n: int, rng: np.random.Generator,
+                   vocabulary: Optional[np.ndarray] = None, words: int = 0) -> pd.DataFrame:
+    """Generate `n` books"""
+    ids = np.arange(1, n + 1).astype(str).astype(object)
+    category = np.array(book_categories, dtype=object)[rng.integers(0, len(book_categories), n)]
+    title_word = np.array(book_title_words, dtype=object)[rng.integers(0, len(book_title_words), n)]
+    lower = np.array([c.lower() for c in category], dtype=object)
+
+    books_df = pd.DataFrame({
+        'id': 'book_' + ids,
+        'title': category + ' Book ' + ids + ': ' + title_word + ' Guide',
+        'author': np.array(authors, dtype=object)[rng.integers(0, len(authors), n)],
+        'description': 'An in-depth exploration of ' + lower + ' concepts and practices. '
+                       'Perfect for both beginners and experienced professionals.'
+                       + extra_text(n, vocabulary, words, rng),
+        'rating': np.round(rng.uniform(3.5, 5.0, n), 1),
+        'pageCount': rng.integers(150, 801, n),
+        'imageUrl': 'https://picsum.photos/400/600?random=' + (np.arange(1, n + 1) + 100).astype(str).astype(object),
         'category': category,
-        'language': random.choice(languages),
-        'price': round(random.uniform(0, 49.99), 2) if random.random() > 0.2 else 0,
-        'isFree': random.random() > 0.8,
-        'publishedYear': year,
+        'language': np.array(languages, dtype=object)[rng.integers(0, len(languages), n)],
+        'price': _prices(n, 49.99, 0.8, rng),
+        'publishedYear': rng.integers(1990, 2025, n),
     })
+    books_df['isFree'] = books_df['price'] == 0
+    # Keep the original column order with isFree before publishedYear
+    return books_df[['id', 'title', 'author', 'description', 'rating', 'pageCount', 'imageUrl',
+                     'category', 'language', 'price', 'isFree', 'publishedYear']]
+
+
+# Top-up rounds that redraw duplicate picks before the remaining short users
+# are filled one at a time without replacement
+TOP_UP_ROUNDS = 8
 
-books_df = pd.DataFrame(books_data)
-books_df['isFree'] = books_df['price'] == 0
-
-# Generate User Interactions
-user_interactions = []
-user_ids = [f'user_{i}' for i in range(1, 21)]  # 20 users
-
-for user_id in user_ids:
-    # Each user interacts with 5-15 courses
-    num_courses = random.randint(5, 15)
-    selected_courses = random.sample(courses_data, num_courses)
-    
-    for course in selected_courses:
-        completed = random.random() > 0.4
-        rating = random.randint(3, 5) if completed else random.randint(1, 4)
-        time_spent = random.randint(30, duration_hours * 60) if completed else random.randint(10, duration_hours * 30)
-        
-        user_interactions.append({
-            'user_id': user_id,
-            'item_id': course['id'],
+
+def _sample_pairs(users: np.ndarray, counts_range: Tuple[int, int], n_items: int,
+                  weights: Optional[np.ndarray], rng: np.random.Generator,
+                  affinity: float = 0.0, item_groups: Optional[np.ndarray] = None
+                  ) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct (user, item) pairs, `counts_range` items per user
+
+    With `affinity` > 0 each user gets a preferred group (category), and that
+    share of their draws comes from items in the group. Draws are with
+    replacement for speed; repeated picks of an item by the same user are
+    redrawn so every user still reaches their sampled count.
+    """
+    low, high = counts_range
+    high = min(high, n_items)
+    low = min(low, high)
+    target = rng.integers(low, high + 1, size=len(users))
+    preferred = None
+    groups = []
+    if affinity > 0 and item_groups is not None:
+        n_groups = int(item_groups.max()) + 1
+        preferred = rng.integers(0, n_groups, size=len(users))
+        for group in range(n_groups):
+            members = np.flatnonzero(item_groups == group)
+            p = None if weights is None else weights[members] / weights[members].sum()
+            groups.append((members, p))
+
+    def draw(per_user: np.ndarray) -> np.ndarray:
+        """Keys (user position * n_items + item) for `per_user` draws each"""
+        user_pos = np.repeat(np.arange(len(users)), per_user)
+        if weights is None:
+            item_idx = rng.integers(0, n_items, size=len(user_pos))
+        else:
+            item_idx = rng.choice(n_items, size=len(user_pos), p=weights)
+        if preferred is not None:
+            biased = rng.random(len(user_pos)) < affinity
+            user_group = preferred[user_pos]
+            for group, (members, p) in enumerate(groups):
+                mask = biased & (user_group == group)
+                if len(members) == 0 or not mask.any():
+                    continue
+                item_idx[mask] = rng.choice(members, size=int(mask.sum()), p=p)
+        return user_pos.astype(np.int64) * n_items + item_idx
+
+    keys = np.unique(draw(target))
+    for _ in range(TOP_UP_ROUNDS):
+        short = target - np.bincount(keys // n_items, minlength=len(users))
+        if not short.any():
+            break
+        keys = np.unique(np.concatenate([keys, draw(short)]))
+    else:
+        # Heavy skew with counts close to n_items: fill the stragglers exactly
+        short = target - np.bincount(keys // n_items, minlength=len(users))
+        extra = []
+        for pos in np.flatnonzero(short):
+            taken = keys[(keys >= pos * n_items) & (keys < (pos + 1) * n_items)] % n_items
+            free = np.setdiff1d(np.arange(n_items), taken, assume_unique=True)
+            p = None if weights is None else weights[free] / weights[free].sum()
+            extra.append(pos * n_items + rng.choice(free, size=int(short[pos]), replace=False, p=p))
+        if extra:
+            keys = np.unique(np.concatenate([keys, *extra]))
+    return users[keys // n_items], keys % n_items
+
+
+def _timestamps(n: int, reference: np.datetime64, rng: np.random.Generator) -> np.ndarray:
+    days = rng.integers(0, 181, size=n).astype('timedelta64[D]')
+    return np.datetime_as_string(reference - days, unit='us')
+
+
+def iter_interactions(
+    courses_df: pd.DataFrame,
+    books_df: pd.DataFrame,
+    n_users: int,
+    rng: np.random.Generator,
+    course_range: Tuple[int, int] = (5, 15),
+    book_range: Tuple[int, int] = (3, 10),
+    skew: float = 0.0,
+    chunk_users: int = 20_000,
+    reference: Optional[datetime] = None,
+    affinity: float = 0.0
+) -> Iterator[pd.DataFrame]:
+    """Yield interaction frames for consecutive chunks of users"""
+    reference = np.datetime64(reference or datetime.now(), 'us')
+    course_ids = courses_df['id'].to_numpy(dtype=object)
+    course_hours = courses_df['duration'].str.split().str[0].astype(int).to_numpy()
+    book_ids = books_df['id'].to_numpy(dtype=object)
+    page_counts = books_df['pageCount'].to_numpy()
+    course_weights = zipf_weights(len(course_ids), skew)
+    book_weights = zipf_weights(len(book_ids), skew)
+    # Popularity rank is independent of item id
+    course_rank = rng.permutation(len(course_ids))
+    book_rank = rng.permutation(len(book_ids))
+    # Category code of each draw index, for user affinity
+    course_groups = pd.factorize(courses_df['category'])[0][course_rank]
+    book_groups = pd.factorize(books_df['category'])[0][book_rank]
+
+    for first in range(0, n_users, chunk_users):
+        users = np.arange(first, min(first + chunk_users, n_users))
+
+        c_users, c_items = _sample_pairs(
+            users, course_range, len(course_ids), course_weights, rng, affinity, course_groups
+        )
+        c_items = course_rank[c_items]
+        n = len(c_items)
+        completed = rng.random(n) > 0.4
+        hours = course_hours[c_items]
+        time_spent = np.where(
+            completed,
+            rng.integers(30, np.maximum(hours * 60, 31) + 1),
+            rng.integers(10, np.maximum(hours * 30, 11) + 1)
+        )
+        courses = pd.DataFrame({
+            'user': c_users,
+            'order': 0,
+            'item_id': course_ids[c_items],
             'item_type': 'course',
-            'rating': rating,
+            'rating': np.where(completed, rng.integers(3, 6, n), rng.integers(1, 5, n)),
             'completed': completed,
-            'time_spent_minutes': time_spent,
-            'timestamp': (datetime.now() - timedelta(days=random.randint(0, 180))).isoformat(),
+            'time_spent_minutes': time_spent.astype(float),
+            'timestamp': _timestamps(n, reference, rng),
+            'pages_read': np.nan,
         })
-    
-    # Each user interacts with 3-10 books
-    num_books = random.randint(3, 10)
-    selected_books = random.sample(books_data, num_books)
-    
-    for book in selected_books:
-        completed = random.random() > 0.5
-        rating = random.randint(3, 5) if completed else random.randint(1, 4)
-        pages_read = book['pageCount'] if completed else random.randint(10, book['pageCount'] // 2)
-        
-        user_interactions.append({
-            'user_id': user_id,
-            'item_id': book['id'],
+
+        b_users, b_items = _sample_pairs(
+            users, book_range, len(book_ids), book_weights, rng, affinity, book_groups
+        )
+        b_items = book_rank[b_items]
+        n = len(b_items)
+        completed = rng.random(n) > 0.5
+        pages = page_counts[b_items]
+        books = pd.DataFrame({
+            'user': b_users,
+            'order': 1,
+            'item_id': book_ids[b_items],
             'item_type': 'book',
-            'rating': rating,
+            'rating': np.where(completed, rng.integers(3, 6, n), rng.integers(1, 5, n)),
             'completed': completed,
-            'pages_read': pages_read,
-            'timestamp': (datetime.now() - timedelta(days=random.randint(0, 180))).isoformat(),
+            'time_spent_minutes': np.nan,
+            'timestamp': _timestamps(n, reference, rng),
+            'pages_read': np.where(completed, pages, rng.integers(10, pages // 2 + 1)).astype(float),
         })
 
-interactions_df = pd.DataFrame(user_interactions)
+        # Per user: courses first, then books, as in the original generator
+        chunk = pd.concat([courses, books], ignore_index=True)
+        chunk = chunk.sort_values(['user', 'order'], kind='stable')
+        chunk.insert(0, 'user_id', 'user_' + (chunk['user'] + 1).astype(str))
+        yield chunk[INTERACTION_COLUMNS]
+
+
+def write_interactions(chunks: Iterator[pd.DataFrame], path: str) -> int:
+    """Stream interaction chunks to one CSV; return the number of rows"""
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=(i == 0), index=False)
+            rows += len(chunk)
+    if rows == 0:
+        pd.DataFrame(columns=INTERACTION_COLUMNS).to_csv(path, index=False)
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate dummy courses, books and user interactions")
+    parser.add_argument('--courses', type=int, default=50, help="Number of courses")
+    parser.add_argument('--books', type=int, default=50, help="Number of books")
+    parser.add_argument('--users', type=int, default=20, help="Number of users")
+    parser.add_argument('--course-interactions', type=int, nargs=2, default=[5, 15],
+                        metavar=('MIN', 'MAX'), help="Courses per user")
+    parser.add_argument('--book-interactions', type=int, nargs=2, default=[3, 10],
+                        metavar=('MIN', 'MAX'), help="Books per user")
+    parser.add_argument('--zipf', type=float, default=0.0,
+                        help="Popularity skew exponent (0 = uniform)")
+    parser.add_argument('--affinity', type=float, default=0.0,
+                        help="Share of each user's picks from a preferred category (0 = none)")
+    parser.add_argument('--vocab-size', type=int, default=0,
+                        help="Extra description vocabulary size (0 = template text only)")
+    parser.add_argument('--description-words', type=int, default=20,
+                        help="Extra vocabulary words per description")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-users', type=int, default=20_000,
+                        help="Users generated per chunk (bounds memory)")
+    parser.add_argument('--reference-date', default=None,
+                        help="ISO timestamp interactions count back from (default: now)")
+    parser.add_argument('--output-dir', default='data')
+    return parser.parse_args(argv)
+
+
+def generate_datasets(args):
+    """Catalog frames and the interaction chunk iterator for parsed args"""
+    rng = np.random.default_rng(args.seed)
+    reference = datetime.fromisoformat(args.reference_date) if args.reference_date else None
+    vocabulary = make_vocabulary(args.vocab_size, rng) if args.vocab_size > 0 else None
+
+    courses_df = generate_courses(args.courses, rng, vocabulary, args.description_words)
+    books_df = generate_books(args.books, rng, vocabulary, args.description_words)
+    interactions = iter_interactions(
+        courses_df, books_df, args.users, rng,
+        course_range=tuple(args.course_interactions),
+        book_range=tuple(args.book_interactions),
+        skew=args.zipf,
+        chunk_users=args.chunk_users,
+        reference=reference,
+        affinity=args.affinity
+    )
+    return courses_df, books_df, interactions
+
+
+def output_paths(output_dir: str) -> Tuple[str, str, str]:
+    """Paths of the courses, books and interactions CSVs"""
+    return (
+        os.path.join(output_dir, 'courses.csv'),
+        os.path.join(output_dir, 'books.csv'),
+        os.path.join(output_dir, 'user_interactions.csv'),
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    courses_df, books_df, interactions = generate_datasets(args)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    courses_path, books_path, interactions_path = output_paths(args.output_dir)
+
+    # Save to CSV
+    courses_df.to_csv(courses_path, index=False)
+    books_df.to_csv(books_path, index=False)
+    n_interactions = write_interactions(interactions, interactions_path)
 
-# Save to CSV
-courses_df.to_csv('data/courses.csv', index=False)
-books_df.to_csv('data/books.csv', index=False)
-interactions_df.to_csv('data/user_interactions.csv', index=False)
+    print(f"[OK] Created {len(courses_df)} courses")
+    print(f"[OK] Created {len(books_df)} books")
+    print(f"[OK] Created {n_interactions} user interactions")
+    print(f"\nFiles saved to {args.output_dir}/ directory:")
+    print(f"   - {courses_path}")
+    print(f"   - {books_path}")
+    print(f"   - {interactions_path}")
 
-print(f"[OK] Created {len(courses_df)} courses")
-print(f"[OK] Created {len(books_df)} books")
-print(f"[OK] Created {len(interactions_df)} user interactions")
-print("\nFiles saved to data/ directory:")
-print("   - data/courses.csv")
-print("   - data/books.csv")
-print("   - data/user_interactions.csv")
 
+if __name__ == '__main__':
+    main()
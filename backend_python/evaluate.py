@@ -0,0 +1,298 @@
+"""
+Offline evaluation of RecommendationEngine quality and speed
+
+Splits interactions by time (each user's most recent interaction, or
+everything after a cutoff), trains every requested variant on the earlier
+part, and asks the engine for top-k recommendations for each evaluated
+user. Reports precision@k, recall@k, NDCG@k, hit rate and catalog coverage
+next to per-user latency percentiles. Users are scored in batches on a
+process pool.
+
+Variants:
+    similarity       item-item scorer over the full similarity matrix
+    similarity@K     item-item scorer keeping each item's K nearest neighbours
+    als@F            implicit ALS with F factors
+    top-rated        non-personalised baseline
+
+Examples:
+    python evaluate.py
+    python evaluate.py --item-type book --variants als@16 als@32 als@64 --k 20
+    python evaluate.py --data-dir data_eval --split time --test-days 30 --workers 4
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import io
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+import clean_data
+import train_model
+from interactions import InteractionPartition, partition_interactions
+from recommendation_engine import FactorScorer, RecommendationEngine
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+DEFAULT_VARIANTS = ['top-rated', 'similarity', 'als@32']
+
+# Per-process state for pool workers
+_worker_engine = None
+_worker_item_type = None
+
+
+def leave_last_out(partition: InteractionPartition, n: int = 1
+                   ) -> Tuple[InteractionPartition, Dict[str, Set[str]]]:
+    """Hold out each user's `n` most recent interactions
+
+    Users with no more than `n` interactions stay entirely in training.
+    """
+    df = partition.to_frame()  # time-sorted
+    position_from_end = df.groupby('user_id').cumcount(ascending=False)
+    counts = df['user_id'].map(df['user_id'].value_counts())
+    test_mask = (position_from_end < n) & (counts > n)
+    return _split(partition.item_type, df, test_mask.to_numpy())
+
+
+def time_split(partition: InteractionPartition, cutoff) -> Tuple[InteractionPartition, Dict[str, Set[str]]]:
+    """Train on interactions before `cutoff`, test on the rest
+
+    Only users seen before the cutoff are evaluated.
+    """
+    df = partition.to_frame()
+    rows = partition.between(cutoff, None)
+    test_mask = np.zeros(len(df), dtype=bool)
+    test_mask[rows] = True
+    known = set(df['user_id'][~test_mask])
+    test_mask &= df['user_id'].isin(known).to_numpy()
+    return _split(partition.item_type, df, test_mask)
+
+
+def _split(item_type: str, df: pd.DataFrame, test_mask: np.ndarray):
+    train = InteractionPartition.from_frame(item_type, df[~test_mask])
+    held_out: Dict[str, Set[str]] = {}
+    for user, item in zip(df['user_id'][test_mask], df['item_id'][test_mask]):
+        held_out.setdefault(user, set()).add(item)
+    return train, held_out
+
+
+def prune_similarity(similarity: np.ndarray, neighbours: int) -> np.ndarray:
+    """Keep each row's `neighbours` largest similarities, zero the rest"""
+    if neighbours >= similarity.shape[1]:
+        return similarity
+    keep = np.argpartition(-similarity, neighbours, axis=1)[:, :neighbours]
+    rows = np.arange(similarity.shape[0])[:, None]
+    pruned = np.zeros_like(similarity)
+    pruned[rows, keep] = similarity[rows, keep]
+    return pruned
+
+
+def build_engines(variants: List[str], item_type: str, items_df: pd.DataFrame,
+                  train: InteractionPartition) -> Dict[str, Tuple[RecommendationEngine, float]]:
+    """Train each variant on the training partition; name -> (engine, train seconds)"""
+    prefix = 'course' if item_type == 'course' else 'book'
+    matrix_name = 'user_item_matrix' if item_type == 'course' else 'book_user_item_matrix'
+    trainer = (train_model.train_course_recommendation_model if item_type == 'course'
+               else train_model.train_book_recommendation_model)
+
+    # The trained artifacts are kept in memory; the files the trainer writes are not needed
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='focus-eval-') as model_dir, contextlib.redirect_stdout(io.StringIO()):
+        _, similarity, trained_df, matrix = trainer(items_df, train, model_dir)
+    similarity_seconds = time.perf_counter() - start
+
+    engines = {}
+    for variant in variants:
+        name, _, arg = variant.partition('@')
+        artifacts = {f'{prefix}s_df': trained_df, f'{prefix}_similarity': similarity, matrix_name: matrix}
+        seconds = similarity_seconds
+        if name == 'top-rated':
+            # No personalisation: every user takes the top-rated path
+            artifacts[matrix_name] = matrix.iloc[0:0]
+            seconds = 0.0
+        elif name == 'similarity':
+            if arg:
+                start = time.perf_counter()
+                artifacts[f'{prefix}_similarity'] = prune_similarity(similarity, int(arg))
+                seconds += time.perf_counter() - start
+        elif name == 'als':
+            start = time.perf_counter()
+            model = train_model.build_als_model(train, factors=int(arg or train_model.ALS_FACTORS))
+            artifacts[f'{prefix}_scorer'] = FactorScorer(model, trained_df)
+            seconds = time.perf_counter() - start
+        else:
+            raise ValueError(f"Unknown variant: {variant}")
+        engines[variant] = (RecommendationEngine.from_artifacts(**artifacts), seconds)
+    return engines
+
+
+def _init_worker(engine, item_type):
+    global _worker_engine, _worker_item_type
+    _worker_engine = engine
+    _worker_item_type = item_type
+
+
+def _recommend(engine, item_type, user_id, k) -> List[str]:
+    if item_type == 'course':
+        return engine.recommend_courses(user_id=user_id, limit=k)['id'].tolist()
+    return engine.recommend_books(user_id=user_id, limit=k)['id'].tolist()
+
+
+def _score_batch(users: List[str], k: int) -> List[Tuple[str, List[str], float]]:
+    """Top-k ids and wall time for each user of a batch"""
+    results = []
+    for user in users:
+        start = time.perf_counter()
+        ids = _recommend(_worker_engine, _worker_item_type, user, k)
+        results.append((user, ids, time.perf_counter() - start))
+    return results
+
+
+def score_users(engine, item_type: str, users: List[str], k: int, workers: int, batch_size: int):
+    """Recommendations and latency for every user, batched over a process pool"""
+    batches = [users[i:i + batch_size] for i in range(0, len(users), batch_size)]
+    if workers <= 1:
+        _init_worker(engine, item_type)
+        return [row for batch in batches for row in _score_batch(batch, k)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(engine, item_type)) as pool:
+        return [row for rows in pool.map(_score_batch, batches, [k] * len(batches)) for row in rows]
+
+
+def quality(results, held_out: Dict[str, Set[str]], k: int, n_items: int) -> Dict[str, float]:
+    precision = recall = ndcg = hits = 0.0
+    recommended: Set[str] = set()
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    for user, ids, _ in results:
+        relevant = held_out[user]
+        gains = np.array([item in relevant for item in ids[:k]], dtype=float)
+        found = gains.sum()
+        precision += found / k
+        recall += found / len(relevant)
+        ideal = discounts[:min(len(relevant), k)].sum()
+        ndcg += (gains * discounts[:len(gains)]).sum() / ideal
+        hits += found > 0
+        recommended.update(ids[:k])
+    n = max(len(results), 1)
+    return {
+        'precision': precision / n,
+        'recall': recall / n,
+        'ndcg': ndcg / n,
+        'hit_rate': hits / n,
+        'coverage': len(recommended) / max(n_items, 1),
+    }
+
+
+def latency(results) -> Dict[str, float]:
+    samples = np.sort([seconds for _, _, seconds in results]) * 1000
+    if len(samples) == 0:
+        return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'mean_ms': 0.0}
+    return {
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'mean_ms': float(samples.mean()),
+    }
+
+
+def load_data(data_dir: str, item_type: str) -> Tuple[pd.DataFrame, InteractionPartition]:
+    """Catalog and interaction partition from cleaned CSVs, cleaning raw ones if needed"""
+    name = 'courses' if item_type == 'course' else 'books'
+    cleaner = clean_data.clean_courses if item_type == 'course' else clean_data.clean_books
+    cleaned = os.path.join(data_dir, f'{name}_cleaned.csv')
+    if os.path.exists(cleaned):
+        items_df = pd.read_csv(cleaned)
+    else:
+        items_df = cleaner(pd.read_csv(os.path.join(data_dir, f'{name}.csv')))
+
+    cleaned = os.path.join(data_dir, 'user_interactions_cleaned.csv')
+    if os.path.exists(cleaned):
+        interactions_df = pd.read_csv(cleaned)
+    else:
+        interactions_df = clean_data.clean_interactions(
+            pd.read_csv(os.path.join(data_dir, 'user_interactions.csv'))
+        )
+    return items_df, partition_interactions(interactions_df)[item_type]
+
+
+def evaluate(args) -> Dict:
+    items_df, partition = load_data(args.data_dir, args.item_type)
+    if args.split == 'time':
+        if args.cutoff:
+            cutoff = pd.Timestamp(args.cutoff)
+        else:
+            cutoff = pd.Timestamp(partition.timestamps[-1]) - pd.Timedelta(days=args.test_days)
+        train, held_out = time_split(partition, cutoff)
+    else:
+        train, held_out = leave_last_out(partition, args.holdout)
+
+    users = sorted(held_out)
+    if args.max_users and len(users) > args.max_users:
+        rng = np.random.default_rng(args.seed)
+        users = sorted(rng.choice(users, size=args.max_users, replace=False))
+    print(f"[*] {args.item_type}: {len(items_df)} items, {len(train)} training interactions, "
+          f"{len(users)} users evaluated ({args.split} split)")
+
+    report = {'split': args.split, 'k': args.k, 'users': len(users), 'variants': {}}
+    for variant, (engine, train_seconds) in build_engines(
+            args.variants, args.item_type, items_df, train).items():
+        start = time.perf_counter()
+        results = score_users(engine, args.item_type, users, args.k, args.workers, args.batch_size)
+        wall = time.perf_counter() - start
+        report['variants'][variant] = {
+            **quality(results, held_out, args.k, len(items_df)),
+            **latency(results),
+            'train_s': train_seconds,
+            'eval_wall_s': wall,
+        }
+    return report
+
+
+def print_report(report: Dict):
+    k = report['k']
+    print(f"\n{'variant':<16} {f'P@{k}':>7} {f'R@{k}':>7} {f'NDCG@{k}':>8} {'hit':>6} {'cover':>6} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'train s':>8}")
+    for name, row in report['variants'].items():
+        print(f"{name:<16} {row['precision']:>7.4f} {row['recall']:>7.4f} {row['ndcg']:>8.4f} "
+              f"{row['hit_rate']:>6.3f} {row['coverage']:>6.3f} {row['p50_ms']:>9.3f} "
+              f"{row['p95_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['train_s']:>8.3f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--item-type', choices=['course', 'book'], default='course')
+    parser.add_argument('--variants', nargs='+', default=DEFAULT_VARIANTS)
+    parser.add_argument('--split', choices=['last', 'time'], default='last')
+    parser.add_argument('--holdout', type=int, default=1, help="Interactions held out per user (last split)")
+    parser.add_argument('--cutoff', default=None, help="ISO timestamp starting the test period (time split)")
+    parser.add_argument('--test-days', type=int, default=30, help="Test period length when no cutoff is given")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--max-users', type=int, default=0, help="Evaluate a random sample (0 = all users)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Also write the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = evaluate(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[OK] Report saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
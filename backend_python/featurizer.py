@@ -0,0 +1,110 @@
+"""
+Vocabulary-free hashing TF-IDF featurizer
+
+Tokens and word n-grams are hashed into a fixed number of columns with
+zlib.crc32, so embedding a new document needs no vocabulary and no refit.
+Only the IDF weights are learned, once, at training time. Rows are
+l2-normalised, so a dot product between two rows is their cosine similarity.
+"""
+import re
+import zlib
+from typing import Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Columns joined into the text each item type is embedded from
+FEATURE_COLUMNS = {
+    'course': ['title', 'description', 'category', 'level', 'instructor'],
+    'book': ['title', 'description', 'category', 'author'],
+}
+
+
+def feature_text(df: pd.DataFrame, item_type: str) -> pd.Series:
+    """Space-joined feature columns of each row"""
+    columns = FEATURE_COLUMNS[item_type]
+    text = df[columns[0]]
+    for column in columns[1:]:
+        text = text + ' ' + df[column]
+    return text
+
+
+def record_text(record: dict, item_type: str) -> str:
+    """feature_text for a single record"""
+    return ' '.join(str(record[column]) for column in FEATURE_COLUMNS[item_type])
+
+
+class HashingFeaturizer:
+    """Stateless hashed term counts, weighted by precomputed smoothed IDF"""
+
+    def __init__(self, n_features: int = 2 ** 18, ngram_range=(1, 2),
+                 stop_words: Iterable[str] = (), token_pattern: str = r'(?u)\b\w\w+\b'):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.stop_words = frozenset(stop_words)
+        self.token_pattern = token_pattern
+        self._token_re = re.compile(token_pattern)
+        self.n_documents = 0
+        self.idf = np.ones(n_features, dtype=np.float32)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_token_re']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._token_re = re.compile(self.token_pattern)
+
+    def columns(self, text: str) -> List[int]:
+        """Hashed column of every term occurrence in `text`"""
+        words = [w for w in self._token_re.findall(str(text).lower()) if w not in self.stop_words]
+        low, high = self.ngram_range
+        terms = []
+        for n in range(low, high + 1):
+            terms.extend(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+        return [zlib.crc32(term.encode('utf-8')) % self.n_features for term in terms]
+
+    def _counts(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        indptr, indices = [0], []
+        for text in texts:
+            indices.extend(self.columns(text))
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float32)
+        counts = sparse.csr_matrix(
+            (data, np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(texts), self.n_features)
+        )
+        counts.sum_duplicates()
+        return counts
+
+    def fit(self, texts: Sequence[str]) -> 'HashingFeaturizer':
+        """Learn IDF weights: ln((1 + n) / (1 + df)) + 1, as TfidfVectorizer does"""
+        counts = self._counts(texts)
+        document_frequency = np.bincount(counts.indices, minlength=self.n_features)
+        self.n_documents = len(texts)
+        self.idf = (np.log((1 + self.n_documents) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def transform(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        """l2-normalised TF-IDF rows"""
+        features = self._counts(texts)
+        features.data *= self.idf[features.indices]
+        norms = np.sqrt(np.asarray(features.multiply(features).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        features.data /= np.repeat(norms, np.diff(features.indptr)).astype(np.float32)
+        return features
+
+    def embed(self, text: str) -> sparse.csr_matrix:
+        """transform() for one document, without the batch overhead"""
+        columns, counts = np.unique(np.asarray(self.columns(text), dtype=np.int64), return_counts=True)
+        weights = counts * self.idf[columns]
+        norm = np.sqrt(weights @ weights) or 1.0
+        return sparse.csr_matrix(
+            ((weights / norm).astype(np.float32), columns, np.array([0, len(columns)])),
+            shape=(1, self.n_features)
+        )
+
+    def fit_transform(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        return self.fit(texts).transform(texts)
@@ -0,0 +1,250 @@
+"""
+HTTP caching for catalog endpoints: strong ETags, 304s and compressed bodies
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+from serialization import negotiate_format
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick 'br', 'gzip' or None (identity) from an Accept-Encoding header"""
+    offered = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[name] = q
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best = None
+    for name in candidates:
+        q = offered.get(name, offered.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (name, q)
+    return best[0] if best else None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Compress a response body with the negotiated encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+
+def make_etag(version: str, path: str, query_string: bytes, variant: str) -> str:
+    """Strong ETag from catalog version, path, normalized query and representation"""
+    query = urlencode(sorted(parse_qsl(query_string.decode('latin-1'), keep_blank_values=True)))
+    digest = hashlib.sha1(f'{version}|{path}|{query}'.encode()).hexdigest()[:20]
+    return f'"{digest}-{variant}"' if variant else f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison as required for If-None-Match
+
+    `*` is not matched here: it only applies when the resource exists, which
+    the caller has to establish first (see `is_wildcard`).
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def is_wildcard(if_none_match: Optional[str]) -> bool:
+    """True for `If-None-Match: *` (matches any current representation)"""
+    return bool(if_none_match) and any(c.strip() == '*' for c in if_none_match.split(','))
+
+
+class ResponseCache:
+    """Size-bounded LRU of encoded response bodies keyed by ETag
+
+    Shared by request handlers and the warm-up thread's event loop, so every
+    access goes through one lock.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, Dict[str, str]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, etag: str) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return entry
+
+    def put(self, etag: str, body: bytes, headers: Dict[str, str]):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if etag in self._entries:
+                self._bytes -= len(self._entries.pop(etag)[0])
+            self._entries[etag] = (body, headers)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (old_body, _) = self._entries.popitem(last=False)
+                self._bytes -= len(old_body)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "notModified": self.not_modified,
+            }
+
+
+class CatalogCacheMiddleware:
+    """ASGI middleware adding conditional GETs and compression to catalog routes
+
+    `version_for(path)` returns the catalog version backing a path, or None
+    for paths that must not be cached. Requests carrying any of
+    `uncacheable_params` (per-user query parameters) are never cached.
+    Matching If-None-Match requests get a 304 and cached bodies are replayed
+    without running the endpoint. `If-None-Match: *` only yields a 304 once
+    the resource is known to exist (cached or answered 200); errors such as
+    404 pass through.
+    """
+
+    def __init__(
+        self,
+        app,
+        version_for: Callable[[str], Optional[str]],
+        cache: ResponseCache,
+        max_age: int = 60,
+        uncacheable_params: Iterable[str] = ()
+    ):
+        self.app = app
+        self.version_for = version_for
+        self.cache = cache
+        self.uncacheable_params = frozenset(uncacheable_params)
+        self.cache_control = f'public, max-age={max_age}'
+
+    def _per_user(self, query_string: bytes) -> bool:
+        if not self.uncacheable_params or not query_string:
+            return False
+        names = {name for name, _ in parse_qsl(query_string.decode('latin-1'), keep_blank_values=True)}
+        return not names.isdisjoint(self.uncacheable_params)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'GET':
+            await self.app(scope, receive, send)
+            return
+        version = self.version_for(scope['path'])
+        if version is None or self._per_user(scope['query_string']):
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get('accept-encoding', ''))
+        media_type = negotiate_format(request_headers.get('accept'))
+        variant = media_type.rsplit('/', 1)[-1] + ('-' + encoding if encoding else '')
+        etag = make_etag(version, scope['path'], scope['query_string'], variant)
+        validators = {
+            'ETag': etag,
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept, Accept-Encoding',
+        }
+
+        if_none_match = request_headers.get('if-none-match')
+        if etag_matches(if_none_match, etag):
+            await self._not_modified(validators, scope, receive, send)
+            return
+        wildcard = is_wildcard(if_none_match)
+
+        # Cache-Control: no-cache on the request forces the handler to run
+        no_cache = 'no-cache' in request_headers.get('cache-control', '')
+        cached = None if no_cache else self.cache.get(etag)
+        if cached is not None:
+            if wildcard:
+                await self._not_modified(validators, scope, receive, send)
+                return
+            body, headers = cached
+            await Response(content=body, status_code=200, headers=headers)(scope, receive, send)
+            return
+
+        start_message = {}
+        chunks = []
+
+        async def capture(message):
+            if message['type'] == 'http.response.start':
+                start_message.update(message)
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.app(scope, receive, capture)
+        body = b''.join(chunks)
+        status = start_message.get('status', 500)
+        headers = MutableHeaders(raw=list(start_message.get('headers', [])))
+
+        if status != 200:
+            await Response(content=body, status_code=status, headers=dict(headers))(scope, receive, send)
+            return
+
+        if encoding and len(body) >= MIN_COMPRESS_SIZE:
+            body = compress(body, encoding)
+            headers['Content-Encoding'] = encoding
+        if 'content-length' in headers:
+            del headers['content-length']
+        headers.update(validators)
+
+        response_headers = dict(headers)
+        self.cache.put(etag, body, response_headers)
+        if wildcard:
+            await self._not_modified(validators, scope, receive, send)
+            return
+        await Response(content=body, status_code=200, headers=response_headers)(scope, receive, send)
+
+    async def _not_modified(self, validators: Dict[str, str], scope, receive, send):
+        self.cache.record_not_modified()
+        await Response(status_code=304, headers=validators)(scope, receive, send)
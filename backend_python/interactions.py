@@ -0,0 +1,159 @@
+"""
+Domain-partitioned interaction store
+
+Interactions are split by item_type at cleaning time. Each partition holds
+only its own domain's rows, with user and item ids dictionary-encoded to
+int32 codes and rows sorted by timestamp, and is saved as a NumPy .npz
+file (data/interactions/<item_type>.npz). Trainers and scorers read only
+their own partition, so the course matrix never carries book columns.
+"""
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+PARTITION_DIR = os.path.join('data', 'interactions')
+
+# Numeric columns kept per partition; missing columns are stored as zeros
+VALUE_COLUMNS = {
+    'rating': np.float32,
+    'completed': np.bool_,
+    'time_spent_minutes': np.float32,
+    'pages_read': np.float32,
+}
+
+
+class InteractionPartition:
+    """Interactions of one item type, time-sorted, with encoded ids"""
+
+    def __init__(self, item_type: str, users: np.ndarray, items: np.ndarray,
+                 user_codes: np.ndarray, item_codes: np.ndarray,
+                 timestamps: np.ndarray, values: Dict[str, np.ndarray]):
+        self.item_type = item_type
+        self.users = users            # code -> user_id
+        self.items = items            # code -> item_id
+        self.user_codes = user_codes
+        self.item_codes = item_codes
+        self.timestamps = timestamps  # datetime64[ns], ascending
+        self.values = values
+
+    def __len__(self):
+        return len(self.user_codes)
+
+    @classmethod
+    def from_frame(cls, item_type: str, df: pd.DataFrame) -> 'InteractionPartition':
+        """Encode and time-sort one domain's rows"""
+        if 'timestamp' in df.columns:
+            timestamps = pd.to_datetime(df['timestamp'], errors='coerce').to_numpy('datetime64[ns]')
+        else:
+            timestamps = np.zeros(len(df), dtype='datetime64[ns]')
+        order = np.argsort(timestamps, kind='stable')
+        user_codes, users = pd.factorize(df['user_id'].to_numpy()[order], sort=True)
+        item_codes, items = pd.factorize(df['item_id'].to_numpy()[order], sort=True)
+        values = {}
+        for column, dtype in VALUE_COLUMNS.items():
+            if column in df.columns:
+                values[column] = df[column].to_numpy()[order].astype(dtype)
+            else:
+                values[column] = np.zeros(len(df), dtype=dtype)
+        return cls(
+            item_type,
+            np.asarray(users, dtype=str), np.asarray(items, dtype=str),
+            user_codes.astype(np.int32), item_codes.astype(np.int32),
+            timestamps[order], values
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Decoded rows in the cleaned-CSV layout"""
+        df = pd.DataFrame({
+            'user_id': self.users[self.user_codes],
+            'item_id': self.items[self.item_codes],
+            'item_type': self.item_type,
+        })
+        for column, values in self.values.items():
+            df[column] = values
+        df['timestamp'] = self.timestamps
+        return df
+
+    def between(self, start=None, end=None) -> slice:
+        """Row range with start <= timestamp < end (rows are time-sorted)"""
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, np.datetime64(start, 'ns')))
+        hi = len(self) if end is None else int(np.searchsorted(self.timestamps, np.datetime64(end, 'ns')))
+        return slice(lo, hi)
+
+    def user_item_matrix(self, value: str = 'rating') -> pd.DataFrame:
+        """Dense users x items frame of mean `value`, 0 where unrated
+
+        Same layout as pivot_table(index='user_id', columns='item_id').fillna(0),
+        built with bincount instead of a groupby.
+        """
+        n_users, n_items = len(self.users), len(self.items)
+        flat = self.user_codes.astype(np.int64) * n_items + self.item_codes
+        size = n_users * n_items
+        totals = np.bincount(flat, weights=self.values[value], minlength=size)
+        counts = np.bincount(flat, minlength=size)
+        matrix = np.divide(totals, counts, out=np.zeros(size), where=counts > 0)
+        frame = pd.DataFrame(
+            matrix.reshape(n_users, n_items),
+            index=pd.Index(self.users, name='user_id'),
+            columns=pd.Index(self.items, name='item_id'),
+        )
+        return frame
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # np.savez appends .npz unless the path already has it
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                item_type=np.array(self.item_type),
+                users=self.users, items=self.items,
+                user_codes=self.user_codes, item_codes=self.item_codes,
+                timestamps=self.timestamps.astype('int64'),
+                **{f'value_{name}': values for name, values in self.values.items()}
+            )
+
+    @classmethod
+    def load(cls, path: str) -> 'InteractionPartition':
+        with np.load(path) as data:
+            values = {
+                key[len('value_'):]: data[key] for key in data.files if key.startswith('value_')
+            }
+            return cls(
+                str(data['item_type']),
+                data['users'], data['items'],
+                data['user_codes'], data['item_codes'],
+                data['timestamps'].astype('datetime64[ns]'),
+                values
+            )
+
+
+def partition_path(item_type: str, directory: str = PARTITION_DIR) -> str:
+    return os.path.join(directory, f'{item_type}.npz')
+
+
+def partition_interactions(df: pd.DataFrame) -> Dict[str, InteractionPartition]:
+    """Split cleaned interactions by item_type"""
+    return {
+        str(item_type): InteractionPartition.from_frame(str(item_type), group)
+        for item_type, group in df.groupby('item_type', sort=True)
+    }
+
+
+def save_partitions(partitions: Dict[str, InteractionPartition], directory: str = PARTITION_DIR):
+    """Write each partition to <directory>/<item_type>.npz; return the paths"""
+    paths = []
+    for item_type, partition in partitions.items():
+        path = partition_path(item_type, directory)
+        partition.save(path)
+        paths.append(path)
+    return paths
+
+
+def load_partition(item_type: str, directory: str = PARTITION_DIR) -> Optional[InteractionPartition]:
+    """The saved partition for one item type, or None if it was never written"""
+    path = partition_path(item_type, directory)
+    if not os.path.exists(path):
+        return None
+    return InteractionPartition.load(path)
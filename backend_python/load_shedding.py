@@ -0,0 +1,102 @@
+"""
+Admission control and load shedding for recommendation endpoints
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Weight of the newest sample in the service-time moving average
+EWMA_ALPHA = 0.2
+
+
+class AdmissionController:
+    """Concurrency limiter with a queue-time budget and a latency deadline.
+
+    Requests wait at most `queue_budget_ms` for one of `max_concurrency`
+    slots. A request that cannot get a slot in time, or that would miss
+    `deadline_ms` given the observed service time, is told to degrade so the
+    caller can serve a cheap fallback instead of queueing behind the spike.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        queue_budget_ms: Optional[float] = None,
+        deadline_ms: Optional[float] = None
+    ):
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('RECOMMENDATION_MAX_CONCURRENCY', '2'))
+        if queue_budget_ms is None:
+            queue_budget_ms = float(os.getenv('RECOMMENDATION_QUEUE_BUDGET_MS', '50'))
+        if deadline_ms is None:
+            deadline_ms = float(os.getenv('RECOMMENDATION_DEADLINE_MS', '250'))
+
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_budget = queue_budget_ms / 1000.0
+        self.deadline = deadline_ms / 1000.0
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._service_time = 0.0
+
+        self.admitted = 0
+        self.shed = 0
+        self.deadline_misses = 0
+        self.in_flight = 0
+
+    @property
+    def degraded(self) -> int:
+        """Number of requests answered with the fallback"""
+        return self.shed + self.deadline_misses
+
+    @contextmanager
+    def admit(self):
+        """Yield True when the full path may run, False when the caller should degrade"""
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.queue_budget):
+            with self._lock:
+                self.shed += 1
+            yield False
+            return
+
+        waited = time.monotonic() - start
+        # An idle worker always admits, so a stale estimate cannot lock it in degraded mode
+        if self.in_flight > 0 and waited + self._service_time > self.deadline:
+            self._slots.release()
+            with self._lock:
+                self.deadline_misses += 1
+            yield False
+            return
+
+        with self._lock:
+            self.admitted += 1
+            self.in_flight += 1
+        started = time.monotonic()
+        try:
+            yield True
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.in_flight -= 1
+                if self._service_time == 0.0:
+                    self._service_time = elapsed
+                else:
+                    self._service_time += EWMA_ALPHA * (elapsed - self._service_time)
+            self._slots.release()
+
+    def stats(self) -> Dict:
+        """Snapshot of the admission counters"""
+        with self._lock:
+            return {
+                "maxConcurrency": self.max_concurrency,
+                "queueBudgetMs": self.queue_budget * 1000.0,
+                "deadlineMs": self.deadline * 1000.0,
+                "inFlight": self.in_flight,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "deadlineMisses": self.deadline_misses,
+                "degraded": self.shed + self.deadline_misses,
+                "serviceTimeMs": round(self._service_time * 1000.0, 3),
+            }
@@ -2,14 +2,74 @@
 FastAPI application for Focus Learning App
 Provides courses, books, and recommendation endpoints
 """
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+import numpy as np
 import pandas as pd
 from typing import Optional, List
 import os
-from recommendation_engine import RecommendationEngine
+import threading
+import time
+from contextlib import asynccontextmanager
+from recommendation_engine import RecommendationEngine, ItemExists
+from load_shedding import AdmissionController
+from catalog import Catalog, InvalidCursor, MAX_PAGE_LIMIT
+from http_cache import CatalogCacheMiddleware, ResponseCache
+from serialization import render, InvalidFields, COURSE_DEFAULTS, BOOK_DEFAULTS
+from sharding import shard_from_env, SHARD_FETCH_LIMIT
+from metrics import MetricsMiddleware, registry, span, count_error
+from admin import require_admin
+import profiling
+from profiling import ProfileRequestMiddleware, SamplerBusy, profiled
+from startup import Startup, ReadinessMiddleware, warm_request
+from ranking import hybrid_rank, parse_weights, InvalidWeights, InvalidOffset, DEFAULT_WEIGHTS, MAX_OFFSET
 
-app = FastAPI(title="Focus Learning API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app):
+    # Load in the background so the server binds and answers /healthz at once
+    startup.start()
+    yield
+
+app = FastAPI(title="Focus Learning API", version="1.0.0", lifespan=lifespan)
+
+# Catalog routes served with ETags, 304s and compressed-body caching
+CACHEABLE_PATHS = {'/courses': 'courses', '/books': 'books'}
+UNCACHEABLE_PATHS = {'/courses/enrolled', '/books/reading'}
+
+def catalog_version_for(path: str) -> Optional[str]:
+    """Catalog version behind a cacheable GET path, None if not cacheable"""
+    if path in UNCACHEABLE_PATHS:
+        return None
+    root, _, item_id = path.lstrip('/').partition('/')
+    if '/' in item_id:
+        return None
+    name = CACHEABLE_PATHS.get('/' + root)
+    if name == 'courses':
+        return courses_catalog.version
+    if name == 'books':
+        return books_catalog.version
+    return None
+
+response_cache = ResponseCache()
+app.add_middleware(
+    CatalogCacheMiddleware,
+    version_for=catalog_version_for,
+    cache=response_cache,
+    max_age=int(os.getenv('CATALOG_MAX_AGE', '60')),
+    uncacheable_params=('personalize',)
+)
+
+# Catalogs and models load in the background (load_state and warm_up, below);
+# STARTUP_WARMUP=0 reports ready without the warm-up pass
+startup = Startup(
+    load=lambda: load_state(),
+    warm_up=(lambda: warm_up()) if os.getenv('STARTUP_WARMUP', '1') != '0' else None
+)
+
+# 503 until they are; inside CORS so browsers can read the response
+app.add_middleware(ReadinessMiddleware, startup=startup)
 
 # Enable CORS for Flutter web app
 app.add_middleware(
@@ -20,12 +80,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize recommendation engine
-try:
-    engine = RecommendationEngine()
-except Exception as e:
-    print(f"Warning: Could not load recommendation engine: {e}")
-    engine = None
+# Admin-only per-request cProfile (X-Profile: 1); a no-op unless ADMIN_TOKEN is set
+app.add_middleware(ProfileRequestMiddleware)
+
+# Outermost: request latency, status codes and in-flight counts
+app.add_middleware(MetricsMiddleware)
+
+# Shard this process serves (None: the whole catalog); see sharding.py and router.py
+SHARD = shard_from_env()
+
+# Recommendation engine, None until loaded or when no models are trained
+engine = None
+
+# Admission control in front of the recommendation endpoints
+admission = AdmissionController()
 
 # Load data
 def load_courses():
@@ -46,8 +114,86 @@ def load_books():
     else:
         return pd.DataFrame()
 
-courses_df = load_courses()
-books_df = load_books()
+# Columns with facet counts (and facet filters)
+COURSE_FACETS = ['category', 'level', 'isFree']
+BOOK_FACETS = ['category', 'language', 'isFree']
+
+# Relevance of a search match per column, for personalized ranking (others weigh 1)
+COURSE_SEARCH_WEIGHTS = {'title': 2.0}
+BOOK_SEARCH_WEIGHTS = {'title': 2.0, 'author': 2.0}
+
+def course_catalog(df: pd.DataFrame) -> Catalog:
+    return Catalog(df, search_columns=['title', 'description'], facet_columns=COURSE_FACETS,
+                   search_weights=COURSE_SEARCH_WEIGHTS)
+
+def book_catalog(df: pd.DataFrame) -> Catalog:
+    return Catalog(df, search_columns=['title', 'description', 'author'], facet_columns=BOOK_FACETS,
+                   search_weights=BOOK_SEARCH_WEIGHTS)
+
+# Catalog frames and presorted catalogs (cursor pagination, facet counts), filled by load_state
+courses_df = pd.DataFrame()
+books_df = pd.DataFrame()
+courses_catalog = course_catalog(courses_df)
+books_catalog = book_catalog(books_df)
+catalog_load_seconds = 0.0
+
+# Serializes catalog inserts; readers keep whichever frame they started with
+catalog_lock = threading.Lock()
+
+def load_state():
+    """Load catalogs and recommendation models (on the startup thread)
+
+    Missing models leave recommendations on the top-rated fallback; any
+    other failure fails startup.
+    """
+    global engine, courses_df, books_df, courses_catalog, books_catalog, catalog_load_seconds
+    catalog_load_start = time.perf_counter()
+    courses = load_courses()
+    books = load_books()
+    if SHARD is not None:
+        courses = SHARD.local(courses)
+        books = SHARD.local(books)
+    courses_index = course_catalog(courses)
+    books_index = book_catalog(books)
+    catalog_seconds = time.perf_counter() - catalog_load_start
+    
+    try:
+        loaded_engine = RecommendationEngine(shard=SHARD)
+    except FileNotFoundError:
+        print("[ERROR] Serving top-rated fallbacks instead of recommendations")
+        loaded_engine = None
+    
+    with catalog_lock:
+        courses_df, books_df = courses, books
+        courses_catalog, books_catalog = courses_index, books_index
+        catalog_load_seconds = catalog_seconds
+        engine = loaded_engine
+
+def warm_up():
+    """Send the hottest requests through the app once before reporting ready
+
+    Fills the response cache for first catalog pages and runs first-call
+    work (route compilation, lazy imports, numpy/pandas kernels) off the
+    request path.
+    """
+    paths = [
+        '/courses?limit=20', '/courses?limit=20&cursor=', '/courses/facets',
+        '/books?limit=20', '/books?limit=20&cursor=', '/books/facets',
+        '/recommendations/courses?limit=10', '/recommendations/books?limit=10',
+    ]
+    if engine is not None:
+        for matrix, path in ((engine.user_item_matrix, '/recommendations/courses'),
+                             (engine.book_user_item_matrix, '/recommendations/books')):
+            if len(matrix.index):
+                paths.append(f'{path}?user_id={matrix.index[0]}&limit=10')
+    for path in paths:
+        for headers in ([('accept-encoding', 'gzip')], [('accept', 'application/vnd.focus.columnar+json')]):
+            status = warm_request(app, path, headers)
+            if status >= 500:
+                print(f"[ERROR] Warm-up request {path} failed with {status}")
+
+# Page size cap; the router fetches offset + limit rows from each shard
+PAGE_LIMIT = MAX_PAGE_LIMIT if SHARD is None else SHARD_FETCH_LIMIT
 
 @app.get("/")
 def root():
@@ -62,56 +208,138 @@ def root():
         }
     }
 
+@app.get("/healthz")
+def healthz():
+    """Liveness: the worker is serving HTTP, whether or not it is ready"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once catalogs and models are loaded and warmed up, 503 before"""
+    body = startup.status()
+    body["engine"] = engine is not None
+    return JSONResponse(body, status_code=200 if startup.ready else 503)
+
+def personalized_page(item_type: str, catalog: Catalog, defaults: dict, user_id: str, filters: dict,
+                      search: Optional[str], offset: int, limit: int, cursor: Optional[str],
+                      weights: Optional[str], fields: Optional[str], accept: Optional[str]):
+    """One page of matches ranked for `user_id` in a single pass (see ranking.py)"""
+    if cursor is not None:
+        raise InvalidCursor("Cursor pagination is not supported with personalize; use offset")
+    if offset < 0:
+        raise InvalidOffset("offset must not be negative")
+    # Capped like limit: the ranking cost grows with offset + limit
+    offset = min(offset, MAX_OFFSET)
+    blend = parse_weights(weights) if weights else DEFAULT_WEIGHTS
+    with span('topk'):
+        positions, total, stats = hybrid_rank(
+            catalog, item_type, engine, user_id, filters, search, offset + limit, blend
+        )
+    return render(
+        catalog.sorted_df.iloc[positions[offset:]],
+        {"total": total, "limit": limit, "offset": offset, **stats},
+        defaults, fields, accept
+    )
+
 @app.get("/courses")
+@profiled
 def get_courses(
     category: Optional[str] = Query(None, description="Filter by category"),
     level: Optional[str] = Query(None, description="Filter by level"),
     search: Optional[str] = Query(None, description="Search in title and description"),
     limit: Optional[int] = Query(100, description="Limit results"),
-    offset: Optional[int] = Query(0, description="Offset for pagination")
+    offset: Optional[int] = Query(0, description="Offset for pagination"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor for keyset pagination (empty for first page)"),
+    personalize: Optional[str] = Query(None, description="User ID: rank matches by relevance, the user's tastes and rating"),
+    weights: Optional[str] = Query(None, description="Ranking weights with personalize, e.g. relevance=0.5,personal=0.3,rating=0.15,popularity=0.05"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    accept: Optional[str] = Header(None, description="application/json, application/vnd.focus.columnar+json or application/x-msgpack")
 ):
     """Get all courses with optional filtering"""
     try:
-        filtered_df = courses_df.copy()
-        
-        # Apply filters
+        limit = max(0, min(limit, PAGE_LIMIT))
+        filters = {}
         if category and category != 'All':
-            filtered_df = filtered_df[filtered_df['category'] == category]
-        
+            filters['category'] = category
         if level and level != 'All':
-            filtered_df = filtered_df[filtered_df['level'] == level]
+            filters['level'] = level
         
-        if search:
-            search_lower = search.lower()
-            mask = (
-                filtered_df['title'].str.lower().str.contains(search_lower, na=False) |
-                filtered_df['description'].str.lower().str.contains(search_lower, na=False)
-            )
-            filtered_df = filtered_df[mask]
+        if personalize is not None:
+            return personalized_page('course', courses_catalog, COURSE_DEFAULTS, personalize, filters,
+                                     search, offset, limit, cursor, weights, fields, accept)
         
-        # Pagination
-        total = len(filtered_df)
-        filtered_df = filtered_df.iloc[offset:offset+limit]
-        
-        # Convert to dict format expected by Flutter
-        courses = filtered_df.to_dict('records')
+        if cursor is not None:
+            with span('filter'):
+                page_df, next_cursor = courses_catalog.page(filters, search, cursor, limit)
+            return render(
+                page_df,
+                {"limit": limit, "nextCursor": next_cursor},
+                COURSE_DEFAULTS, fields, accept
+            )
         
-        # Ensure all required fields are present
-        for course in courses:
-            course.setdefault('isFree', course.get('price', 0) == 0)
-            course.setdefault('isEnrolled', False)
-            course.setdefault('progress', 0.0)
+        with span('filter'):
+            # Shards list in rating order so the router can merge their pages
+            filtered_df = courses_df if SHARD is None else courses_catalog.sorted_df
+            
+            # Apply filters
+            if category and category != 'All':
+                filtered_df = filtered_df[filtered_df['category'] == category]
+            
+            if level and level != 'All':
+                filtered_df = filtered_df[filtered_df['level'] == level]
+            
+            if search:
+                search_lower = search.lower()
+                mask = (
+                    filtered_df['title'].str.lower().str.contains(search_lower, na=False) |
+                    filtered_df['description'].str.lower().str.contains(search_lower, na=False)
+                )
+                filtered_df = filtered_df[mask]
+            
+            # Pagination
+            total = len(filtered_df)
+            filtered_df = filtered_df.iloc[offset:offset+limit]
         
-        return {
-            "data": courses,
-            "total": total,
-            "limit": limit,
-            "offset": offset
-        }
+        # Encode in the format expected by the client, with required fields present
+        return render(
+            filtered_df,
+            {"total": total, "limit": limit, "offset": offset},
+            COURSE_DEFAULTS, fields, accept
+        )
+    except (InvalidCursor, InvalidFields, InvalidWeights, InvalidOffset) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        count_error(e)
         raise HTTPException(status_code=500, detail=f"Error fetching courses: {str(e)}")
 
+def facet_filters(catalog: Catalog, values: dict) -> dict:
+    """Facet column -> filter value, skipping unset and 'All' filters"""
+    return {
+        column: str(value) for column, value in values.items()
+        if value is not None and value != 'All' and column in catalog.facets
+    }
+
+# Declared before /courses/{course_id} so "facets" is not taken for an id
+@app.get("/courses/facets")
+@profiled
+def get_course_facets(
+    category: Optional[str] = Query(None, description="Filter by category"),
+    level: Optional[str] = Query(None, description="Filter by level"),
+    is_free: Optional[bool] = Query(None, alias="isFree", description="Filter by free (true) or paid (false)"),
+    search: Optional[str] = Query(None, description="Search in title and description")
+):
+    """Number of courses per category, level and isFree value under the current filters"""
+    try:
+        filters = facet_filters(courses_catalog, {'category': category, 'level': level, 'isFree': is_free})
+        with span('filter'):
+            total, facets = courses_catalog.facet_counts(filters, search)
+        return {"total": total, "facets": facets}
+    except Exception as e:
+        count_error(e)
+        raise HTTPException(status_code=500, detail=f"Error counting course facets: {str(e)}")
+
 @app.get("/courses/{course_id}")
+@profiled
 def get_course_by_id(course_id: str):
     """Get a specific course by ID"""
     try:
@@ -129,6 +357,7 @@ def get_course_by_id(course_id: str):
     except HTTPException:
         raise
     except Exception as e:
+        count_error(e)
         raise HTTPException(status_code=500, detail=f"Error fetching course: {str(e)}")
 
 @app.get("/courses/enrolled")
@@ -158,55 +387,96 @@ def enroll_in_course(course_id: str):
     except HTTPException:
         raise
     except Exception as e:
+        count_error(e)
         raise HTTPException(status_code=500, detail=f"Error enrolling in course: {str(e)}")
 
 @app.get("/books")
+@profiled
 def get_books(
     category: Optional[str] = Query(None, description="Filter by category"),
     search: Optional[str] = Query(None, description="Search in title and description"),
     limit: Optional[int] = Query(100, description="Limit results"),
-    offset: Optional[int] = Query(0, description="Offset for pagination")
+    offset: Optional[int] = Query(0, description="Offset for pagination"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor for keyset pagination (empty for first page)"),
+    personalize: Optional[str] = Query(None, description="User ID: rank matches by relevance, the user's tastes and rating"),
+    weights: Optional[str] = Query(None, description="Ranking weights with personalize, e.g. relevance=0.5,personal=0.3,rating=0.15,popularity=0.05"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    accept: Optional[str] = Header(None, description="application/json, application/vnd.focus.columnar+json or application/x-msgpack")
 ):
     """Get all books with optional filtering"""
     try:
-        filtered_df = books_df.copy()
-        
-        # Apply filters
+        limit = max(0, min(limit, PAGE_LIMIT))
+        filters = {}
         if category and category != 'All':
-            filtered_df = filtered_df[filtered_df['category'] == category]
+            filters['category'] = category
         
-        if search:
-            search_lower = search.lower()
-            mask = (
-                filtered_df['title'].str.lower().str.contains(search_lower, na=False) |
-                filtered_df['description'].str.lower().str.contains(search_lower, na=False) |
-                filtered_df['author'].str.lower().str.contains(search_lower, na=False)
-            )
-            filtered_df = filtered_df[mask]
-        
-        # Pagination
-        total = len(filtered_df)
-        filtered_df = filtered_df.iloc[offset:offset+limit]
+        if personalize is not None:
+            return personalized_page('book', books_catalog, BOOK_DEFAULTS, personalize, filters,
+                                     search, offset, limit, cursor, weights, fields, accept)
         
-        # Convert to dict format
-        books = filtered_df.to_dict('records')
+        if cursor is not None:
+            with span('filter'):
+                page_df, next_cursor = books_catalog.page(filters, search, cursor, limit)
+            return render(
+                page_df,
+                {"limit": limit, "nextCursor": next_cursor},
+                BOOK_DEFAULTS, fields, accept
+            )
         
-        # Ensure all required fields are present
-        for book in books:
-            book.setdefault('isFree', book.get('price', 0) == 0)
-            book.setdefault('isReading', False)
-            book.setdefault('progress', 0.0)
+        with span('filter'):
+            # Shards list in rating order so the router can merge their pages
+            filtered_df = books_df if SHARD is None else books_catalog.sorted_df
+            
+            # Apply filters
+            if category and category != 'All':
+                filtered_df = filtered_df[filtered_df['category'] == category]
+            
+            if search:
+                search_lower = search.lower()
+                mask = (
+                    filtered_df['title'].str.lower().str.contains(search_lower, na=False) |
+                    filtered_df['description'].str.lower().str.contains(search_lower, na=False) |
+                    filtered_df['author'].str.lower().str.contains(search_lower, na=False)
+                )
+                filtered_df = filtered_df[mask]
+            
+            # Pagination
+            total = len(filtered_df)
+            filtered_df = filtered_df.iloc[offset:offset+limit]
         
-        return {
-            "data": books,
-            "total": total,
-            "limit": limit,
-            "offset": offset
-        }
+        # Encode in the format expected by the client, with required fields present
+        return render(
+            filtered_df,
+            {"total": total, "limit": limit, "offset": offset},
+            BOOK_DEFAULTS, fields, accept
+        )
+    except (InvalidCursor, InvalidFields, InvalidWeights, InvalidOffset) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        count_error(e)
         raise HTTPException(status_code=500, detail=f"Error fetching books: {str(e)}")
 
+# Declared before /books/{book_id} so "facets" is not taken for an id
+@app.get("/books/facets")
+@profiled
+def get_book_facets(
+    category: Optional[str] = Query(None, description="Filter by category"),
+    language: Optional[str] = Query(None, description="Filter by language"),
+    is_free: Optional[bool] = Query(None, alias="isFree", description="Filter by free (true) or paid (false)"),
+    search: Optional[str] = Query(None, description="Search in title, description and author")
+):
+    """Number of books per category, language and isFree value under the current filters"""
+    try:
+        filters = facet_filters(books_catalog, {'category': category, 'language': language, 'isFree': is_free})
+        with span('filter'):
+            total, facets = books_catalog.facet_counts(filters, search)
+        return {"total": total, "facets": facets}
+    except Exception as e:
+        count_error(e)
+        raise HTTPException(status_code=500, detail=f"Error counting book facets: {str(e)}")
+
 @app.get("/books/{book_id}")
+@profiled
 def get_book_by_id(book_id: str):
     """Get a specific book by ID"""
     try:
@@ -224,6 +494,7 @@ def get_book_by_id(book_id: str):
     except HTTPException:
         raise
     except Exception as e:
+        count_error(e)
         raise HTTPException(status_code=500, detail=f"Error fetching book: {str(e)}")
 
 @app.get("/books/reading")
@@ -252,100 +523,267 @@ def start_reading(book_id: str):
     except HTTPException:
         raise
     except Exception as e:
+        count_error(e)
         raise HTTPException(status_code=500, detail=f"Error starting to read: {str(e)}")
 
+class NewCourse(BaseModel):
+    id: str
+    title: str
+    description: str
+    instructor: str
+    category: str
+    level: str
+    duration: str = ''
+    rating: float = 0.0
+    enrolledCount: int = 0
+    imageUrl: str = ''
+    price: float = 0.0
+
+class NewBook(BaseModel):
+    id: str
+    title: str
+    author: str
+    description: str
+    category: str
+    rating: float = 0.0
+    pageCount: int = 0
+    imageUrl: str = ''
+    language: str = ''
+    price: float = 0.0
+    publishedYear: Optional[int] = None
+
+def insert_item(item_type: str, record: dict) -> dict:
+    """Add an item to the served catalog and, when possible, the recommendation index"""
+    global courses_df, books_df, courses_catalog, books_catalog
+    record = {**record, 'isFree': record.get('price', 0) == 0}
+    with catalog_lock:
+        df = courses_df if item_type == 'course' else books_df
+        catalog = courses_catalog if item_type == 'course' else books_catalog
+        if record['id'] in catalog:
+            raise ItemExists(f"{item_type.capitalize()} already exists: {record['id']}")
+        # The catalog copy is built first (spliced into the presorted rows, not
+        # rebuilt), so a bad column or dtype fails before the engine changes
+        catalog = catalog.insert(record)
+        df = pd.concat([df, pd.DataFrame([record])], ignore_index=True)
+        timings = {}
+        if engine is not None and engine.can_insert(item_type):
+            timings = engine.add_item(item_type, record)
+        if item_type == 'course':
+            courses_catalog, courses_df = catalog, df
+        else:
+            books_catalog, books_df = catalog, df
+    return {"indexed": bool(timings), **timings}
+
+@app.post("/courses", status_code=201)
+def add_course(course: NewCourse, x_admin_token: Optional[str] = Header(None)):
+    """Add a course; it is recommendable at once when models use the hashing featurizer"""
+    require_admin(x_admin_token)
+    try:
+        record = course.model_dump()
+        return {"data": record, **insert_item('course', record)}
+    except ItemExists as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        count_error(e)
+        raise HTTPException(status_code=500, detail=f"Error adding course: {str(e)}")
+
+@app.post("/books", status_code=201)
+def add_book(book: NewBook, x_admin_token: Optional[str] = Header(None)):
+    """Add a book; it is recommendable at once when models use the hashing featurizer"""
+    require_admin(x_admin_token)
+    try:
+        record = book.model_dump()
+        return {"data": record, **insert_item('book', record)}
+    except ItemExists as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        count_error(e)
+        raise HTTPException(status_code=500, detail=f"Error adding book: {str(e)}")
+
+def top_rated_courses(category: Optional[str] = None, level: Optional[str] = None, limit: int = 10):
+    """Cheap fallback: top rated courses, optionally filtered"""
+    filtered_df = courses_df
+    if category and category != 'All':
+        filtered_df = filtered_df[filtered_df['category'] == category]
+    if level and level != 'All':
+        filtered_df = filtered_df[filtered_df['level'] == level]
+    return filtered_df.nlargest(limit, 'rating')
+
+def top_rated_books(category: Optional[str] = None, limit: int = 10):
+    """Cheap fallback: top rated books, optionally filtered"""
+    filtered_df = books_df
+    if category and category != 'All':
+        filtered_df = filtered_df[filtered_df['category'] == category]
+    return filtered_df.nlargest(limit, 'rating')
+
+def unscored(df: pd.DataFrame) -> pd.DataFrame:
+    """Fallback rows; shards mark them with a NaN score so the router ranks them last"""
+    return df if SHARD is None else df.assign(score=np.nan)
+
 @app.get("/recommendations")
+@profiled
 def get_recommendations(
     user_id: Optional[str] = Query(None, description="User ID for personalized recommendations"),
-    limit: Optional[int] = Query(10, description="Number of recommendations")
+    limit: Optional[int] = Query(10, description="Number of recommendations"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    accept: Optional[str] = Header(None, description="application/json, application/vnd.focus.columnar+json or application/x-msgpack")
 ):
     """Get general recommendations (courses)"""
     try:
-        if engine:
-            recommendations = engine.get_course_recommendations(
-                user_id=user_id,
-                limit=limit
-            )
-        else:
-            # Fallback: top rated courses
-            recommendations = courses_df.nlargest(limit, 'rating').to_dict('records')
-        
-        # Ensure required fields
-        for rec in recommendations:
-            rec.setdefault('isFree', rec.get('price', 0) == 0)
-            rec.setdefault('isEnrolled', False)
-            rec.setdefault('progress', 0.0)
+        with admission.admit() as admitted:
+            if engine and admitted:
+                recommendations = engine.recommend_courses(
+                    user_id=user_id,
+                    limit=limit,
+                    with_scores=SHARD is not None
+                )
+            else:
+                # Fallback: top rated courses
+                recommendations = unscored(top_rated_courses(limit=limit))
         
-        return {"data": recommendations}
+        return render(
+            recommendations,
+            {"degraded": bool(engine) and not admitted},
+            COURSE_DEFAULTS, fields, accept
+        )
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        count_error(e)
         raise HTTPException(status_code=500, detail=f"Error getting recommendations: {str(e)}")
 
 @app.get("/recommendations/courses")
+@profiled
 def get_recommended_courses(
     user_id: Optional[str] = Query(None, description="User ID for personalized recommendations"),
     category: Optional[str] = Query(None, description="Filter by category"),
     level: Optional[str] = Query(None, description="Filter by level"),
-    limit: Optional[int] = Query(10, description="Number of recommendations")
+    limit: Optional[int] = Query(10, description="Number of recommendations"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    accept: Optional[str] = Header(None, description="application/json, application/vnd.focus.columnar+json or application/x-msgpack")
 ):
     """Get recommended courses"""
     try:
-        if engine:
-            recommendations = engine.get_course_recommendations(
-                user_id=user_id,
-                category=category,
-                level=level,
-                limit=limit
-            )
-        else:
-            # Fallback: top rated courses
-            filtered_df = courses_df.copy()
-            if category and category != 'All':
-                filtered_df = filtered_df[filtered_df['category'] == category]
-            if level and level != 'All':
-                filtered_df = filtered_df[filtered_df['level'] == level]
-            recommendations = filtered_df.nlargest(limit, 'rating').to_dict('records')
-        
-        # Ensure required fields
-        for rec in recommendations:
-            rec.setdefault('isFree', rec.get('price', 0) == 0)
-            rec.setdefault('isEnrolled', False)
-            rec.setdefault('progress', 0.0)
+        with admission.admit() as admitted:
+            if engine and admitted:
+                recommendations = engine.recommend_courses(
+                    user_id=user_id,
+                    category=category,
+                    level=level,
+                    limit=limit,
+                    with_scores=SHARD is not None
+                )
+            else:
+                # Fallback: top rated courses
+                recommendations = unscored(top_rated_courses(category, level, limit))
         
-        return {"data": recommendations}
+        return render(
+            recommendations,
+            {"degraded": bool(engine) and not admitted},
+            COURSE_DEFAULTS, fields, accept
+        )
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        count_error(e)
         raise HTTPException(status_code=500, detail=f"Error getting course recommendations: {str(e)}")
 
 @app.get("/recommendations/books")
+@profiled
 def get_recommended_books(
     user_id: Optional[str] = Query(None, description="User ID for personalized recommendations"),
     category: Optional[str] = Query(None, description="Filter by category"),
-    limit: Optional[int] = Query(10, description="Number of recommendations")
+    limit: Optional[int] = Query(10, description="Number of recommendations"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    accept: Optional[str] = Header(None, description="application/json, application/vnd.focus.columnar+json or application/x-msgpack")
 ):
     """Get recommended books"""
     try:
-        if engine:
-            recommendations = engine.get_book_recommendations(
-                user_id=user_id,
-                category=category,
-                limit=limit
-            )
-        else:
-            # Fallback: top rated books
-            filtered_df = books_df.copy()
-            if category and category != 'All':
-                filtered_df = filtered_df[filtered_df['category'] == category]
-            recommendations = filtered_df.nlargest(limit, 'rating').to_dict('records')
-        
-        # Ensure required fields
-        for rec in recommendations:
-            rec.setdefault('isFree', rec.get('price', 0) == 0)
-            rec.setdefault('isReading', False)
-            rec.setdefault('progress', 0.0)
+        with admission.admit() as admitted:
+            if engine and admitted:
+                recommendations = engine.recommend_books(
+                    user_id=user_id,
+                    category=category,
+                    limit=limit,
+                    with_scores=SHARD is not None
+                )
+            else:
+                # Fallback: top rated books
+                recommendations = unscored(top_rated_books(category, limit))
         
-        return {"data": recommendations}
+        return render(
+            recommendations,
+            {"degraded": bool(engine) and not admitted},
+            BOOK_DEFAULTS, fields, accept
+        )
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        count_error(e)
         raise HTTPException(status_code=500, detail=f"Error getting book recommendations: {str(e)}")
 
+@app.get("/stats/admission")
+def get_admission_stats():
+    """Shed/degraded counters for the recommendation endpoints"""
+    return admission.stats()
+
+# Scrape-time gauges for state owned by other components
+registry.gauge(
+    'focus_model_load_seconds', 'Time spent loading recommendation models and catalogs, and warming up',
+    lambda: {
+        (('component', 'engine'),): engine.load_seconds if engine else 0.0,
+        (('component', 'catalog'),): catalog_load_seconds,
+        (('component', 'warmup'),): startup.phases.get('warmup', 0.0),
+    }
+)
+registry.gauge(
+    'focus_response_cache', 'Catalog response cache counters',
+    lambda: {(('counter', k),): v for k, v in response_cache.stats().items()}
+)
+registry.gauge(
+    'focus_response_cache_hit_ratio', 'Catalog response cache hit ratio',
+    lambda: {(): response_cache.hits / max(1, response_cache.hits + response_cache.misses)}
+)
+registry.gauge(
+    'focus_admission', 'Recommendation admission control counters',
+    lambda: {
+        (('counter', k),): v for k, v in admission.stats().items()
+        if k in ('admitted', 'shed', 'deadlineMisses', 'degraded', 'inFlight')
+    }
+)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition of request, stage and cache metrics"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/admin/profile/sample", response_class=PlainTextResponse)
+def sample_profile(
+    seconds: float = Query(10.0, description="Sampling duration (max 60)"),
+    interval_ms: float = Query(5.0, description="Sampling interval in milliseconds"),
+    include_idle: bool = Query(False, description="Include parked threads"),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Sample this worker's Python stacks and return collapsed stacks for a flamegraph"""
+    require_admin(x_admin_token)
+    try:
+        collapsed = profiling.sampler.sample(seconds, max(interval_ms, 1.0) / 1000.0, include_idle)
+    except SamplerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        collapsed,
+        headers={"Content-Disposition": f"attachment; filename=profile-{os.getpid()}.collapsed"}
+    )
+
+@app.get("/admin/profile/requests/{profile_id}", response_class=PlainTextResponse)
+def get_request_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """cProfile report of a request sent with X-Profile: 1"""
+    require_admin(x_admin_token)
+    report = profiling.profile_store.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(report)
+
 @app.get("/progress")
 def get_progress():
     """Get user progress (dummy implementation)"""
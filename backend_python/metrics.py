@@ -0,0 +1,214 @@
+"""
+Low-overhead request and stage metrics, exposed in Prometheus text format
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Tuple
+
+from starlette.routing import Match
+
+from startup import WARMUP_SCOPE_KEY
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# ASGI scope of the request being handled; the router fills in scope['route']
+_request_scope: contextvars.ContextVar = contextvars.ContextVar('request_scope', default=None)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+
+class Registry:
+    """Counters, histograms and scrape-time gauges"""
+
+    def __init__(self):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+
+    def observe(self, name: str, labels: Labels, seconds: float):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram()
+            histogram.counts[index] += 1
+            histogram.total += seconds
+            histogram.count += 1
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], Dict[Labels, float]]):
+        """Register a gauge whose samples are computed at scrape time"""
+        self.describe(name, 'gauge', help_text)
+        self._gauges[name] = fn
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+
+        def header(name, default_kind):
+            kind, help_text = self._help.get(name, (default_kind, name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            histograms = {
+                n: {l: (list(h.counts), h.total, h.count) for l, h in s.items()}
+                for n, s in self._histograms.items()
+            }
+
+        for name, series in sorted(counters.items()):
+            header(name, 'counter')
+            for labels, value in sorted(series.items()):
+                lines.append(f'{name}{_format_labels(labels)} {value:g}')
+
+        for name, series in sorted(histograms.items()):
+            header(name, 'histogram')
+            for labels, (counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS, counts):
+                    cumulative += bucket_count
+                    bucket_labels = labels + (('le', f'{bound:g}'),)
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {total:.6f}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        for name, fn in sorted(self._gauges.items()):
+            header(name, 'gauge')
+            for labels, value in sorted(fn().items()):
+                lines.append(f'{name}{_format_labels(labels)} {float(value):g}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+registry = Registry()
+registry.describe('focus_request_seconds', 'histogram', 'End-to-end request latency by endpoint')
+registry.describe('focus_stage_seconds', 'histogram', 'Latency of request stages (filter, score, topk, serialize)')
+registry.describe('focus_requests_total', 'counter', 'Requests by endpoint and status code')
+registry.describe('focus_errors_total', 'counter', 'Handler errors by endpoint and exception type')
+
+_in_flight = [0]
+registry.gauge('focus_requests_in_flight', 'Requests currently being handled', lambda: {(): _in_flight[0]})
+
+
+def current_endpoint() -> str:
+    """Route template of the request being handled"""
+    scope = _request_scope.get()
+    if scope is None:
+        return 'internal'
+    route = scope.get('route')
+    return getattr(route, 'path', 'unmatched')
+
+
+@contextmanager
+def span(stage: str):
+    """Time a stage of the current request into focus_stage_seconds"""
+    if not registry.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(
+            'focus_stage_seconds',
+            (('endpoint', current_endpoint()), ('stage', stage)),
+            time.perf_counter() - start
+        )
+
+
+def count_error(exc: BaseException):
+    """Record a handler error before it is flattened into an HTTP 500"""
+    if registry.enabled:
+        registry.inc(
+            'focus_errors_total',
+            (('endpoint', current_endpoint()), ('type', type(exc).__name__))
+        )
+
+
+def _match_route(scope) -> str:
+    """Route template for requests answered before routing (cache hits, 304s)"""
+    app = scope.get('app')
+    for route in getattr(getattr(app, 'router', None), 'routes', ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status codes and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Warm-up requests (startup.py) are not client traffic
+        if scope['type'] != 'http' or not registry.enabled or scope.get(WARMUP_SCOPE_KEY):
+            await self.app(scope, receive, send)
+            return
+
+        token = _request_scope.set(scope)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        _in_flight[0] += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_flight[0] -= 1
+            endpoint = current_endpoint()
+            if endpoint == 'unmatched' and status[0] != 404:
+                endpoint = _match_route(scope)
+            registry.observe('focus_request_seconds', (('endpoint', endpoint),), elapsed)
+            registry.inc('focus_requests_total', (('endpoint', endpoint), ('status', str(status[0]))))
+            _request_scope.reset(token)
@@ -0,0 +1,393 @@
+"""
+In-process build pipeline: generate -> clean -> partition -> train
+
+Stages run in one process and hand DataFrames to each other in memory
+instead of re-reading CSVs. Each stage has a fingerprint built from its
+code, its parameters, the content of its source files and the fingerprints
+of its inputs. A stage is skipped when its fingerprint matches the last
+successful build, its output files are unchanged and none of its inputs
+was rebuilt. Independent stages (the three cleaners, course and book
+training) run concurrently.
+
+Usage:
+    python pipeline.py                 # rebuild only what changed
+    python pipeline.py --force         # rebuild everything
+    python pipeline.py --no-generate   # use the existing data/*.csv as the source
+    python pipeline.py --generator-args "--courses 1000 --books 1000 --users 5000"
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shlex
+import sys
+import io
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+import clean_data
+import create_dummy_data
+import featurizer
+import interactions
+import train_model
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+MANIFEST_PATH = os.path.join('models', 'pipeline_manifest.json')
+
+
+class Stage:
+    """One node of the build graph
+
+    `fn` receives the values of `inputs` (in order) and returns this stage's
+    value. `outputs` are the files it writes; `load` rebuilds the value from
+    them when the stage is skipped but a downstream stage still needs it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        inputs: Sequence[str] = (),
+        outputs: Sequence[str] = (),
+        load: Optional[Callable[[], Any]] = None,
+        params: Optional[Dict] = None,
+        code: Sequence[Any] = (),
+        source_files: Sequence[str] = ()
+    ):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.load = load
+        self.params = params or {}
+        self.code = tuple(code)
+        self.source_files = tuple(source_files)
+
+
+class StageResult:
+    __slots__ = ('name', 'status', 'seconds', 'load_seconds')
+
+    def __init__(self, name: str, status: str, seconds: float = 0.0):
+        self.name = name
+        self.status = status
+        self.seconds = seconds
+        self.load_seconds = 0.0
+
+
+def file_digest(path: str) -> str:
+    """sha1 of a file's content"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_digest(obj) -> str:
+    """sha1 of a function's or module's source code"""
+    return hashlib.sha1(inspect.getsource(obj).encode()).hexdigest()
+
+
+def _stat(path: str):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class Pipeline:
+    """Fingerprint-cached DAG of stages, executed on a thread pool"""
+
+    def __init__(self, stages: List[Stage], manifest_path: str = MANIFEST_PATH, max_workers: int = 4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = [stage.name for stage in stages]
+        for stage in stages:
+            unknown = [name for name in stage.inputs if name not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {unknown}")
+        self.manifest_path = manifest_path
+        self.max_workers = max_workers
+
+    def fingerprints(self) -> Dict[str, str]:
+        """Fingerprint of every stage, in declaration (topological) order"""
+        result: Dict[str, str] = {}
+        for name in self.order:
+            stage = self.stages[name]
+            payload = {
+                'name': name,
+                'fn': _source_digest(stage.fn),
+                'code': [_source_digest(obj) for obj in stage.code],
+                'params': stage.params,
+                'files': {path: file_digest(path) for path in stage.source_files},
+                'inputs': [result[dep] for dep in stage.inputs],
+            }
+            encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+            result[name] = hashlib.sha1(encoded).hexdigest()
+        return result
+
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: Dict):
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _up_to_date(self, stage: Stage, fingerprint: str, entry: Optional[Dict]) -> bool:
+        if not entry or entry.get('fingerprint') != fingerprint:
+            return False
+        recorded = entry.get('outputs', {})
+        for path in stage.outputs:
+            if not os.path.exists(path) or recorded.get(path) != _stat(path):
+                return False
+        return True
+
+    def run(self, force: bool = False) -> List[StageResult]:
+        """Build every stage that is out of date; return per-stage results"""
+        fingerprints = self.fingerprints()
+        manifest = self._load_manifest()
+
+        rebuild = set()
+        for name in self.order:
+            stage = self.stages[name]
+            if (force or any(dep in rebuild for dep in stage.inputs)
+                    or not self._up_to_date(stage, fingerprints[name], manifest.get(name))):
+                rebuild.add(name)
+
+        results = {name: StageResult(name, 'cached') for name in self.order}
+        values: Dict[str, Any] = {}
+        locks = {name: threading.Lock() for name in self.order}
+        manifest_lock = threading.Lock()
+
+        def value_of(name):
+            # Skipped stages are materialised from their outputs on first use
+            with locks[name]:
+                if name not in values:
+                    stage = self.stages[name]
+                    if stage.load is None:
+                        raise RuntimeError(f"Stage {name} is cached but has no loader")
+                    start = time.perf_counter()
+                    values[name] = stage.load()
+                    results[name].load_seconds = time.perf_counter() - start
+                return values[name]
+
+        def execute(name):
+            stage = self.stages[name]
+            args = [value_of(dep) for dep in stage.inputs]
+            start = time.perf_counter()
+            value = stage.fn(*args)
+            elapsed = time.perf_counter() - start
+            with locks[name]:
+                values[name] = value
+            results[name].status = 'built'
+            results[name].seconds = elapsed
+            with manifest_lock:
+                manifest[name] = {
+                    'fingerprint': fingerprints[name],
+                    'outputs': {path: _stat(path) for path in stage.outputs},
+                    'seconds': round(elapsed, 4),
+                }
+                self._save_manifest(manifest)
+
+        pending = [name for name in self.order if name in rebuild]
+        done = set(self.order) - rebuild
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    if all(dep in done for dep in self.stages[name].inputs):
+                        pending.remove(name)
+                        running[pool.submit(execute, name)] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    future.result()
+                    done.add(name)
+        return [results[name] for name in self.order]
+
+
+# Stage functions. Their source is part of each stage's fingerprint.
+
+def _read_raw(paths):
+    courses_path, books_path, interactions_path = paths
+    return {
+        'courses': pd.read_csv(courses_path),
+        'books': pd.read_csv(books_path),
+        'interactions': pd.read_csv(interactions_path),
+    }
+
+
+def _generate(args):
+    courses_df, books_df, interactions = create_dummy_data.generate_datasets(args)
+    os.makedirs(args.output_dir, exist_ok=True)
+    courses_path, books_path, interactions_path = create_dummy_data.output_paths(args.output_dir)
+    courses_df.to_csv(courses_path, index=False)
+    books_df.to_csv(books_path, index=False)
+
+    chunks = []
+
+    def keep(iterator):
+        for chunk in iterator:
+            chunks.append(chunk)
+            yield chunk
+
+    create_dummy_data.write_interactions(keep(interactions), interactions_path)
+    interactions_df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(
+        columns=create_dummy_data.INTERACTION_COLUMNS
+    )
+    return {'courses': courses_df, 'books': books_df, 'interactions': interactions_df}
+
+
+def _partition(df, directory):
+    partitions = interactions.partition_interactions(df)
+    interactions.save_partitions(partitions, directory)
+    return partitions
+
+
+def _clean(cleaner, key, path):
+    def run(raw):
+        df = cleaner(raw[key].copy())
+        df.to_csv(path, index=False)
+        return df
+    return run
+
+
+def build_stages(data_dir: str = 'data', model_dir: str = 'models',
+                 generator_argv: Optional[List[str]] = None, generate: bool = True) -> List[Stage]:
+    """generate (or raw) -> clean_* -> partition_interactions -> train_* (similarity and ALS)"""
+    raw_paths = create_dummy_data.output_paths(data_dir)
+    if generate:
+        args = create_dummy_data.parse_args(list(generator_argv or []) + ['--output-dir', data_dir])
+        source = Stage(
+            'generate', lambda: _generate(args),
+            outputs=raw_paths, load=lambda: _read_raw(raw_paths),
+            params=vars(args), code=[create_dummy_data, _generate]
+        )
+    else:
+        source = Stage(
+            'generate', lambda: _read_raw(raw_paths),
+            load=lambda: _read_raw(raw_paths), source_files=raw_paths, code=[_read_raw]
+        )
+
+    cleaned = {
+        key: os.path.join(data_dir, f'{name}_cleaned.csv')
+        for key, name in (('courses', 'courses'), ('books', 'books'), ('interactions', 'user_interactions'))
+    }
+    stages = [source]
+    for key, cleaner in (('courses', clean_data.clean_courses),
+                         ('books', clean_data.clean_books),
+                         ('interactions', clean_data.clean_interactions)):
+        path = cleaned[key]
+        stages.append(Stage(
+            f'clean_{key}', _clean(cleaner, key, path), inputs=['generate'],
+            outputs=[path], load=lambda path=path: pd.read_csv(path),
+            code=[clean_data, _clean]
+        ))
+
+    partition_dir = os.path.join(data_dir, 'interactions')
+    item_types = ('course', 'book')
+    stages.append(Stage(
+        'partition_interactions', lambda df: _partition(df, partition_dir), inputs=['clean_interactions'],
+        outputs=[interactions.partition_path(t, partition_dir) for t in item_types],
+        load=lambda: {t: interactions.load_partition(t, partition_dir) for t in item_types},
+        code=[interactions, _partition]
+    ))
+
+    def model_paths(names):
+        return [os.path.join(model_dir, name).replace(os.sep, '/') for name in names]
+
+    def features_output(item_type):
+        return [f'{item_type}_features.pkl'] if train_model.CONTENT_FEATURIZER == 'hashing' else []
+
+    stages.append(Stage(
+        'train_courses',
+        lambda courses_df, partitions: train_model.train_course_recommendation_model(
+            courses_df, partitions['course'], model_dir
+        ),
+        inputs=['clean_courses', 'partition_interactions'],
+        outputs=model_paths(['course_vectorizer.pkl', 'course_similarity.pkl',
+                             'courses_df.pkl', 'user_item_matrix.pkl'] + features_output('course')),
+        params={'model_dir': model_dir, 'featurizer': train_model.CONTENT_FEATURIZER},
+        code=[train_model, featurizer]
+    ))
+    stages.append(Stage(
+        'train_books',
+        lambda books_df, partitions: train_model.train_book_recommendation_model(
+            books_df, partitions['book'], model_dir
+        ),
+        inputs=['clean_books', 'partition_interactions'],
+        outputs=model_paths(['book_vectorizer.pkl', 'book_similarity.pkl',
+                             'books_df.pkl', 'book_user_item_matrix.pkl'] + features_output('book')),
+        params={'model_dir': model_dir, 'featurizer': train_model.CONTENT_FEATURIZER},
+        code=[train_model, featurizer]
+    ))
+    for item_type in item_types:
+        stages.append(Stage(
+            f'train_{item_type}s_als',
+            lambda partitions, item_type=item_type: train_model.train_als_recommendation_model(
+                item_type, partitions[item_type], model_dir
+            ),
+            inputs=['partition_interactions'],
+            outputs=model_paths([f'{item_type}_als.pkl']),
+            params={'model_dir': model_dir}, code=[train_model]
+        ))
+    return stages
+
+
+def print_report(results: List[StageResult], wall_seconds: float):
+    print(f"\n{'stage':<24} {'status':<8} {'seconds':>9} {'load s':>8}")
+    for r in results:
+        print(f"{r.name:<24} {r.status:<8} {r.seconds:>9.3f} {r.load_seconds:>8.3f}")
+    built = sum(r.status == 'built' for r in results)
+    print(f"\n[OK] Build finished in {wall_seconds:.3f}s ({built} built, {len(results) - built} cached)")
+
+
+def build(force: bool = False, generate: bool = True, generator_argv: Optional[List[str]] = None,
+          max_workers: int = 4, data_dir: str = 'data', model_dir: str = 'models') -> List[StageResult]:
+    """Run the pipeline and print per-stage timings"""
+    start = time.perf_counter()
+    pipeline = Pipeline(
+        build_stages(data_dir, model_dir, generator_argv, generate),
+        manifest_path=os.path.join(model_dir, 'pipeline_manifest.json'),
+        max_workers=max_workers
+    )
+    results = pipeline.run(force=force)
+    print_report(results, time.perf_counter() - start)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--force', action='store_true', help="Rebuild every stage")
+    parser.add_argument('--no-generate', action='store_true',
+                        help="Use the existing raw CSVs instead of generating them")
+    parser.add_argument('--generator-args', default='',
+                        help="Arguments passed to create_dummy_data.py, as one string")
+    parser.add_argument('--workers', type=int, default=4)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    build(
+        force=args.force,
+        generate=not args.no_generate,
+        generator_argv=shlex.split(args.generator_args),
+        max_workers=args.workers
+    )
+
+
+if __name__ == '__main__':
+    main()
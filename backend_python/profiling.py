@@ -0,0 +1,170 @@
+"""
+On-demand profiling for live workers
+
+Two admin-only tools, both idle unless explicitly requested:
+- StackSampler: samples every thread's Python stack for N seconds and
+  returns collapsed stacks (flamegraph.pl / speedscope input)
+- Per-request cProfile: a request carrying `X-Profile: 1` and a valid admin
+  token runs its handler under cProfile; the stats are kept in memory and
+  referenced from the `X-Profile-Id` response header
+"""
+import contextvars
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from starlette.datastructures import Headers
+
+from admin import admin_enabled, admin_token_valid
+
+MAX_SAMPLE_SECONDS = 60.0
+
+# Leaf frames of threads that are parked rather than doing work
+IDLE_LEAVES = {
+    ('threading.py', 'wait'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('_asyncio.py', 'get'),
+}
+
+
+class SamplerBusy(RuntimeError):
+    """Raised when a sampling session is already running"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+class StackSampler:
+    """Wall-clock stack sampler using sys._current_frames()"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def sample(self, seconds: float, interval: float = 0.005, include_idle: bool = False) -> str:
+        """Sample all other threads for `seconds`; return collapsed stacks"""
+        if not self._lock.acquire(blocking=False):
+            raise SamplerBusy("A profiling session is already running")
+        try:
+            seconds = min(max(seconds, interval), MAX_SAMPLE_SECONDS)
+            me = threading.get_ident()
+            counts: Counter = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == me:
+                        continue
+                    leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+                    if not include_idle and leaf in IDLE_LEAVES:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    stack.append(names.get(thread_id, str(thread_id)).replace(' ', '_'))
+                    counts[';'.join(reversed(stack))] += 1
+                time.sleep(interval)
+            return ''.join(f'{stack} {count}\n' for stack, count in counts.most_common())
+        finally:
+            self._lock.release()
+
+
+class ProfileStore:
+    """Bounded in-memory store of per-request cProfile reports"""
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, report: str) -> str:
+        profile_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            self._entries[profile_id] = report
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[str]:
+        with self._lock:
+            return self._entries.get(profile_id)
+
+
+class _ProfileRequest:
+    __slots__ = ('report',)
+
+    def __init__(self):
+        self.report = None
+
+
+# Set only for requests that asked to be profiled
+_active: contextvars.ContextVar = contextvars.ContextVar('profile_request', default=None)
+
+sampler = StackSampler()
+profile_store = ProfileStore()
+
+
+def profiled(fn):
+    """Run a sync handler under cProfile when its request asked for it"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        request = _active.get()
+        if request is None:
+            return fn(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn, *args, **kwargs)
+        finally:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(40)
+            request.report = out.getvalue()
+    return wrapper
+
+
+class ProfileRequestMiddleware:
+    """ASGI middleware enabling per-request profiling for admin callers"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not admin_enabled():
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if headers.get('x-profile') != '1' or not admin_token_valid(headers.get('x-admin-token')):
+            await self.app(scope, receive, send)
+            return
+
+        request = _ProfileRequest()
+        token = _active.set(request)
+        # A profiled request must run its handler, not a cached replay
+        scope = dict(scope)
+        scope['headers'] = [
+            (k, v) for k, v in scope['headers'] if k not in (b'if-none-match', b'cache-control')
+        ] + [(b'cache-control', b'no-cache')]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start' and request.report is not None:
+                profile_id = profile_store.put(request.report)
+                message = dict(message)
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'x-profile-id', profile_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _active.reset(token)
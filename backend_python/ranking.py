@@ -0,0 +1,189 @@
+"""
+Single-pass hybrid ranking for personalized search and listings
+
+Matching catalog rows are ranked by one weighted blend, all terms in [0, 1]
+(personal in [-1, 1]):
+
+    relevance   weighted share of search columns containing the query
+    personal    the user's factor-model affinity (FactorScorer.affinity), or
+                without factor models their item-item predicted rating
+                (SimilarityScorer.affinity)
+    rating      rating / 5
+    popularity  log-scaled popularity column (courses: enrolledCount)
+
+The cheap terms are computed for every candidate at once. Only candidates
+that can still reach the top k get a factor score: a first round scores the
+best candidates by upper bound, and a second round scores only the rest
+whose upper bound beats the k-th score found. The result is exact. Small
+candidate sets, and sets where the bounds prune little, are scored in a
+single pass instead.
+
+Weights come from PERSONALIZE_WEIGHTS, or the request's `weights`
+parameter, as "relevance=0.5,personal=0.3,rating=0.15,popularity=0.05".
+"""
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from catalog import Catalog
+from recommendation_engine import top_k
+
+WEIGHT_NAMES = ('relevance', 'personal', 'rating', 'popularity')
+
+# Popularity column per item type (books have none)
+POPULARITY_COLUMNS = {'course': 'enrolledCount'}
+
+# Candidates given a factor score in the first round, per result slot
+FIRST_ROUND_FACTOR = 4
+MIN_FIRST_ROUND = 64
+
+# With at most this many first rounds' worth of candidates, score them all in
+# one pass: bounding and partitioning would cost about as much as scoring
+EXHAUSTIVE_FACTOR = 8
+
+# When more than this share of the rest still beats the round-1 threshold,
+# score every row in order instead of gathering the survivors
+MAX_PENDING_SHARE = 0.5
+
+# After the bounds fail to prune, this many large requests skip them before
+# one tries them again. How well they prune depends mostly on the personal
+# weight's share, so requests are grouped by it (rounded, at most 202 keys).
+# The counters live in the engine's per-catalog ranking state, so a reload or
+# an insert starts them afresh.
+PROBE_INTERVAL = 32
+_skip_lock = threading.Lock()
+
+# Deepest personalized page: each request ranks offset + limit rows
+MAX_OFFSET = 1000
+
+
+class InvalidWeights(ValueError):
+    """Raised when a ranking weight specification cannot be parsed"""
+
+
+class InvalidOffset(ValueError):
+    """Raised for a negative personalized page offset"""
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """"name=value,..." -> weights; unnamed weights are 0"""
+    weights = dict.fromkeys(WEIGHT_NAMES, 0.0)
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        name, sep, value = part.partition('=')
+        name = name.strip()
+        if not sep or name not in weights:
+            raise InvalidWeights(f"Invalid weight {part.strip()!r}; expected one of {', '.join(WEIGHT_NAMES)} as name=value")
+        try:
+            weights[name] = float(value)
+        except ValueError:
+            raise InvalidWeights(f"Invalid weight value for {name}: {value.strip()!r}")
+        if not np.isfinite(weights[name]) or weights[name] < 0:
+            raise InvalidWeights(f"Weight {name} must be a non-negative number")
+    return weights
+
+
+DEFAULT_WEIGHTS = parse_weights(
+    os.getenv('PERSONALIZE_WEIGHTS', 'relevance=0.5,personal=0.3,rating=0.15,popularity=0.05')
+)
+
+
+def hybrid_rank(
+    catalog: Catalog,
+    item_type: str,
+    engine,
+    user_id: Optional[str],
+    filters: Dict[str, str],
+    search: Optional[str],
+    k: int,
+    weights: Dict[str, float] = DEFAULT_WEIGHTS
+) -> Tuple[np.ndarray, int, Dict]:
+    """Sorted-row positions of the best k matches, the number of matches, and stats
+
+    Stats report whether the personal term was used ("personalized") and
+    how many candidates were given a personal score ("scored").
+    """
+    mask = catalog.filter_mask(filters)
+    relevance = None
+    if search:
+        relevance = catalog.relevance(search)
+        mask &= relevance > 0
+    candidates = np.flatnonzero(mask)
+    total = len(candidates)
+
+    static = np.zeros(total, dtype=np.float32)
+    if relevance is not None and weights['relevance']:
+        static += weights['relevance'] * relevance[candidates]
+    if weights['rating'] and 'rating' in catalog.sorted_df.columns:
+        static += weights['rating'] / 5.0 * catalog.sorted_df['rating'].to_numpy(dtype=np.float32)[candidates]
+    popularity_column = POPULARITY_COLUMNS.get(item_type)
+    if weights['popularity'] and popularity_column in catalog.sorted_df.columns:
+        popularity = np.log1p(catalog.sorted_df[popularity_column].to_numpy(dtype=np.float32).clip(0))
+        if popularity.max() > 0:
+            static += weights['popularity'] * popularity[candidates] / popularity.max()
+
+    if k <= 0:
+        return candidates[:0], total, {"personalized": False, "scored": 0}
+    scorer = engine.personal_scorer(item_type) if engine is not None else None
+    personal = weights['personal']
+    if not personal or scorer is None or not scorer.has_user(user_id):
+        return candidates[top_k(static, k)], total, {"personalized": False, "scored": 0}
+
+    positions = engine.catalog_positions(item_type, catalog)[candidates]
+    known = positions >= 0
+    # Rows the model has never seen (no factors) compete on the cheap terms alone
+    unknown = np.flatnonzero(~known)
+    rows = np.flatnonzero(known) if len(unknown) else np.arange(total)
+    positions = positions[rows]
+
+    def full_scores(picked: np.ndarray) -> np.ndarray:
+        return static[rows[picked]] + personal * scorer.affinity(user_id, positions[picked])
+
+    first_round = max(FIRST_ROUND_FACTOR * k, MIN_FIRST_ROUND)
+    exhaustive = not scorer.bounded or len(rows) <= EXHAUSTIVE_FACTOR * first_round
+    skips = engine.ranking_state(item_type, catalog)
+    bounds_key = (round(personal / sum(weights.values()), 2), bool(search))
+    if not exhaustive:
+        with _skip_lock:
+            if skips.get(bounds_key, 0) > 0:
+                skips[bounds_key] -= 1
+                exhaustive = True
+    if exhaustive:
+        picked = np.arange(len(rows))
+        scores = full_scores(picked)
+    else:
+        # Round 1: the candidates with the best upper bounds
+        upper = static[rows] + personal * scorer.affinity_bounds(positions)
+        picked = np.argpartition(-upper, first_round)[:first_round]
+        scores = full_scores(picked)
+
+    # Round 2: anyone else whose bound beats the k-th score so far
+    if len(picked) < len(rows) and len(picked) >= k:
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        pending = upper >= threshold
+        pending[picked] = False
+        rest = np.flatnonzero(pending)
+        if len(rest) > (len(rows) - len(picked)) * MAX_PENDING_SHARE:
+            # The bounds barely prune: one in-order pass over every row is cheaper
+            picked = np.arange(len(rows))
+            scores = full_scores(picked)
+            with _skip_lock:
+                skips[bounds_key] = PROBE_INTERVAL
+        elif len(rest):
+            picked = np.concatenate([picked, rest])
+            scores = np.concatenate([scores, full_scores(rest)])
+
+    scored = rows[picked]
+    if len(unknown):
+        scored = np.concatenate([scored, unknown])
+        scores = np.concatenate([scores, static[unknown]])
+    factor_scored = len(picked)
+
+    # Ties keep catalog order (rating desc, id), as unpersonalized results do
+    order = np.argsort(scored, kind='stable')
+    scored, scores = scored[order], scores[order]
+    best = top_k(scores, k)
+    return candidates[scored[best]], total, {"personalized": True, "scored": int(factor_scored)}
@@ -4,30 +4,436 @@ Recommendation engine for courses and books
 import pandas as pd
 import numpy as np
 import joblib
-from typing import List, Dict
+import os
+import threading
+import time
+from typing import List, Dict, Optional, Tuple
+from metrics import span
+
+# 'als' serves personalised requests from factor models when they are trained;
+# 'similarity' keeps the item-item scorer
+SCORER = os.getenv('RECOMMENDATION_SCORER', 'als')
+
+# Known neighbours whose factors are averaged for an item added after training
+COLD_START_NEIGHBOURS = 10
+
+# Rating scale of the user-item matrices (1-5), centred for item-item affinity
+RATING_MIDPOINT = 3.0
+RATING_HALF_RANGE = 2.0
+
+
+class ItemExists(ValueError):
+    """Raised when adding an item whose id is already in the catalog"""
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    if k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+class FactorScorer:
+    """Serves an implicit ALS model: one user vector x item matrix product"""
+
+    # affinity_bounds() is tight enough for ranking.py to prune with
+    bounded = True
+
+    def __init__(self, model: Dict, items_df: pd.DataFrame):
+        self.user_index = {user: i for i, user in enumerate(model['user_ids'])}
+        self.user_factors = model['user_factors']
+        self.seen_indptr = model['seen_indptr']
+        # Factor row of every catalog row (-1 for items the model never saw)
+        item_index = {item: i for i, item in enumerate(model['item_ids'])}
+        self.factor_rows = np.array([item_index.get(item, -1) for item in items_df['id']], dtype=np.int64)
+        known = self.factor_rows >= 0
+        self.item_factors = np.zeros((len(items_df), model['item_factors'].shape[1]), dtype=np.float32)
+        self.item_factors[known] = model['item_factors'][self.factor_rows[known]]
+        self.known = known
+        # Norms bound each item's affinity (Cauchy-Schwarz) for early termination
+        self.item_norms = np.linalg.norm(self.item_factors, axis=1)
+        self.max_item_norm = float(self.item_norms.max()) if len(self.item_norms) else 0.0
+        # Seen items as catalog positions
+        catalog_position = np.full(len(model['item_ids']), -1, dtype=np.int64)
+        catalog_position[self.factor_rows[known]] = np.flatnonzero(known)
+        self.seen_positions = catalog_position[model['seen_items']]
+
+    def add_item(self, similarity: np.ndarray, neighbours: int = COLD_START_NEIGHBOURS):
+        """Append a catalog row for an item added after training
+
+        Its factors are the similarity-weighted mean of its most similar
+        items that have factors; with no such neighbour it stays unscored.
+        """
+        weights = np.where(self.known, similarity, 0)
+        top = top_k(weights, neighbours)
+        top = top[weights[top] > 0]
+        factors = np.zeros((1, self.item_factors.shape[1]), dtype=np.float32)
+        if len(top):
+            factors[0] = weights[top] @ self.item_factors[top] / weights[top].sum()
+        # Factors first: readers index these arrays by catalog position. A
+        # weighted mean of known factors never exceeds max_item_norm.
+        self.item_factors = np.concatenate([self.item_factors, factors])
+        self.item_norms = np.append(self.item_norms, np.linalg.norm(factors[0]))
+        self.known = np.append(self.known, len(top) > 0)
+
+    def has_user(self, user_id: Optional[str]) -> bool:
+        return user_id is not None and user_id in self.user_index
+
+    def seen(self, user_id: str) -> np.ndarray:
+        u = self.user_index[user_id]
+        positions = self.seen_positions[self.seen_indptr[u]:self.seen_indptr[u + 1]]
+        return positions[positions >= 0]
+
+    def affinity(self, user_id: str, positions: np.ndarray) -> np.ndarray:
+        """Factor score of the catalog rows at `positions`, scaled into [-1, 1]
+
+        Unlike scores(), nothing is excluded: seen items and rows without
+        factors score a neutral 0, so search still finds them unboosted.
+        """
+        user = self.user_factors[self.user_index[user_id]]
+        scale = float(np.linalg.norm(user)) * self.max_item_norm
+        if scale == 0:
+            return np.zeros(len(positions), dtype=np.float32)
+        affinity = self.item_factors[positions] @ user / scale
+        # A catalog-sized mask: np.isin sorts, which costs more than the product
+        seen = np.zeros(len(self.item_factors), dtype=bool)
+        seen[self.seen(user_id)] = True
+        affinity[seen[positions]] = 0
+        return affinity
+
+    def affinity_bounds(self, positions: np.ndarray) -> np.ndarray:
+        """Upper bound of affinity() at `positions`, for any user"""
+        if self.max_item_norm == 0:
+            return np.zeros(len(positions), dtype=np.float32)
+        return self.item_norms[positions] / self.max_item_norm
+
+    def scores(self, user_id: str, positions: np.ndarray) -> np.ndarray:
+        """Predicted preference for the catalog rows at `positions`
+
+        Items the user has seen, and items without factors, score -inf.
+        """
+        scores = self.item_factors[positions] @ self.user_factors[self.user_index[user_id]]
+        scores[np.isin(positions, self.seen(user_id))] = -np.inf
+        scores[~self.known[positions]] = -np.inf
+        return scores
+
+
+class SimilarityScorer:
+    """Item-item predictions behind FactorScorer's ranking interface
+
+    Personalized ranking uses it when no factor model is loaded. The
+    prediction is the similarity-weighted mean of the user's ratings, as in
+    the item-item recommendation path. It reads the engine's current
+    similarity matrix and catalog, so items inserted at runtime are covered.
+    """
+
+    # No useful per-item bound: every candidate gets scored
+    bounded = False
+
+    def __init__(self, engine: 'RecommendationEngine', item_type: str):
+        self.engine = engine
+        self.df_name, self.similarity_name = ITEM_ATTRIBUTES[item_type][:2]
+        self.matrix_name = USER_ITEM_MATRICES[item_type]
+        # (matrix, items frame, catalog position of each matrix column)
+        self._columns = None
+
+    def has_user(self, user_id: Optional[str]) -> bool:
+        return user_id is not None and user_id in getattr(self.engine, self.matrix_name).index
+
+    def rated(self, user_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Catalog positions and ratings of the items the user rated"""
+        matrix = getattr(self.engine, self.matrix_name)
+        items_df = getattr(self.engine, self.df_name)
+        cached = self._columns
+        if cached is None or cached[0] is not matrix or cached[1] is not items_df:
+            cached = (matrix, items_df, pd.Index(items_df['id']).get_indexer(matrix.columns))
+            self._columns = cached
+        ratings = matrix.loc[user_id].to_numpy(dtype=np.float32)
+        rated = np.flatnonzero((ratings > 0) & (cached[2] >= 0))
+        return cached[2][rated], ratings[rated]
+
+    def affinity(self, user_id: str, positions: np.ndarray) -> np.ndarray:
+        """Predicted rating of the catalog rows at `positions`, scaled into [-1, 1]
+
+        Rated items, and items with no positive similarity to any rated
+        item, score a neutral 0.
+        """
+        affinity = np.zeros(len(positions), dtype=np.float32)
+        rated, ratings = self.rated(user_id)
+        if not len(rated):
+            return affinity
+        similarity = getattr(self.engine, self.similarity_name)
+        weights = np.asarray(similarity[np.ix_(positions, rated)], dtype=np.float32).clip(0)
+        total = weights.sum(axis=1)
+        linked = total > 0
+        predicted = weights[linked] @ ratings / total[linked]
+        affinity[linked] = (predicted - RATING_MIDPOINT) / RATING_HALF_RANGE
+        seen = np.zeros(len(similarity), dtype=bool)
+        seen[rated] = True
+        affinity[seen[positions]] = 0
+        return affinity
+
+    def affinity_bounds(self, positions: np.ndarray) -> np.ndarray:
+        """Upper bound of affinity() at `positions`, for any user"""
+        return np.ones(len(positions), dtype=np.float32)
+
+
+def _load_factor_scorer(path: str, items_df: pd.DataFrame) -> Optional[FactorScorer]:
+    if SCORER != 'als' or not os.path.exists(path):
+        return None
+    return FactorScorer(joblib.load(path), items_df)
+
+
+def _load_optional(path: str):
+    return joblib.load(path) if os.path.exists(path) else None
+
+
+class LazyArtifact:
+    """Engine attribute unpickled from `path` on first access
+
+    For models no serving hot path needs: a TfidfVectorizer pickle pulls in
+    scikit-learn, which would otherwise be imported by every worker at
+    startup. Concurrent first accesses may each load it; the last one wins.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, engine, owner=None):
+        if engine is None:
+            return self
+        if self.name not in engine.__dict__:
+            engine.__dict__[self.name] = joblib.load(self.path)
+        return engine.__dict__[self.name]
+
+    def __set__(self, engine, value):
+        engine.__dict__[self.name] = value
+
+
+def _append_similarity(similarity: np.ndarray, buffer: Optional[np.ndarray], row: np.ndarray):
+    """Square similarity grown by one item, and the buffer backing it
+
+    The matrix is a view into a buffer with spare capacity, so a run of
+    inserts copies it once per ~n/8 items instead of on every insert.
+    """
+    n = similarity.shape[0]
+    if buffer is None or buffer.shape[0] <= n or not np.shares_memory(buffer, similarity):
+        capacity = n + max(64, n // 8)
+        buffer = np.zeros((capacity, capacity), dtype=similarity.dtype)
+        buffer[:n, :n] = similarity
+    buffer[n, :n] = row
+    buffer[:n, n] = row
+    buffer[n, n] = 1.0
+    return buffer[:n + 1, :n + 1], buffer
+
+
+# Attributes of a loaded engine
+ARTIFACTS = (
+    'course_vectorizer', 'course_similarity', 'courses_df', 'user_item_matrix', 'course_scorer',
+    'course_features',
+    'book_vectorizer', 'book_similarity', 'books_df', 'book_user_item_matrix', 'book_scorer',
+    'book_features',
+)
+
+# Per item type: catalog, similarity, featurizer, item features and factor scorer attributes
+ITEM_ATTRIBUTES = {
+    'course': ('courses_df', 'course_similarity', 'course_vectorizer', 'course_features', 'course_scorer'),
+    'book': ('books_df', 'book_similarity', 'book_vectorizer', 'book_features', 'book_scorer'),
+}
+
+# Per item type: user x item rating matrix attribute
+USER_ITEM_MATRICES = {'course': 'user_item_matrix', 'book': 'book_user_item_matrix'}
+
 
 class RecommendationEngine:
-    def __init__(self):
-        """Initialize recommendation engine with trained models"""
+    # Only needed to embed items added at runtime
+    course_vectorizer = LazyArtifact('models/course_vectorizer.pkl')
+    book_vectorizer = LazyArtifact('models/book_vectorizer.pkl')
+
+    def __init__(self, shard=None):
+        """Initialize recommendation engine with trained models
+
+        With a sharding.Shard, only the items that shard owns are kept. The
+        large matrices are memory-mapped while loading, so only the shard's
+        slices become resident.
+        """
+        start = time.perf_counter()
+        mmap_mode = 'r' if shard is not None else None
         try:
             # Load course models
-            self.course_vectorizer = joblib.load('models/course_vectorizer.pkl')
-            self.course_similarity = joblib.load('models/course_similarity.pkl')
+            self.course_similarity = joblib.load('models/course_similarity.pkl', mmap_mode=mmap_mode)
             self.courses_df = joblib.load('models/courses_df.pkl')
-            self.user_item_matrix = joblib.load('models/user_item_matrix.pkl')
+            self.user_item_matrix = joblib.load('models/user_item_matrix.pkl', mmap_mode=mmap_mode)
             
             # Load book models
-            self.book_vectorizer = joblib.load('models/book_vectorizer.pkl')
-            self.book_similarity = joblib.load('models/book_similarity.pkl')
+            self.book_similarity = joblib.load('models/book_similarity.pkl', mmap_mode=mmap_mode)
             self.books_df = joblib.load('models/books_df.pkl')
-            self.book_user_item_matrix = joblib.load('models/book_user_item_matrix.pkl')
+            self.book_user_item_matrix = joblib.load('models/book_user_item_matrix.pkl', mmap_mode=mmap_mode)
+            
+            # Item features, saved when trained with the hashing featurizer
+            self.course_features = _load_optional('models/course_features.pkl')
+            self.book_features = _load_optional('models/book_features.pkl')
+            
+            if shard is not None:
+                self._restrict(shard)
+            
+            # Optional implicit-feedback factor models
+            self.course_scorer = _load_factor_scorer('models/course_als.pkl', self.courses_df)
+            self.book_scorer = _load_factor_scorer('models/book_als.pkl', self.books_df)
             
-            print("[OK] Recommendation models loaded successfully")
+            self._init_inserts()
+            self.load_seconds = time.perf_counter() - start
+            print("[OK] Recommendation models loaded successfully" + (f" ({shard})" if shard else ""))
         except FileNotFoundError as e:
             print(f"[ERROR] Error loading models: {e}")
             print("Please run train_model.py first")
             raise
     
+    def _restrict(self, shard):
+        """Keep the items `shard` owns: catalog rows, similarity block, matrix columns"""
+        for item_type, matrix_name in (('course', 'user_item_matrix'), ('book', 'book_user_item_matrix')):
+            df_name, similarity_name, _, features_name, _ = ITEM_ATTRIBUTES[item_type]
+            items_df = getattr(self, df_name)
+            keep = shard.owns(items_df)
+            rows = np.flatnonzero(keep)
+            setattr(self, similarity_name, np.asarray(getattr(self, similarity_name)[np.ix_(rows, rows)]))
+            features = getattr(self, features_name)
+            if features is not None:
+                setattr(self, features_name, features[rows])
+            matrix = getattr(self, matrix_name)
+            setattr(self, matrix_name, matrix.loc[:, matrix.columns.isin(items_df['id'][keep])].copy())
+            setattr(self, df_name, items_df[keep].reset_index(drop=True))
+    
+    @classmethod
+    def from_artifacts(cls, **artifacts) -> 'RecommendationEngine':
+        """Engine over in-memory models, for evaluation and benchmarks
+
+        Accepts the attributes __init__ loads (courses_df, course_similarity,
+        user_item_matrix, course_scorer, and the book equivalents); any not
+        given are None.
+        """
+        unknown = set(artifacts) - set(ARTIFACTS)
+        if unknown:
+            raise TypeError(f"Unknown engine artifacts: {sorted(unknown)}")
+        engine = cls.__new__(cls)
+        for name in ARTIFACTS:
+            setattr(engine, name, artifacts.get(name))
+        engine.load_seconds = 0.0
+        engine._init_inserts()
+        return engine
+    
+    def _init_inserts(self):
+        self._insert_lock = threading.Lock()
+        self._similarity_buffers = {}
+        self._catalog_positions = {}
+        self._similarity_scorers = {}
+    
+    def scorer(self, item_type: str) -> Optional[FactorScorer]:
+        return getattr(self, ITEM_ATTRIBUTES[item_type][4])
+    
+    def personal_scorer(self, item_type: str):
+        """The factor scorer, or item-item predictions when no factor model is loaded"""
+        scorer = self.scorer(item_type)
+        if scorer is not None:
+            return scorer
+        if getattr(self, USER_ITEM_MATRICES[item_type]) is None:
+            return None
+        if item_type not in self._similarity_scorers:
+            self._similarity_scorers[item_type] = SimilarityScorer(self, item_type)
+        return self._similarity_scorers[item_type]
+    
+    def catalog_positions(self, item_type: str, catalog) -> np.ndarray:
+        """Engine row of every row of a catalog.Catalog (-1 where the engine lacks the item)
+
+        Computed once per catalog and engine frame; both are replaced, not
+        mutated, when items are added.
+        """
+        return self._catalog_entry(item_type, catalog)[2]
+
+    def ranking_state(self, item_type: str, catalog) -> Dict:
+        """Scratch state ranking.py keeps for one catalog and engine frame
+
+        Cached with catalog_positions(), so it starts empty again whenever
+        the catalog or the engine's items are replaced.
+        """
+        return self._catalog_entry(item_type, catalog)[3]
+
+    def _catalog_entry(self, item_type: str, catalog) -> tuple:
+        items_df = getattr(self, ITEM_ATTRIBUTES[item_type][0])
+        cached = self._catalog_positions.get(item_type)
+        if cached is None or cached[0] is not catalog or cached[1] is not items_df:
+            positions = pd.Index(items_df['id']).get_indexer(catalog.sorted_df['id'])
+            cached = (catalog, items_df, positions, {})
+            self._catalog_positions[item_type] = cached
+        return cached
+    
+    def can_insert(self, item_type: str) -> bool:
+        """Whether new items of this type can be embedded without a retrain"""
+        _, _, vectorizer_name, features_name, _ = ITEM_ATTRIBUTES[item_type]
+        # Features are only saved by the hashing featurizer (the one with
+        # embed()); checking them first avoids loading a TF-IDF vectorizer
+        return (getattr(self, features_name) is not None
+                and hasattr(getattr(self, vectorizer_name), 'embed'))
+    
+    def add_item(self, item_type: str, record: Dict) -> Dict[str, float]:
+        """Embed a new catalog item and link it into the similarity index
+
+        The item is hashed with the trained featurizer's IDF weights and its
+        similarity to every item is appended to the similarity matrix. With a
+        factor model, it also gets factors from its nearest neighbours.
+        Returns embed, link and total (including the catalog append) times
+        in milliseconds.
+        """
+        # Insert-only dependencies, kept out of worker startup
+        from scipy import sparse
+        from featurizer import record_text
+        
+        df_name, similarity_name, vectorizer_name, features_name, scorer_name = ITEM_ATTRIBUTES[item_type]
+        if not self.can_insert(item_type):
+            raise RuntimeError(f"{item_type} models were not trained with the hashing featurizer")
+        with self._insert_lock:
+            items_df = getattr(self, df_name)
+            if (items_df['id'] == record['id']).any():
+                raise ItemExists(f"{item_type.capitalize()} already exists: {record['id']}")
+            start = time.perf_counter()
+            text = record_text(record, item_type)
+            vector = getattr(self, vectorizer_name).embed(text)
+            embedded = time.perf_counter()
+            
+            # Cosine similarity to every item: features x dense copy of the new row
+            features = getattr(self, features_name)
+            dense = np.zeros(features.shape[1], dtype=features.dtype)
+            dense[vector.indices] = vector.data
+            similarity_row = features @ dense
+            similarity, buffer = _append_similarity(
+                getattr(self, similarity_name), self._similarity_buffers.get(item_type), similarity_row
+            )
+            features = sparse.vstack([features, vector], format='csr')
+            linked = time.perf_counter()
+            items_df = pd.concat(
+                [items_df, pd.DataFrame([{**record, 'feature_text': text}])], ignore_index=True
+            )
+            # Everything that can fail is built above, so a failed insert
+            # leaves the engine unchanged. The catalog grows last: readers
+            # index everything else by its positions
+            self._similarity_buffers[item_type] = buffer
+            setattr(self, similarity_name, similarity)
+            setattr(self, features_name, features)
+            scorer = getattr(self, scorer_name)
+            if scorer is not None:
+                scorer.add_item(similarity_row)
+            setattr(self, df_name, items_df)
+            done = time.perf_counter()
+        return {
+            'embedMs': (embedded - start) * 1000,
+            'linkMs': (linked - embedded) * 1000,
+            'totalMs': (done - start) * 1000,
+        }
+    
     def get_course_recommendations(
         self,
         user_id: str = None,
@@ -37,18 +443,42 @@ class RecommendationEngine:
         limit: int = 10
     ) -> List[Dict]:
         """Get course recommendations"""
-        # Filter by category and level if provided
-        filtered_df = self.courses_df.copy()
-        if category:
-            filtered_df = filtered_df[filtered_df['category'] == category]
-        if level:
-            filtered_df = filtered_df[filtered_df['level'] == level]
-        
-        if len(filtered_df) == 0:
+        return self.recommend_courses(
+            user_id=user_id, course_id=course_id, category=category, level=level, limit=limit
+        ).to_dict('records')
+    
+    def recommend_courses(
+        self,
+        user_id: str = None,
+        course_id: str = None,
+        category: str = None,
+        level: str = None,
+        limit: int = 10,
+        with_scores: bool = False
+    ) -> pd.DataFrame:
+        """Get course recommendations as a frame of catalog rows
+
+        `with_scores` adds a `score` column comparable across shards: the
+        factor score, predicted rating or similarity; the rating when not
+        personalised; NaN for top-rated fallback rows of a personalised request.
+        """
+        with span('filter'):
+            # Filter by category and level if provided
             filtered_df = self.courses_df.copy()
+            if category:
+                filtered_df = filtered_df[filtered_df['category'] == category]
+            if level:
+                filtered_df = filtered_df[filtered_df['level'] == level]
+            
+            if len(filtered_df) == 0:
+                filtered_df = self.courses_df.copy()
         
         # If user_id provided, use collaborative filtering
-        if user_id and user_id in self.user_item_matrix.index:
+        if self.course_scorer is not None and self.course_scorer.has_user(user_id):
+            result_df = self._recommend_with_factors(
+                self.course_scorer, self.courses_df, filtered_df, user_id, limit
+            )
+        elif user_id and user_id in self.user_item_matrix.index:
             user_ratings = self.user_item_matrix.loc[user_id]
             rated_items = user_ratings[user_ratings > 0].index.tolist()
             
@@ -56,54 +486,86 @@ class RecommendationEngine:
             unrated_items = filtered_df[~filtered_df['id'].isin(rated_items)]
             
             if len(unrated_items) > 0:
-                # Predict ratings using similarity
-                recommendations = []
-                for item_id in unrated_items['id']:
-                    if item_id in self.courses_df['id'].values:
-                        item_idx = self.courses_df[self.courses_df['id'] == item_id].index[0]
-                        similar_items = self.course_similarity[item_idx]
-                        
-                        # Weight by user's ratings
-                        predicted_rating = 0
-                        total_similarity = 0
-                        
-                        for rated_item in rated_items:
-                            if rated_item in self.courses_df['id'].values:
-                                rated_idx = self.courses_df[self.courses_df['id'] == rated_item].index[0]
-                                similarity = similar_items[rated_idx]
-                                if similarity > 0:
-                                    predicted_rating += similarity * user_ratings[rated_item]
-                                    total_similarity += similarity
-                        
-                        if total_similarity > 0:
-                            predicted_rating /= total_similarity
-                        else:
-                            predicted_rating = filtered_df[filtered_df['id'] == item_id]['rating'].values[0]
-                        
-                        recommendations.append({
-                            'item_id': item_id,
-                            'score': predicted_rating
-                        })
-                
-                # Sort by score and get top recommendations
-                recommendations.sort(key=lambda x: x['score'], reverse=True)
-                top_items = [r['item_id'] for r in recommendations[:limit]]
+                with span('score'):
+                    # Predict ratings using similarity
+                    recommendations = []
+                    for item_id in unrated_items['id']:
+                        if item_id in self.courses_df['id'].values:
+                            item_idx = self.courses_df[self.courses_df['id'] == item_id].index[0]
+                            similar_items = self.course_similarity[item_idx]
+                            
+                            # Weight by user's ratings
+                            predicted_rating = 0
+                            total_similarity = 0
+                            
+                            for rated_item in rated_items:
+                                if rated_item in self.courses_df['id'].values:
+                                    rated_idx = self.courses_df[self.courses_df['id'] == rated_item].index[0]
+                                    similarity = similar_items[rated_idx]
+                                    if similarity > 0:
+                                        predicted_rating += similarity * user_ratings[rated_item]
+                                        total_similarity += similarity
+                            
+                            if total_similarity > 0:
+                                predicted_rating /= total_similarity
+                            else:
+                                predicted_rating = filtered_df[filtered_df['id'] == item_id]['rating'].values[0]
+                            
+                            recommendations.append({
+                                'item_id': item_id,
+                                'score': predicted_rating
+                            })
                 
-                result_df = filtered_df[filtered_df['id'].isin(top_items)]
+                with span('topk'):
+                    # Sort by score and get top recommendations
+                    recommendations.sort(key=lambda x: x['score'], reverse=True)
+                    top_items = [r['item_id'] for r in recommendations[:limit]]
+                    
+                    result_df = filtered_df[filtered_df['id'].isin(top_items)]
+                    predicted = {r['item_id']: r['score'] for r in recommendations[:limit]}
+                    result_df = result_df.assign(score=result_df['id'].map(predicted))
             else:
                 # Fallback to content-based
-                result_df = filtered_df.nlargest(limit, 'rating')
+                with span('topk'):
+                    result_df = filtered_df.nlargest(limit, 'rating').assign(score=np.nan)
         elif course_id and course_id in self.courses_df['id'].values:
             # Content-based: similar courses
-            item_idx = self.courses_df[self.courses_df['id'] == course_id].index[0]
-            similar_indices = np.argsort(self.course_similarity[item_idx])[::-1][1:limit+1]
-            result_df = self.courses_df.iloc[similar_indices]
+            with span('topk'):
+                item_idx = self.courses_df[self.courses_df['id'] == course_id].index[0]
+                similar_indices = np.argsort(self.course_similarity[item_idx])[::-1][1:limit+1]
+                result_df = self.courses_df.iloc[similar_indices].assign(
+                    score=self.course_similarity[item_idx][similar_indices]
+                )
         else:
             # Default: top rated courses
-            result_df = filtered_df.nlargest(limit, 'rating')
+            with span('topk'):
+                result_df = filtered_df.nlargest(limit, 'rating')
         
-        # Convert to list of dicts
-        return result_df.to_dict('records')
+        if not with_scores:
+            return result_df.drop(columns='score', errors='ignore')
+        if 'score' not in result_df.columns:
+            result_df = result_df.assign(score=result_df['rating'])
+        return result_df
+    
+    def _recommend_with_factors(
+        self,
+        scorer: FactorScorer,
+        items_df: pd.DataFrame,
+        filtered_df: pd.DataFrame,
+        user_id: str,
+        limit: int
+    ) -> pd.DataFrame:
+        """Top unseen items of filtered_df by factor score"""
+        with span('score'):
+            positions = items_df.index.get_indexer(filtered_df.index)
+            scores = scorer.scores(user_id, positions)
+        with span('topk'):
+            top = top_k(scores, limit)
+            top = top[np.isfinite(scores[top])]
+            if len(top) == 0:
+                # Nothing left to rank: fall back to top rated
+                return filtered_df.nlargest(limit, 'rating').assign(score=np.nan)
+            return filtered_df.iloc[top].assign(score=scores[top])
     
     def get_book_recommendations(
         self,
@@ -113,16 +575,37 @@ class RecommendationEngine:
         limit: int = 10
     ) -> List[Dict]:
         """Get book recommendations"""
-        # Filter by category if provided
-        filtered_df = self.books_df.copy()
-        if category:
-            filtered_df = filtered_df[filtered_df['category'] == category]
-        
-        if len(filtered_df) == 0:
+        return self.recommend_books(
+            user_id=user_id, book_id=book_id, category=category, limit=limit
+        ).to_dict('records')
+    
+    def recommend_books(
+        self,
+        user_id: str = None,
+        book_id: str = None,
+        category: str = None,
+        limit: int = 10,
+        with_scores: bool = False
+    ) -> pd.DataFrame:
+        """Get book recommendations as a frame of catalog rows
+
+        `with_scores` adds a `score` column, as in recommend_courses.
+        """
+        with span('filter'):
+            # Filter by category if provided
             filtered_df = self.books_df.copy()
+            if category:
+                filtered_df = filtered_df[filtered_df['category'] == category]
+            
+            if len(filtered_df) == 0:
+                filtered_df = self.books_df.copy()
         
         # If user_id provided, use collaborative filtering
-        if user_id and user_id in self.book_user_item_matrix.index:
+        if self.book_scorer is not None and self.book_scorer.has_user(user_id):
+            result_df = self._recommend_with_factors(
+                self.book_scorer, self.books_df, filtered_df, user_id, limit
+            )
+        elif user_id and user_id in self.book_user_item_matrix.index:
             user_ratings = self.book_user_item_matrix.loc[user_id]
             rated_items = user_ratings[user_ratings > 0].index.tolist()
             
@@ -130,52 +613,63 @@ class RecommendationEngine:
             unrated_items = filtered_df[~filtered_df['id'].isin(rated_items)]
             
             if len(unrated_items) > 0:
-                # Predict ratings using similarity
-                recommendations = []
-                for item_id in unrated_items['id']:
-                    if item_id in self.books_df['id'].values:
-                        item_idx = self.books_df[self.books_df['id'] == item_id].index[0]
-                        similar_items = self.book_similarity[item_idx]
-                        
-                        # Weight by user's ratings
-                        predicted_rating = 0
-                        total_similarity = 0
-                        
-                        for rated_item in rated_items:
-                            if rated_item in self.books_df['id'].values:
-                                rated_idx = self.books_df[self.books_df['id'] == rated_item].index[0]
-                                similarity = similar_items[rated_idx]
-                                if similarity > 0:
-                                    predicted_rating += similarity * user_ratings[rated_item]
-                                    total_similarity += similarity
-                        
-                        if total_similarity > 0:
-                            predicted_rating /= total_similarity
-                        else:
-                            predicted_rating = filtered_df[filtered_df['id'] == item_id]['rating'].values[0]
-                        
-                        recommendations.append({
-                            'item_id': item_id,
-                            'score': predicted_rating
-                        })
-                
-                # Sort by score and get top recommendations
-                recommendations.sort(key=lambda x: x['score'], reverse=True)
-                top_items = [r['item_id'] for r in recommendations[:limit]]
+                with span('score'):
+                    # Predict ratings using similarity
+                    recommendations = []
+                    for item_id in unrated_items['id']:
+                        if item_id in self.books_df['id'].values:
+                            item_idx = self.books_df[self.books_df['id'] == item_id].index[0]
+                            similar_items = self.book_similarity[item_idx]
+                            
+                            # Weight by user's ratings
+                            predicted_rating = 0
+                            total_similarity = 0
+                            
+                            for rated_item in rated_items:
+                                if rated_item in self.books_df['id'].values:
+                                    rated_idx = self.books_df[self.books_df['id'] == rated_item].index[0]
+                                    similarity = similar_items[rated_idx]
+                                    if similarity > 0:
+                                        predicted_rating += similarity * user_ratings[rated_item]
+                                        total_similarity += similarity
+                            
+                            if total_similarity > 0:
+                                predicted_rating /= total_similarity
+                            else:
+                                predicted_rating = filtered_df[filtered_df['id'] == item_id]['rating'].values[0]
+                            
+                            recommendations.append({
+                                'item_id': item_id,
+                                'score': predicted_rating
+                            })
                 
-                result_df = filtered_df[filtered_df['id'].isin(top_items)]
+                with span('topk'):
+                    # Sort by score and get top recommendations
+                    recommendations.sort(key=lambda x: x['score'], reverse=True)
+                    top_items = [r['item_id'] for r in recommendations[:limit]]
+                    
+                    result_df = filtered_df[filtered_df['id'].isin(top_items)]
+                    predicted = {r['item_id']: r['score'] for r in recommendations[:limit]}
+                    result_df = result_df.assign(score=result_df['id'].map(predicted))
             else:
                 # Fallback to content-based
-                result_df = filtered_df.nlargest(limit, 'rating')
+                with span('topk'):
+                    result_df = filtered_df.nlargest(limit, 'rating').assign(score=np.nan)
         elif book_id and book_id in self.books_df['id'].values:
             # Content-based: similar books
-            item_idx = self.books_df[self.books_df['id'] == book_id].index[0]
-            similar_indices = np.argsort(self.book_similarity[item_idx])[::-1][1:limit+1]
-            result_df = self.books_df.iloc[similar_indices]
+            with span('topk'):
+                item_idx = self.books_df[self.books_df['id'] == book_id].index[0]
+                similar_indices = np.argsort(self.book_similarity[item_idx])[::-1][1:limit+1]
+                result_df = self.books_df.iloc[similar_indices].assign(
+                    score=self.book_similarity[item_idx][similar_indices]
+                )
         else:
             # Default: top rated books
-            result_df = filtered_df.nlargest(limit, 'rating')
+            with span('topk'):
+                result_df = filtered_df.nlargest(limit, 'rating')
         
-        # Convert to list of dicts
-        return result_df.to_dict('records')
-
+        if not with_scores:
+            return result_df.drop(columns='score', errors='ignore')
+        if 'score' not in result_df.columns:
+            result_df = result_df.assign(score=result_df['rating'])
+        return result_df
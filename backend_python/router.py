@@ -0,0 +1,328 @@
+"""
+Scatter-gather router in front of catalog shards
+
+Each shard is main.py started with SHARD_INDEX / SHARD_COUNT (see
+sharding.py) and serves only the items it owns. The router fans listing,
+search, facet and recommendation requests out to every shard, merges the
+partial results, and answers with whatever arrived within SHARD_TIMEOUT_MS.
+Shards that failed or timed out are listed in "missingShards".
+
+    SHARD_INDEX=0 SHARD_COUNT=2 uvicorn main:app --port 8001
+    SHARD_INDEX=1 SHARD_COUNT=2 uvicorn main:app --port 8002
+    SHARD_URLS=http://127.0.0.1:8001,http://127.0.0.1:8002 uvicorn router:app --port 8000
+
+Merging:
+- Listings are ordered by rating (desc) then id, the catalog's cursor order.
+  Cursor pages are exact: every shard seeks past the last (rating, id) key.
+  Offset pages fetch offset + limit rows per shard, so they are limited to
+  SHARD_FETCH_LIMIT rows deep.
+- Facet counts and totals are summed.
+- Recommendations are merged by the shards' scores. With the ALS scorer the
+  merged top-k equals the unsharded one: factor scores are independent per
+  item. With the item-item scorer (no factor models, or
+  RECOMMENDATION_SCORER=similarity) it is approximate: each shard predicts
+  from the user's rated items it owns, so items rated on other shards do
+  not contribute to its scores.
+"""
+import json
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.middleware.cors import CORSMiddleware
+
+from catalog import MAX_PAGE_LIMIT, encode_key_cursor
+from serialization import BOOK_DEFAULTS, COURSE_DEFAULTS, render
+from sharding import SHARD_FETCH_LIMIT, shard_of
+
+SHARD_URLS = [url.rstrip('/') for url in os.getenv('SHARD_URLS', '').split(',') if url.strip()]
+SHARD_BY = os.getenv('SHARD_BY', 'hash')
+SHARD_TIMEOUT = float(os.getenv('SHARD_TIMEOUT_MS', '1000')) / 1000.0
+
+# Version token of router cursors; shards never match it, so they seek by key
+ROUTER_CURSOR_VERSION = 'router'
+
+app = FastAPI(title="Focus Learning API (sharded)", version="1.0.0")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+pool = ThreadPoolExecutor(max_workers=max(4, 8 * len(SHARD_URLS)), thread_name_prefix='shard')
+
+
+class ShardError(Exception):
+    """A shard answered with an HTTP error"""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def fetch(shard: int, path: str, params: Dict) -> Dict:
+    """GET one shard's JSON response"""
+    query = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+    url = f"{SHARD_URLS[shard]}{path}" + (f"?{query}" if query else '')
+    try:
+        with urllib.request.urlopen(url, timeout=SHARD_TIMEOUT) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            detail = json.loads(e.read()).get('detail', str(e))
+        except ValueError:
+            detail = str(e)
+        raise ShardError(e.code, detail)
+
+
+def scatter(path: str, params: Dict, shards: Optional[List[int]] = None,
+            skip_status: Tuple[int, ...] = ()) -> Tuple[List[Dict], List[int]]:
+    """Responses of the shards that answered in time, and the ones that did not
+
+    Shards answering with a status in `skip_status` are left out of both.
+    Any other client error (4xx) from a shard is raised as an HTTPException.
+    """
+    if not SHARD_URLS:
+        raise HTTPException(status_code=503, detail="No shards configured (set SHARD_URLS)")
+    shards = range(len(SHARD_URLS)) if shards is None else shards
+    futures = {pool.submit(fetch, shard, path, params): shard for shard in shards}
+    done, _ = wait(futures, timeout=SHARD_TIMEOUT)
+    responses, missing = [], []
+    for future, shard in futures.items():
+        if future not in done:
+            future.cancel()
+            missing.append(shard)
+            continue
+        try:
+            responses.append(future.result())
+        except ShardError as e:
+            if e.status in skip_status:
+                continue
+            if 400 <= e.status < 500:
+                raise HTTPException(status_code=e.status, detail=e.detail)
+            missing.append(shard)
+        except Exception:
+            missing.append(shard)
+    if not responses and missing:
+        raise HTTPException(status_code=503, detail=f"No shard answered (missing {sorted(missing)})")
+    return responses, sorted(missing)
+
+
+def shard_fields(fields: Optional[str], *extra: str) -> Optional[str]:
+    """Fields to request from shards: the client's plus those needed to merge"""
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(',') if f.strip()]
+    return ','.join(names + [name for name in extra if name not in names])
+
+
+def merge_rows(responses: List[Dict], by: List[str], ascending: List[bool], limit: int,
+               offset: int = 0, fields: Optional[str] = None) -> pd.DataFrame:
+    """Rows of all shard responses, sorted and sliced"""
+    rows = [row for response in responses for row in response['data']]
+    if not rows:
+        return pd.DataFrame(columns=[f.strip() for f in fields.split(',')] if fields else [])
+    df = pd.DataFrame(rows)
+    df = df.sort_values(by, ascending=ascending, na_position='last', kind='stable')
+    return df.iloc[offset:offset + limit].reset_index(drop=True)
+
+
+def list_items(path: str, defaults: Dict, filters: Dict, search: Optional[str], limit: int,
+               offset: int, cursor: Optional[str], fields: Optional[str], accept: Optional[str]):
+    limit = max(0, min(limit, MAX_PAGE_LIMIT))
+    params = {**filters, 'search': search, 'fields': shard_fields(fields, 'id', 'rating')}
+    if cursor is not None:
+        responses, missing = scatter(path, {**params, 'cursor': cursor, 'limit': limit})
+        candidates = merge_rows(responses, ['rating', 'id'], [False, True], limit + 1, fields=fields)
+        page = candidates.iloc[:limit]
+        more = len(candidates) > limit or any(r.get('nextCursor') for r in responses)
+        next_cursor = None
+        if more and len(page):
+            last = page.iloc[-1]
+            next_cursor = encode_key_cursor(ROUTER_CURSOR_VERSION, 0, float(last['rating']), str(last['id']))
+        elif more:
+            next_cursor = cursor
+        meta = {"limit": limit, "nextCursor": next_cursor}
+    else:
+        if offset + limit > SHARD_FETCH_LIMIT:
+            raise HTTPException(
+                status_code=400,
+                detail=f"offset + limit may not exceed {SHARD_FETCH_LIMIT} when sharded; use cursor pagination"
+            )
+        responses, missing = scatter(path, {**params, 'offset': 0, 'limit': offset + limit})
+        page = merge_rows(responses, ['rating', 'id'], [False, True], limit, offset, fields)
+        meta = {"total": sum(r.get('total', 0) for r in responses), "limit": limit, "offset": offset}
+    meta.update({"partial": bool(missing), "missingShards": missing})
+    return render(page, meta, defaults, fields, accept)
+
+
+def item_by_id(path: str, item_id: str, not_found: str):
+    # Hash sharding knows the owner; category sharding has to ask everyone
+    shards = [shard_of(item_id, len(SHARD_URLS))] if SHARD_BY == 'hash' and SHARD_URLS else None
+    responses, _ = scatter(f"{path}/{urllib.parse.quote(item_id)}", {}, shards, skip_status=(404,))
+    if not responses:
+        raise HTTPException(status_code=404, detail=not_found)
+    return responses[0]
+
+
+def facets(path: str, params: Dict):
+    responses, missing = scatter(path, params)
+    merged: Dict[str, Dict] = {}
+    for response in responses:
+        for column, counts in response['facets'].items():
+            column_counts = merged.setdefault(column, {})
+            for entry in counts:
+                column_counts[entry['value']] = column_counts.get(entry['value'], 0) + entry['count']
+    return {
+        "total": sum(r['total'] for r in responses),
+        "facets": {
+            column: [{'value': value, 'count': count} for value, count in sorted(counts.items(), key=lambda kv: str(kv[0]))]
+            for column, counts in merged.items()
+        },
+        "partial": bool(missing),
+        "missingShards": missing,
+    }
+
+
+def recommend(path: str, defaults: Dict, params: Dict, limit: int,
+              fields: Optional[str], accept: Optional[str]):
+    """Top `limit` of the shards' recommendations by score
+
+    Exact for factor-model scores only; see the module docstring.
+    """
+    responses, missing = scatter(
+        path, {**params, 'limit': limit, 'fields': shard_fields(fields, 'id', 'rating', 'score')}
+    )
+    merged = merge_rows(responses, ['score', 'rating', 'id'], [False, False, True], limit, fields=fields)
+    if 'score' in merged.columns and not (fields and 'score' in fields.split(',')):
+        merged = merged.drop(columns='score')
+    meta = {
+        "degraded": any(r.get('degraded') for r in responses),
+        "partial": bool(missing),
+        "missingShards": missing,
+    }
+    return render(merged, meta, defaults, fields, accept)
+
+
+@app.get("/")
+def root():
+    """Root endpoint"""
+    return {
+        "message": "Focus Learning API (sharded)",
+        "version": "1.0.0",
+        "shards": SHARD_URLS,
+        "shardBy": SHARD_BY,
+    }
+
+@app.get("/courses")
+def get_courses(
+    category: Optional[str] = Query(None, description="Filter by category"),
+    level: Optional[str] = Query(None, description="Filter by level"),
+    search: Optional[str] = Query(None, description="Search in title and description"),
+    limit: Optional[int] = Query(100, description="Limit results"),
+    offset: Optional[int] = Query(0, description="Offset for pagination"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor for keyset pagination (empty for first page)"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    accept: Optional[str] = Header(None, description="application/json, application/vnd.focus.columnar+json or application/x-msgpack")
+):
+    """Courses from every shard, merged by rating"""
+    return list_items('/courses', COURSE_DEFAULTS, {'category': category, 'level': level},
+                      search, limit, offset, cursor, fields, accept)
+
+@app.get("/courses/facets")
+def get_course_facets(
+    category: Optional[str] = Query(None, description="Filter by category"),
+    level: Optional[str] = Query(None, description="Filter by level"),
+    is_free: Optional[bool] = Query(None, alias="isFree", description="Filter by free (true) or paid (false)"),
+    search: Optional[str] = Query(None, description="Search in title and description")
+):
+    """Course facet counts summed over shards"""
+    return facets('/courses/facets', {
+        'category': category, 'level': level,
+        'isFree': None if is_free is None else str(is_free).lower(), 'search': search
+    })
+
+@app.get("/courses/{course_id}")
+def get_course_by_id(course_id: str):
+    """Get a specific course by ID from its shard"""
+    return item_by_id('/courses', course_id, "Course not found")
+
+@app.get("/books")
+def get_books(
+    category: Optional[str] = Query(None, description="Filter by category"),
+    search: Optional[str] = Query(None, description="Search in title and description"),
+    limit: Optional[int] = Query(100, description="Limit results"),
+    offset: Optional[int] = Query(0, description="Offset for pagination"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor for keyset pagination (empty for first page)"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    accept: Optional[str] = Header(None, description="application/json, application/vnd.focus.columnar+json or application/x-msgpack")
+):
+    """Books from every shard, merged by rating"""
+    return list_items('/books', BOOK_DEFAULTS, {'category': category},
+                      search, limit, offset, cursor, fields, accept)
+
+@app.get("/books/facets")
+def get_book_facets(
+    category: Optional[str] = Query(None, description="Filter by category"),
+    language: Optional[str] = Query(None, description="Filter by language"),
+    is_free: Optional[bool] = Query(None, alias="isFree", description="Filter by free (true) or paid (false)"),
+    search: Optional[str] = Query(None, description="Search in title, description and author")
+):
+    """Book facet counts summed over shards"""
+    return facets('/books/facets', {
+        'category': category, 'language': language,
+        'isFree': None if is_free is None else str(is_free).lower(), 'search': search
+    })
+
+@app.get("/books/{book_id}")
+def get_book_by_id(book_id: str):
+    """Get a specific book by ID from its shard"""
+    return item_by_id('/books', book_id, "Book not found")
+
+@app.get("/recommendations")
+def get_recommendations(
+    user_id: Optional[str] = Query(None, description="User ID for personalized recommendations"),
+    limit: Optional[int] = Query(10, description="Number of recommendations"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    accept: Optional[str] = Header(None, description="application/json, application/vnd.focus.columnar+json or application/x-msgpack")
+):
+    """Get general recommendations (courses), merged across shards"""
+    return recommend('/recommendations', COURSE_DEFAULTS, {'user_id': user_id}, limit, fields, accept)
+
+@app.get("/recommendations/courses")
+def get_recommended_courses(
+    user_id: Optional[str] = Query(None, description="User ID for personalized recommendations"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    level: Optional[str] = Query(None, description="Filter by level"),
+    limit: Optional[int] = Query(10, description="Number of recommendations"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    accept: Optional[str] = Header(None, description="application/json, application/vnd.focus.columnar+json or application/x-msgpack")
+):
+    """Get recommended courses, merged across shards"""
+    return recommend('/recommendations/courses', COURSE_DEFAULTS,
+                     {'user_id': user_id, 'category': category, 'level': level}, limit, fields, accept)
+
+@app.get("/recommendations/books")
+def get_recommended_books(
+    user_id: Optional[str] = Query(None, description="User ID for personalized recommendations"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    limit: Optional[int] = Query(10, description="Number of recommendations"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    accept: Optional[str] = Header(None, description="application/json, application/vnd.focus.columnar+json or application/x-msgpack")
+):
+    """Get recommended books, merged across shards"""
+    return recommend('/recommendations/books', BOOK_DEFAULTS,
+                     {'user_id': user_id, 'category': category}, limit, fields, accept)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,142 @@
+"""
+Response encoding for list endpoints: field projection and compact formats
+
+Bodies are encoded straight from column arrays instead of going through
+`DataFrame.to_dict('records')` and FastAPI's generic encoder.
+"""
+import json
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+from starlette.responses import Response
+
+from metrics import span
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; JSON formats are always available
+    msgpack = None
+
+JSON = 'application/json'
+COLUMNAR_JSON = 'application/vnd.focus.columnar+json'
+MSGPACK = 'application/x-msgpack'
+
+# Default for a missing column: a constant, or a function of the frame
+Default = Union[object, Callable[[pd.DataFrame], pd.Series]]
+
+
+class InvalidFields(ValueError):
+    """Raised when `fields=` names a field that does not exist"""
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Pick the response media type from an Accept header
+
+    The compact format with the highest q wins (the first listed on a tie),
+    unless JSON is offered with a higher q. Types with q=0 are refused.
+    """
+    if not accept:
+        return JSON
+    offered = {}
+    for part in accept.split(','):
+        media_type, *params = part.split(';')
+        media_type = media_type.strip().lower()
+        if not media_type:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type == 'application/msgpack':
+            media_type = MSGPACK
+        offered.setdefault(media_type, q)
+    candidates = [COLUMNAR_JSON, MSGPACK] if msgpack is not None else [COLUMNAR_JSON]
+    best = None
+    for media_type, q in offered.items():
+        if media_type in candidates and q > 0 and (best is None or q > best[1]):
+            best = (media_type, q)
+    if best is None or offered.get(JSON, 0.0) > best[1]:
+        return JSON
+    return best[0]
+
+
+def _column_values(series: pd.Series) -> list:
+    """Plain Python values for a column, with NaN mapped to None"""
+    values = series.tolist()
+    if series.dtype.kind == 'f' and series.hasnans:
+        values = [None if v != v else v for v in values]
+    elif series.dtype.kind == 'O':
+        values = [None if isinstance(v, float) and v != v else v for v in values]
+    return values
+
+
+def project_columns(
+    df: pd.DataFrame,
+    defaults: Dict[str, Default],
+    fields: Optional[str] = None
+) -> Dict[str, list]:
+    """Column name -> list of values, restricted to `fields` when given"""
+    available = list(df.columns) + [name for name in defaults if name not in df.columns]
+    if fields:
+        requested = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in requested if f not in available]
+        if unknown:
+            raise InvalidFields(f"Unknown fields: {', '.join(unknown)}")
+    else:
+        requested = available
+
+    columns = {}
+    for name in requested:
+        if name in df.columns:
+            columns[name] = _column_values(df[name])
+        else:
+            default = defaults[name]
+            if callable(default):
+                columns[name] = _column_values(default(df))
+            else:
+                columns[name] = [default] * len(df)
+    return columns
+
+
+def encode(columns: Dict[str, list], meta: Dict, media_type: str) -> bytes:
+    """Encode projected columns and envelope metadata"""
+    if media_type == JSON:
+        names = list(columns)
+        records = [dict(zip(names, row)) for row in zip(*columns.values())]
+        return json.dumps({"data": records, **meta}, separators=(',', ':')).encode()
+    body = {"fields": list(columns), "data": columns, **meta}
+    if media_type == MSGPACK:
+        return msgpack.packb(body, use_bin_type=True)
+    return json.dumps(body, separators=(',', ':')).encode()
+
+
+def render(
+    df: pd.DataFrame,
+    meta: Dict,
+    defaults: Dict[str, Default],
+    fields: Optional[str] = None,
+    accept: Optional[str] = None
+) -> Response:
+    """Build the list response for a frame in the negotiated format"""
+    with span('serialize'):
+        media_type = negotiate_format(accept)
+        columns = project_columns(df, defaults, fields)
+        content = encode(columns, meta, media_type)
+    return Response(content=content, media_type=media_type)
+
+
+def is_free(df: pd.DataFrame) -> pd.Series:
+    """isFree derived from price, matching the per-record fallback"""
+    if 'price' in df.columns:
+        return df['price'] == 0
+    return pd.Series(np.ones(len(df), dtype=bool), index=df.index)
+
+
+# Fields the Flutter models expect on every list item
+COURSE_DEFAULTS = {'isFree': is_free, 'isEnrolled': False, 'progress': 0.0}
+BOOK_DEFAULTS = {'isFree': is_free, 'isReading': False, 'progress': 0.0}
@@ -1,28 +1,13 @@
 """
 Complete setup script: Create data, clean, train models, and run API
+
+The stages run in-process through pipeline.py, so re-running the setup only
+rebuilds what changed. Pass --force to rebuild everything.
 """
-import subprocess
 import sys
 import os
 
-def run_command(command, description):
-    """Run a command and handle errors"""
-    print(f"\n{'='*60}")
-    print(f"[*] {description}")
-    print(f"{'='*60}\n")
-    
-    try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            check=True,
-            capture_output=False
-        )
-        print(f"[OK] {description} completed successfully\n")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] Error in {description}: {e}\n")
-        return False
+import pipeline
 
 def main():
     """Main setup function"""
@@ -40,18 +25,13 @@ def main():
     os.makedirs('data', exist_ok=True)
     os.makedirs('models', exist_ok=True)
     
-    steps = [
-        ("python create_dummy_data.py", "Creating dummy datasets"),
-        ("python clean_data.py", "Cleaning datasets"),
-        ("python train_model.py", "Training recommendation models"),
-    ]
-    
-    # Run setup steps
-    for command, description in steps:
-        if not run_command(command, description):
-            print(f"[ERROR] Setup failed at: {description}")
-            print("Please check the error above and try again.")
-            sys.exit(1)
+    # Generate, clean and train; unchanged stages are skipped
+    try:
+        pipeline.build(force='--force' in sys.argv[1:])
+    except Exception as e:
+        print(f"[ERROR] Setup failed: {e}")
+        print("Please check the error above and try again.")
+        sys.exit(1)
     
     print("\n" + "="*60)
     print("[OK] Setup completed successfully!")
@@ -0,0 +1,63 @@
+"""
+Item sharding: which shard owns an item, and which shard this process serves
+
+A shard process is main.py started with SHARD_INDEX and SHARD_COUNT. It
+loads only the catalog rows and model slices of the items it owns; the
+router (router.py) fans requests out to every shard and merges the results.
+
+    SHARD_INDEX    this process's shard, 0-based (unset: serve everything)
+    SHARD_COUNT    number of shards
+    SHARD_BY       'hash' (by item id, default) or 'category'
+"""
+import os
+import zlib
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+SHARD_KEYS = {'hash': 'id', 'category': 'category'}
+
+# Largest page a shard returns to the router (offset pages need offset + limit rows)
+SHARD_FETCH_LIMIT = 1000
+
+
+def shard_of(key, count: int) -> int:
+    """Shard owning `key` (an item id, or a category when sharding by category)"""
+    return zlib.crc32(str(key).encode('utf-8')) % count
+
+
+class Shard:
+    """One slice of the catalog: items whose key hashes to `index`"""
+
+    def __init__(self, index: int, count: int, by: str = 'hash'):
+        if by not in SHARD_KEYS:
+            raise ValueError(f"SHARD_BY must be one of {sorted(SHARD_KEYS)}, got {by!r}")
+        if not 0 <= index < count:
+            raise ValueError(f"SHARD_INDEX must be in [0, {count}), got {index}")
+        self.index = index
+        self.count = count
+        self.by = by
+
+    def __repr__(self):
+        return f"Shard({self.index}/{self.count}, by={self.by})"
+
+    def owns(self, df: pd.DataFrame) -> np.ndarray:
+        """Bool mask of the rows this shard serves"""
+        column = SHARD_KEYS[self.by]
+        if df.empty or column not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        owners = np.array([shard_of(key, self.count) for key in df[column]], dtype=np.int64)
+        return owners == self.index
+
+    def local(self, df: pd.DataFrame) -> pd.DataFrame:
+        """This shard's rows, reindexed from 0"""
+        return df[self.owns(df)].reset_index(drop=True)
+
+
+def shard_from_env() -> Optional[Shard]:
+    """The shard configured for this process, None when serving everything"""
+    index = os.getenv('SHARD_INDEX')
+    if index is None or index == '':
+        return None
+    return Shard(int(index), int(os.getenv('SHARD_COUNT', '1')), os.getenv('SHARD_BY', 'hash'))
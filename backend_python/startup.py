@@ -0,0 +1,152 @@
+"""
+Background startup: the app binds at once, loads catalogs and models off the
+serving path, runs a warm-up pass, then reports ready
+
+/healthz answers as soon as the process serves HTTP (liveness). /readyz and
+every gated route answer 503 with Retry-After until loading and the warm-up
+have finished (readiness). A failed load keeps the worker unready and
+reports the error, instead of serving without models.
+"""
+import asyncio
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+STARTING = 'starting'
+LOADING = 'loading'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+# ASGI scope key set on warm-up requests: they pass the readiness gate and
+# are left out of request metrics
+WARMUP_SCOPE_KEY = 'focus.warmup'
+
+# Paths served before the worker is ready
+UNGATED_PATHS = ('/', '/healthz', '/readyz', '/metrics', '/docs', '/redoc', '/openapi.json')
+UNGATED_PREFIXES = ('/admin/',)
+
+
+class Startup:
+    """Runs `load` and then `warm_up` once, in a daemon thread
+
+    `warm_up` failures are logged and do not block readiness: warming only
+    makes the first requests faster.
+    """
+
+    def __init__(self, load: Callable[[], None], warm_up: Optional[Callable[[], None]] = None):
+        self._load = load
+        self._warm_up = warm_up
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+        self._created = time.perf_counter()
+        self.state = STARTING
+        self.error: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def start(self):
+        """Begin loading in the background; later calls do nothing"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='startup', daemon=True)
+                self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Start if needed and block until startup finished; True when ready"""
+        self.start()
+        self._done.wait(timeout)
+        return self.ready
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            self.state = LOADING
+            self._load()
+            self.phases['load'] = time.perf_counter() - start
+            if self._warm_up is not None:
+                self.state = WARMING
+                warm_start = time.perf_counter()
+                try:
+                    self._warm_up()
+                except Exception as e:
+                    print(f"[ERROR] Warm-up failed, serving cold: {e}")
+                self.phases['warmup'] = time.perf_counter() - warm_start
+            self.state = READY
+            print(f"[OK] Ready in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = FAILED
+            traceback.print_exc()
+            print(f"[ERROR] Startup failed: {self.error}")
+        finally:
+            self._done.set()
+
+    def status(self) -> Dict:
+        return {
+            "status": self.state,
+            "uptimeSeconds": round(time.perf_counter() - self._created, 3),
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+            "error": self.error,
+        }
+
+
+class ReadinessMiddleware:
+    """ASGI middleware answering 503 until `startup` is ready"""
+
+    def __init__(self, app, startup: Startup, retry_after: int = 1):
+        self.app = app
+        self.startup = startup
+        self.retry_after = str(retry_after)
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] != 'http' or self.startup.ready or scope.get(WARMUP_SCOPE_KEY)
+                or scope['path'] in UNGATED_PATHS or scope['path'].startswith(UNGATED_PREFIXES)):
+            await self.app(scope, receive, send)
+            return
+        detail = (f"Startup failed: {self.startup.error}" if self.startup.state == FAILED
+                  else f"Not ready ({self.startup.state})")
+        response = JSONResponse({"detail": detail}, status_code=503, headers={"Retry-After": self.retry_after})
+        await response(scope, receive, send)
+
+
+def warm_request(app, path: str, headers: Iterable[Tuple[str, str]] = ()) -> int:
+    """Send a GET straight to an ASGI app, on a private event loop; return its status
+
+    The response goes through every middleware, so it also fills the
+    response cache and runs each layer's first-call setup.
+    """
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        'client': ('127.0.0.1', 0),
+        'server': ('127.0.0.1', 0),
+        WARMUP_SCOPE_KEY: True,
+    }
+    status = [0]
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status[0] = message['status']
+
+    asyncio.run(app(scope, receive, send))
+    return status[0]
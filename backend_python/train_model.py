@@ -3,137 +3,287 @@ Train recommendation model using content-based filtering
 """
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, ENGLISH_STOP_WORDS
 from sklearn.metrics.pairwise import cosine_similarity
 import joblib
 import os
 import sys
 import io
+from concurrent.futures import ThreadPoolExecutor
+
+from featurizer import HashingFeaturizer, feature_text
+from interactions import InteractionPartition, load_partition
 
 # Fix encoding for Windows console
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
-def train_course_recommendation_model():
-    """Train recommendation model for courses"""
+# Implicit ALS defaults
+ALS_FACTORS = 32
+ALS_REGULARIZATION = 0.1
+ALS_ALPHA = 10.0
+ALS_ITERATIONS = 10
+
+# 'tfidf' fits a vocabulary-capped TfidfVectorizer; 'hashing' fits only IDF
+# weights for a HashingFeaturizer, so the service can embed items added later
+CONTENT_FEATURIZER = os.getenv('CONTENT_FEATURIZER', 'tfidf')
+
+def save_models(model_dir, objects):
+    """Dump each object to model_dir/<name>; return the written paths"""
+    paths = []
+    for name, obj in objects.items():
+        path = os.path.join(model_dir, name).replace(os.sep, '/')
+        joblib.dump(obj, path)
+        paths.append(path)
+    return paths
+
+def fit_content_model(texts, featurizer=CONTENT_FEATURIZER):
+    """Fitted featurizer, item-item cosine similarity and item features
+
+    Item features are kept for the hashing featurizer only (None for tfidf).
+    """
+    if featurizer == 'hashing':
+        vectorizer = HashingFeaturizer(ngram_range=(1, 2), stop_words=ENGLISH_STOP_WORDS)
+        features = vectorizer.fit_transform(texts)
+        return vectorizer, (features @ features.T).toarray(), features
+    if featurizer != 'tfidf':
+        raise ValueError(f"Unknown featurizer: {featurizer}")
+    vectorizer = TfidfVectorizer(
+        max_features=1000,
+        stop_words='english',
+        ngram_range=(1, 2)
+    )
+    tfidf_matrix = vectorizer.fit_transform(texts)
+    return vectorizer, cosine_similarity(tfidf_matrix, tfidf_matrix), None
+
+def domain_interactions(item_type, interactions=None):
+    """One item type's interactions as a partition
+
+    Accepts a partition, a cleaned interactions frame (filtered to the item
+    type), or None to read the saved partition, falling back to the CSV.
+    """
+    if isinstance(interactions, InteractionPartition):
+        return interactions
+    if interactions is None:
+        partition = load_partition(item_type)
+        if partition is not None:
+            return partition
+        interactions = pd.read_csv('data/user_interactions_cleaned.csv')
+    if 'item_type' in interactions.columns:
+        interactions = interactions[interactions['item_type'] == item_type]
+    return InteractionPartition.from_frame(item_type, interactions)
+
+def train_course_recommendation_model(courses_df=None, interactions=None, model_dir='models',
+                                      featurizer=CONTENT_FEATURIZER):
+    """Train recommendation model for courses
+
+    Data is read from the cleaned files unless passed in. Only the course
+    partition of the interactions is used.
+    """
     print("[*] Loading data...")
     
     # Load cleaned data
-    courses_df = pd.read_csv('data/courses_cleaned.csv')
-    interactions_df = pd.read_csv('data/user_interactions_cleaned.csv')
+    if courses_df is None:
+        courses_df = pd.read_csv('data/courses_cleaned.csv')
+    course_interactions = domain_interactions('course', interactions)
+    courses_df = courses_df.copy()
     
     print(f"   Courses: {len(courses_df)}")
-    print(f"   Interactions: {len(interactions_df)}")
+    print(f"   Course interactions: {len(course_interactions)}")
     
     # Create feature text for each course
-    courses_df['feature_text'] = (
-        courses_df['title'] + ' ' +
-        courses_df['description'] + ' ' +
-        courses_df['category'] + ' ' +
-        courses_df['level'] + ' ' +
-        courses_df['instructor']
-    )
-    
-    print("\n[*] Training TF-IDF vectorizer...")
-    # Create TF-IDF vectorizer
-    vectorizer = TfidfVectorizer(
-        max_features=1000,
-        stop_words='english',
-        ngram_range=(1, 2)
-    )
+    courses_df['feature_text'] = feature_text(courses_df, 'course')
     
-    # Fit and transform
-    tfidf_matrix = vectorizer.fit_transform(courses_df['feature_text'])
-    
-    print("[*] Computing similarity matrix...")
-    # Compute cosine similarity
-    similarity_matrix = cosine_similarity(tfidf_matrix, tfidf_matrix)
+    print(f"\n[*] Training {featurizer} featurizer and computing similarity matrix...")
+    vectorizer, similarity_matrix, features = fit_content_model(courses_df['feature_text'], featurizer)
     
     # Create user-item matrix for collaborative filtering
     print("[*] Building user-item matrix...")
-    user_item_matrix = interactions_df.pivot_table(
-        index='user_id',
-        columns='item_id',
-        values='rating',
-        aggfunc='mean'
-    ).fillna(0)
+    user_item_matrix = course_interactions.user_item_matrix('rating')
     
     # Save models
-    os.makedirs('models', exist_ok=True)
+    os.makedirs(model_dir, exist_ok=True)
     
-    joblib.dump(vectorizer, 'models/course_vectorizer.pkl')
-    joblib.dump(similarity_matrix, 'models/course_similarity.pkl')
-    joblib.dump(courses_df, 'models/courses_df.pkl')
-    joblib.dump(user_item_matrix, 'models/user_item_matrix.pkl')
+    models = {
+        'course_vectorizer.pkl': vectorizer,
+        'course_similarity.pkl': similarity_matrix,
+        'courses_df.pkl': courses_df,
+        'user_item_matrix.pkl': user_item_matrix,
+    }
+    if features is not None:
+        models['course_features.pkl'] = features
+    paths = save_models(model_dir, models)
     
     print("\n[OK] Models saved:")
-    print("   - models/course_vectorizer.pkl")
-    print("   - models/course_similarity.pkl")
-    print("   - models/courses_df.pkl")
-    print("   - models/user_item_matrix.pkl")
+    for path in paths:
+        print(f"   - {path}")
     
     return vectorizer, similarity_matrix, courses_df, user_item_matrix
 
-def train_book_recommendation_model():
-    """Train recommendation model for books"""
+def train_book_recommendation_model(books_df=None, interactions=None, model_dir='models',
+                                    featurizer=CONTENT_FEATURIZER):
+    """Train recommendation model for books
+
+    Data is read from the cleaned files unless passed in. Only the book
+    partition of the interactions is used.
+    """
     print("\n[*] Training book recommendation model...")
     
     # Load cleaned data
-    books_df = pd.read_csv('data/books_cleaned.csv')
-    interactions_df = pd.read_csv('data/user_interactions_cleaned.csv')
-    
-    # Filter book interactions
-    book_interactions = interactions_df[interactions_df['item_type'] == 'book']
+    if books_df is None:
+        books_df = pd.read_csv('data/books_cleaned.csv')
+    book_interactions = domain_interactions('book', interactions)
+    books_df = books_df.copy()
     
     print(f"   Books: {len(books_df)}")
     print(f"   Book interactions: {len(book_interactions)}")
     
     # Create feature text for each book
-    books_df['feature_text'] = (
-        books_df['title'] + ' ' +
-        books_df['description'] + ' ' +
-        books_df['category'] + ' ' +
-        books_df['author']
-    )
+    books_df['feature_text'] = feature_text(books_df, 'book')
     
-    print("[*] Training TF-IDF vectorizer for books...")
-    # Create TF-IDF vectorizer
-    vectorizer = TfidfVectorizer(
-        max_features=1000,
-        stop_words='english',
-        ngram_range=(1, 2)
-    )
-    
-    # Fit and transform
-    tfidf_matrix = vectorizer.fit_transform(books_df['feature_text'])
-    
-    print("[*] Computing similarity matrix for books...")
-    # Compute cosine similarity
-    similarity_matrix = cosine_similarity(tfidf_matrix, tfidf_matrix)
+    print(f"[*] Training {featurizer} featurizer for books and computing similarity matrix...")
+    vectorizer, similarity_matrix, features = fit_content_model(books_df['feature_text'], featurizer)
     
     # Create user-item matrix for books
     print("[*] Building user-item matrix for books...")
-    user_item_matrix = book_interactions.pivot_table(
-        index='user_id',
-        columns='item_id',
-        values='rating',
-        aggfunc='mean'
-    ).fillna(0)
+    user_item_matrix = book_interactions.user_item_matrix('rating')
     
     # Save models
-    joblib.dump(vectorizer, 'models/book_vectorizer.pkl')
-    joblib.dump(similarity_matrix, 'models/book_similarity.pkl')
-    joblib.dump(books_df, 'models/books_df.pkl')
-    joblib.dump(user_item_matrix, 'models/book_user_item_matrix.pkl')
+    os.makedirs(model_dir, exist_ok=True)
+    
+    models = {
+        'book_vectorizer.pkl': vectorizer,
+        'book_similarity.pkl': similarity_matrix,
+        'books_df.pkl': books_df,
+        'book_user_item_matrix.pkl': user_item_matrix,
+    }
+    if features is not None:
+        models['book_features.pkl'] = features
+    paths = save_models(model_dir, models)
     
     print("\n[OK] Book models saved:")
-    print("   - models/book_vectorizer.pkl")
-    print("   - models/book_similarity.pkl")
-    print("   - models/books_df.pkl")
-    print("   - models/book_user_item_matrix.pkl")
+    for path in paths:
+        print(f"   - {path}")
     
     return vectorizer, similarity_matrix, books_df, user_item_matrix
 
+def interaction_confidence(partition, alpha=ALS_ALPHA):
+    """Implicit-feedback confidence per interaction: 1 + alpha * strength
+
+    Strength averages the normalised rating, completion and log engagement
+    (minutes spent for courses, pages read for books), each in [0, 1].
+    """
+    values = {name: np.nan_to_num(column) for name, column in partition.values.items()}
+    rating = (np.clip(values['rating'], 1, 5) - 1) / 4
+    completed = values['completed'].astype(np.float32)
+    engagement = np.log1p(np.maximum(values['time_spent_minutes'] + values['pages_read'], 0))
+    if len(engagement) and engagement.max() > 0:
+        engagement = engagement / engagement.max()
+    return (1 + alpha * (rating + completed + engagement) / 3).astype(np.float32)
+
+def _row_blocks(indptr, max_nnz):
+    """Split CSR rows into contiguous blocks of at most ~max_nnz entries"""
+    bounds = np.searchsorted(indptr, np.arange(0, indptr[-1], max_nnz), side='right') - 1
+    bounds = np.unique(np.concatenate([bounds, [len(indptr) - 1]]))
+    if bounds[0] != 0:
+        bounds = np.concatenate([[0], bounds])
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _als_half_step(fixed, matrix, regularization, pool, max_nnz=8192):
+    """Solve every row of `matrix` against the fixed factors
+
+    For row u with confidences c over items i:
+        (YtY + Y_i^T (c - 1) Y_i + lambda I) x_u = Y_i^T c
+    Rows are solved in blocks: the per-row Gram corrections are one sparse
+    (rows x items) by dense (items x k*k) product over the block's distinct
+    items, then a batched numpy.linalg.solve. Blocks run on the thread pool
+    (SciPy and LAPACK release the GIL).
+    """
+    from scipy.sparse import csr_matrix
+    
+    k = fixed.shape[1]
+    gram = fixed.T @ fixed + regularization * np.eye(k, dtype=np.float32)
+    indptr, indices, confidence = matrix.indptr, matrix.indices, matrix.data
+    solved = np.zeros((matrix.shape[0], k), dtype=np.float32)
+
+    def solve(block):
+        lo, hi = block
+        start, stop = indptr[lo], indptr[hi]
+        if start == stop:
+            return
+        local_indptr = indptr[lo:hi + 1] - start
+        items, local = np.unique(indices[start:stop], return_inverse=True)
+        factors = fixed[items]
+        outer = np.einsum('ni,nj->nij', factors, factors).reshape(len(items), k * k)
+        c = confidence[start:stop]
+        shape = (hi - lo, len(items))
+        a = (csr_matrix((c - 1, local, local_indptr), shape=shape) @ outer).reshape(-1, k, k) + gram
+        b = csr_matrix((c, local, local_indptr), shape=shape) @ factors
+        solved[lo:hi] = np.linalg.solve(a, b[..., None])[..., 0]
+
+    list(pool.map(solve, _row_blocks(indptr, max_nnz)))
+    return solved
+
+def train_als(partition, factors=ALS_FACTORS, regularization=ALS_REGULARIZATION,
+              alpha=ALS_ALPHA, iterations=ALS_ITERATIONS, workers=None, seed=42):
+    """Implicit ALS (Hu, Koren & Volinsky) on one interaction partition
+
+    Returns float32 (user_factors, item_factors), rows in partition code order.
+    """
+    from scipy.sparse import csr_matrix
+    
+    shape = (len(partition.users), len(partition.items))
+    user_items = csr_matrix(
+        (interaction_confidence(partition, alpha), (partition.user_codes, partition.item_codes)),
+        shape=shape, dtype=np.float32
+    )
+    user_items.sum_duplicates()
+    item_users = user_items.T.tocsr()
+    
+    rng = np.random.default_rng(seed)
+    user_factors = (rng.standard_normal((shape[0], factors)) * 0.01).astype(np.float32)
+    item_factors = (rng.standard_normal((shape[1], factors)) * 0.01).astype(np.float32)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for _ in range(iterations):
+            user_factors = _als_half_step(item_factors, user_items, regularization, pool)
+            item_factors = _als_half_step(user_factors, item_users, regularization, pool)
+    return user_factors, item_factors
+
+def build_als_model(partition, **params):
+    """ALS factors plus each user's seen items, as served by FactorScorer"""
+    user_factors, item_factors = train_als(partition, **params)
+    
+    # Seen items per user, so serving can exclude them
+    order = np.lexsort((partition.item_codes, partition.user_codes))
+    seen_indptr = np.zeros(len(partition.users) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(partition.user_codes, minlength=len(partition.users)), out=seen_indptr[1:])
+    return {
+        'user_ids': partition.users,
+        'item_ids': partition.items,
+        'user_factors': user_factors,
+        'item_factors': item_factors,
+        'seen_indptr': seen_indptr,
+        'seen_items': partition.item_codes[order],
+        'params': params,
+    }
+
+def train_als_recommendation_model(item_type, interactions=None, model_dir='models', **params):
+    """Train and save implicit ALS factors for one item type ('course' or 'book')"""
+    print(f"\n[*] Training {item_type} ALS model...")
+    partition = domain_interactions(item_type, interactions)
+    print(f"   Users: {len(partition.users)}, items: {len(partition.items)}, "
+          f"interactions: {len(partition)}")
+    
+    model = build_als_model(partition, **params)
+    os.makedirs(model_dir, exist_ok=True)
+    paths = save_models(model_dir, {f'{item_type}_als.pkl': model})
+    
+    print(f"[OK] {item_type.capitalize()} ALS model saved:")
+    for path in paths:
+        print(f"   - {path}")
+    
+    return model
+
 if __name__ == '__main__':
     print("[*] Starting model training...\n")
     
@@ -143,5 +293,9 @@ if __name__ == '__main__':
     # Train book model
     train_book_recommendation_model()
     
+    # Train implicit-feedback factor models
+    train_als_recommendation_model('course')
+    train_als_recommendation_model('book')
+    
     print("\n[OK] All models trained successfully!")
 